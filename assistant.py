@@ -3,12 +3,24 @@ AI Assistant with weather and points of interest.
 Orchestration only: uses injected LLM and tool registry.
 """
 
+import asyncio
+import inspect
 import json
-from collections.abc import Iterator
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from collections.abc import AsyncIterator, Iterator
 from typing import Any, Protocol
 
-from prompts import EXECUTE_REQUEST, PLAN_REQUEST, SYSTEM_PROMPT
+import router
+from config import (
+    ORCHESTRATION_MODE,
+    PREFETCH_ENABLED,
+    TURN_DEADLINE_S,
+)
+from history import compact_history, history_tokens, is_digest, is_summary, tool_digest
+from prefetch import Prefetcher
+from prompt_layout import PrefixTracker, assemble_messages
+from prompts import EXECUTE_REQUEST, PLAN_AND_EXECUTE_REQUEST, PLAN_REQUEST, SYSTEM_PROMPT
+from scheduler import background_loop
 
 # --- History helpers ---
 
@@ -28,27 +40,38 @@ def ensure_system_message(history: list) -> list:
 
 def trim_history(messages: list) -> list:
     """
-    Trim persisted history: keep system + real user/assistant turns;
+    Trim persisted history: keep system + history summary + real user/assistant turns;
     drop PLAN_REQUEST/EXECUTE_REQUEST scaffolding, plan message, tool call/result messages.
+    Tool results of the latest turn that used tools are kept as one compact digest message at the end.
     """
     trimmed: list[dict] = []
     saw_system = False
     skip_next_assistant_plan = False
+    digest: dict | None = None
+    turn_calls: dict[str, tuple[str, dict]] = {}  # tool_call_id -> (name, args), current turn
+    turn_results: list[tuple[str, dict, str]] = []
 
     for m in messages:
         role = _msg_get(m, "role", "")
         content = _msg_get(m, "content", "") or ""
 
         if role == "system":
-            if not saw_system:
+            if is_summary({"role": role, "content": content}):
                 trimmed.append({"role": "system", "content": content})
+            elif is_digest({"role": role, "content": content}):
+                digest = {"role": "system", "content": content}
+            elif not saw_system:
+                trimmed.insert(0, {"role": "system", "content": content})
                 saw_system = True
             continue
 
         if role == "tool":
+            call = turn_calls.get(_msg_get(m, "tool_call_id", ""))
+            if call is not None:
+                turn_results.append((call[0], call[1], content))
             continue
 
-        if role == "user" and content in (PLAN_REQUEST, EXECUTE_REQUEST):
+        if role == "user" and content in (PLAN_REQUEST, EXECUTE_REQUEST, PLAN_AND_EXECUTE_REQUEST):
             if content == PLAN_REQUEST:
                 skip_next_assistant_plan = True
             continue
@@ -56,6 +79,13 @@ def trim_history(messages: list) -> list:
         if role == "assistant":
             tool_calls = _msg_get(m, "tool_calls", None)
             if tool_calls:
+                for tc in tool_calls:
+                    fn = _msg_get(tc, "function", {})
+                    try:
+                        args = json.loads(_msg_get(fn, "arguments", "") or "{}")
+                    except json.JSONDecodeError:
+                        args = {}
+                    turn_calls[_msg_get(tc, "id", "")] = (_msg_get(fn, "name", ""), args)
                 continue
             if skip_next_assistant_plan:
                 skip_next_assistant_plan = False
@@ -65,9 +95,14 @@ def trim_history(messages: list) -> list:
 
         if role == "user":
             skip_next_assistant_plan = False
+            digest = tool_digest(turn_results) or digest
+            turn_calls, turn_results = {}, []
             trimmed.append({"role": "user", "content": content})
             continue
 
+    digest = tool_digest(turn_results) or digest
+    if digest is not None:
+        trimmed.append(digest)
     if not saw_system:
         return [{"role": "system", "content": SYSTEM_PROMPT}] + trimmed
     return trimmed
@@ -76,48 +111,11 @@ def trim_history(messages: list) -> list:
 
 
 def _is_weather_query(text: str) -> bool:
-    t = (text or "").lower()
-    return any(
-        k in t
-        for k in (
-            "weather",
-            "forecast",
-            "temperature",
-            "temp",
-            "rain",
-            "wind",
-            "humidity",
-            "humid",
-            "cloud",
-            "sun",
-            "snow",
-        )
-    )
+    return "weather" in router.intents(text)
 
 
 def _wants_places_or_itinerary(text: str) -> bool:
-    t = (text or "").lower()
-    return any(
-        k in t
-        for k in (
-            "itinerary",
-            "plan a trip",
-            "trip",
-            "things to do",
-            "what to do",
-            "recommend",
-            "suggest",
-            "where to eat",
-            "restaurant",
-            "restaurants",
-            "museum",
-            "museums",
-            "park",
-            "parks",
-            "places",
-            "poi",
-        )
-    )
+    return "places" in router.intents(text)
 
 
 def should_use_plan(user_message: str) -> bool:
@@ -140,7 +138,7 @@ def should_use_plan(user_message: str) -> bool:
 class StreamChunk:
     """One chunk from a streamed completion."""
 
-    __slots__ = ("content", "tool_calls", "finish_reason")
+    __slots__ = ("content", "tool_calls", "finish_reason", "usage")
 
     def __init__(
         self,
@@ -148,10 +146,13 @@ class StreamChunk:
         content: str | None = None,
         tool_calls: list[dict[str, Any]] | None = None,
         finish_reason: str | None = None,
+        usage: dict[str, int] | None = None,
     ) -> None:
         self.content = content
         self.tool_calls = tool_calls or []
         self.finish_reason = finish_reason
+        # Final chunk only, if the provider reports it: prompt_tokens, completion_tokens, cached_tokens.
+        self.usage = usage
 
 
 class LLMClient(Protocol):
@@ -166,6 +167,62 @@ class LLMClient(Protocol):
         ...
 
 
+class AsyncLLMClient(Protocol):
+    """Async LLMClient: stream_completion is an async generator of StreamChunk."""
+
+    def stream_completion(
+        self,
+        messages: list[dict[str, Any]],
+        tools: list[dict[str, Any]],
+        tool_choice: str,
+    ) -> AsyncIterator[StreamChunk]:
+        ...
+
+
+def _usage_dict(usage: Any) -> dict[str, int]:
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+
+def _stream_chunk(chunk: Any) -> StreamChunk | None:
+    """Convert one OpenAI stream chunk; None for chunks carrying nothing."""
+    if not chunk.choices:
+        # The usage chunk comes last, with no choices.
+        if getattr(chunk, "usage", None) is not None:
+            return StreamChunk(usage=_usage_dict(chunk.usage))
+        return None
+    choice = chunk.choices[0]
+    delta = choice.delta
+    content = getattr(delta, "content", None)
+    finish_reason = choice.finish_reason if choice.finish_reason else None
+    tool_calls_out: list[dict] = []
+    delta_tool_calls = getattr(delta, "tool_calls", None)
+    if delta_tool_calls:
+        for tc in delta_tool_calls:
+            entry: dict = {
+                "index": tc.index,
+                "id": getattr(tc, "id", None) or "",
+                "type": "function",
+                "function": {"name": "", "arguments": ""},
+            }
+            fn = getattr(tc, "function", None)
+            if fn:
+                if getattr(fn, "name", None):
+                    entry["function"]["name"] = fn.name
+                if getattr(fn, "arguments", None):
+                    entry["function"]["arguments"] += fn.arguments
+            tool_calls_out.append(entry)
+    return StreamChunk(
+        content=content,
+        tool_calls=tool_calls_out,
+        finish_reason=finish_reason,
+    )
+
+
 class OpenAILLMClient:
     """Wraps OpenAI client and implements stream_completion for the assistant."""
 
@@ -185,109 +242,370 @@ class OpenAILLMClient:
             tools=tools,
             tool_choice=tool_choice,
             stream=True,
+            stream_options={"include_usage": True},
         )
         for chunk in stream:
-            choice = chunk.choices[0]
-            delta = choice.delta
-            content = getattr(delta, "content", None)
-            finish_reason = choice.finish_reason if choice.finish_reason else None
-            tool_calls_out: list[dict] = []
-            delta_tool_calls = getattr(delta, "tool_calls", None)
-            if delta_tool_calls:
-                for tc in delta_tool_calls:
-                    entry: dict = {
-                        "index": tc.index,
-                        "id": getattr(tc, "id", None) or "",
-                        "type": "function",
-                        "function": {"name": "", "arguments": ""},
-                    }
-                    fn = getattr(tc, "function", None)
-                    if fn:
-                        if getattr(fn, "name", None):
-                            entry["function"]["name"] = fn.name
-                        if getattr(fn, "arguments", None):
-                            entry["function"]["arguments"] += fn.arguments
-                    tool_calls_out.append(entry)
-            yield StreamChunk(
-                content=content,
-                tool_calls=tool_calls_out,
-                finish_reason=finish_reason,
-            )
+            out = _stream_chunk(chunk)
+            if out is not None:
+                yield out
+
+
+class AsyncOpenAILLMClient:
+    """Wraps an openai.AsyncOpenAI client; the async counterpart of OpenAILLMClient."""
+
+    def __init__(self, client: Any, model: str = "gpt-4o-mini") -> None:
+        self._client = client
+        self._model = model
+
+    async def stream_completion(
+        self,
+        messages: list[dict],
+        tools: list[dict],
+        tool_choice: str,
+    ):
+        stream = await self._client.chat.completions.create(
+            model=self._model,
+            messages=messages,
+            tools=tools,
+            tool_choice=tool_choice,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in stream:
+            out = _stream_chunk(chunk)
+            if out is not None:
+                yield out
+
+
+class _SyncLLMAdapter:
+    """AsyncLLMClient over a sync LLMClient: each chunk is pulled in a worker thread."""
+
+    def __init__(self, llm: LLMClient) -> None:
+        self._llm = llm
+
+    async def stream_completion(self, messages: list[dict], tools: list[dict], tool_choice: str):
+        it = iter(self._llm.stream_completion(messages, tools, tool_choice))
+        done = object()
+        try:
+            while (chunk := await asyncio.to_thread(next, it, done)) is not done:
+                yield chunk
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except ValueError:
+                    pass  # generator still running in its worker thread (cancelled mid-chunk)
+
+
+def _as_async_llm(llm: LLMClient | AsyncLLMClient) -> AsyncLLMClient:
+    if inspect.isasyncgenfunction(llm.stream_completion):
+        return llm
+    return _SyncLLMAdapter(llm)
+
+
+# --- Streaming tool-call assembly ---
+
+
+class _ToolCallAssembler:
+    """
+    Accumulates streamed tool_call deltas and submits each call to the tool registry as soon as
+    it is complete: when the stream moves on to the next index, or when its JSON arguments close.
+    Tool I/O then overlaps with the model still generating the remaining calls, and all calls of a round
+    run concurrently as tasks on the running event loop.
+    Repeated identical calls are answered by the registry's own result cache (CachePolicy), without I/O.
+    Calls run with the turn's deadline (time.monotonic()), past which they return degraded payloads.
+    """
+
+    def __init__(self, tool_registry: Any, deadline: float | None = None) -> None:
+        self._registry = tool_registry
+        self._deadline = deadline
+        self._calls: dict[int, dict] = {}
+        self._futures: dict[int, tuple[asyncio.Future, bool, bool]] = {}
+        self._current: int | None = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self._calls)
+
+    def add(self, tc: dict) -> None:
+        idx = tc.get("index", 0)
+        if self._current is not None and idx != self._current:
+            self._dispatch(self._current)
+        self._current = idx
+        entry = self._calls.setdefault(
+            idx,
+            {"id": "", "type": "function", "function": {"name": "", "arguments": ""}},
+        )
+        if tc.get("id"):
+            entry["id"] = tc["id"]
+        fn = tc.get("function", {})
+        if fn.get("name"):
+            entry["function"]["name"] = fn["name"]
+        if fn.get("arguments"):
+            entry["function"]["arguments"] += fn["arguments"]
+            if entry["function"]["arguments"].rstrip().endswith("}"):
+                self._dispatch(idx)
+
+    def _dispatch(self, idx: int, strict: bool = False) -> None:
+        """Submit call idx once its arguments parse; with strict, parse errors propagate."""
+        if idx in self._futures:
+            return
+        entry = self._calls[idx]
+        name = entry["function"]["name"]
+        if not name or not entry["id"]:
+            return
+        try:
+            args = json.loads(entry["function"]["arguments"] or "{}")
+        except json.JSONDecodeError:
+            if strict:
+                raise
+            return
+        is_weather = name in ("get_current_temperature", "get_weather_forecast", "plan_destination")
+        is_places = name in ("search_places", "plan_destination")
+        self._futures[idx] = (self._submit(name, args), is_weather, is_places)
+
+    def _submit(self, name: str, args: dict) -> asyncio.Future:
+        if hasattr(self._registry, "record_demand"):
+            asyncio.get_running_loop().run_in_executor(None, self._registry.record_demand, name, args)
+        return asyncio.ensure_future(self._registry.run_async(name, args, self._deadline))
+
+    def finish(self) -> list[dict]:
+        """Submit any calls not yet dispatched; return all calls in index order."""
+        for idx in sorted(self._calls):
+            self._dispatch(idx, strict=True)
+        return [self._calls[i] for i in sorted(self._calls)]
+
+    def submitted(self) -> list[tuple[asyncio.Future, bool, bool]]:
+        """(future, is_weather, is_places) per call, in index order."""
+        return [self._futures[i] for i in sorted(self._calls)]
+
+    def cancel(self) -> None:
+        """Drop calls still running: dispatched early before the model ended without tool calls, or left by a cancelled turn."""
+        for future, _, _ in self._futures.values():
+            future.cancel()
 
 
 # --- Run assistant ---
 
 
-def run_assistant(
+class _TurnStats:
+    """
+    Per-turn token accounting for the ("stats", dict) event: static prompt tokens (system prompt + schemas)
+    with and without routing, history tokens before and after compaction, how much of each request is
+    prefix-identical to the previous one, and the provider's prompt/cached token counts.
+    prompt_tokens_saved counts tokens routing left out of the request; it does not net out the cached
+    prefix a route switch gives up, which shows as fewer prefix_identical_tokens.
+    """
+
+    def __init__(
+        self,
+        route: router.Route,
+        tools: list[dict],
+        full_tokens: int,
+        routed_tokens: int,
+        history_before: int,
+        history_after: int,
+        prefix_tracker: PrefixTracker,
+    ) -> None:
+        self._prefix_tracker = prefix_tracker
+        self._stats = {
+            "route": route.name,
+            "tools": [t["function"]["name"] for t in tools],
+            "completions": 0,
+            "prompt_tokens_full": full_tokens,
+            "prompt_tokens_routed": routed_tokens,
+            "prompt_tokens_saved": 0,
+            "history_tokens": history_before,
+            "history_tokens_compacted": history_after,
+            "history_tokens_saved": 0,
+            "request_tokens": 0,
+            "prefix_identical_tokens": 0,
+            "provider_prompt_tokens": 0,
+            "provider_cached_tokens": 0,
+        }
+
+    def completion(self, tools: list[dict], messages: list[dict]) -> None:
+        """Count one completion request about to be sent."""
+        s = self._stats
+        s["completions"] += 1
+        s["prompt_tokens_saved"] += s["prompt_tokens_full"] - s["prompt_tokens_routed"]
+        s["history_tokens_saved"] += s["history_tokens"] - s["history_tokens_compacted"]
+        shared, total = self._prefix_tracker.observe(tools, messages)
+        s["prefix_identical_tokens"] += shared
+        s["request_tokens"] += total
+
+    def usage(self, usage: dict[str, int] | None) -> None:
+        if usage:
+            self._stats["provider_prompt_tokens"] += usage.get("prompt_tokens", 0)
+            self._stats["provider_cached_tokens"] += usage.get("cached_tokens", 0)
+
+    def as_dict(self) -> dict:
+        s = dict(self._stats)
+        s["prefix_identical_fraction"] = round(s["prefix_identical_tokens"] / s["request_tokens"], 3) if s["request_tokens"] else 0.0
+        s["provider_cached_fraction"] = (
+            round(s["provider_cached_tokens"] / s["provider_prompt_tokens"], 3) if s["provider_prompt_tokens"] else None
+        )
+        return s
+
+
+async def arun_assistant(
     conversation_history: list,
     user_message: str,
-    llm: LLMClient,
+    llm: LLMClient | AsyncLLMClient,
     tool_registry: Any,
     user_preferences: str | None = None,
+    mode: str | None = None,
+    prefix_tracker: PrefixTracker | None = None,
 ):
     """
     Process user message with the assistant (plan-and-execute).
-    Yields ("plan", plan_text), ("plan_delta", chunk), ("delta", text), ("result", ...).
-    If user_preferences is non-empty, it is injected into the system message for personalized trip planning.
+    Yields ("plan", plan_text), ("plan_delta", chunk), ("delta", text), ("tools", [tool names]) when a round's
+    tool calls start running (the text stream pauses until they finish), ("stats", dict), ("result", ...).
+    The router picks the tool schemas and system prompt modules sent, and history over HISTORY_TOKEN_BUDGET is
+    compacted into a rolling summary; "stats" reports the tokens both saved and prompt-cache reuse.
+    If user_preferences is non-empty, it is sent as its own system message after the static prompt.
+    mode (default ORCHESTRATION_MODE) is "two_phase" (separate plan completion, then execute) or
+    "single_call" (plan and first tool calls in one completion; its content is streamed as the plan).
+    prefix_tracker (one per conversation) compares each request with that conversation's previous one;
+    without it, only the completions within this turn are compared.
+    llm may be an AsyncLLMClient or a sync LLMClient (its chunks are then read in a worker thread);
+    the tool calls of a round run concurrently on the running event loop.
+    Tool calls share a deadline TURN_DEADLINE_S after the turn starts; once it has passed, tools answer
+    with degraded payloads and the model is asked to answer without further tool calls.
     """
-    messages = ensure_system_message(conversation_history)
-    if user_preferences and user_preferences.strip():
-        pref_block = "\n\nUser's travel preferences (use these to personalize recommendations and itineraries):\n" + user_preferences.strip()
-        if messages and messages[0].get("role") == "system":
-            messages[0] = {"role": "system", "content": messages[0]["content"] + pref_block}
+    llm = _as_async_llm(llm)
+    deadline = time.monotonic() + TURN_DEADLINE_S
+    route = router.route(user_message)
+    # Compact before the turn, so every completion in it sends the smaller history.
+    history = trim_history(conversation_history)
+    history_before = history_tokens(history[1:])
+    history, history_saved = compact_history(history)
+    # Most static first (schemas, system prompt, preferences, history) so requests share cached prefixes.
+    messages = assemble_messages(route.system_prompt, user_preferences, history)
     messages.append({"role": "user", "content": user_message})
 
-    tools = tool_registry.get_schemas()
-
-    if should_use_plan(user_message):
-        messages.append({"role": "user", "content": PLAN_REQUEST})
-        plan_parts: list[str] = []
-        for chunk in llm.stream_completion(messages, tools, "none"):
-            if chunk.content:
-                plan_parts.append(chunk.content)
-                yield ("plan_delta", chunk.content)
-        plan_text = "".join(plan_parts)
-        messages.append({"role": "assistant", "content": plan_text or ""})
-        messages.append({"role": "user", "content": EXECUTE_REQUEST})
-        yield ("plan", (plan_text or "").strip() or None)
-
-    weather_api_used = False
-    places_api_used = False
-
-    while True:
-        content_parts: list[str] = []
-        tool_calls_by_index: dict[int, dict] = {}
-        saw_tool_calls = False
-        finish_reason = None
-
-        for chunk in llm.stream_completion(messages, tools, "auto"):
-            if chunk.finish_reason:
-                finish_reason = chunk.finish_reason
-            for tc in chunk.tool_calls:
-                saw_tool_calls = True
-                idx = tc.get("index", 0)
-                entry = tool_calls_by_index.setdefault(
-                    idx,
-                    {"id": "", "type": "function", "function": {"name": "", "arguments": ""}},
+    tools = tool_registry.get_schemas(route.tools)
+    stats = _TurnStats(
+        route,
+        tools,
+        router.prompt_tokens(SYSTEM_PROMPT, tool_registry.get_schemas()),
+        router.prompt_tokens(route.system_prompt, tools),
+        history_before,
+        history_before - history_saved,
+        prefix_tracker or PrefixTracker(),
+    )
+    prefetcher = None
+    use_plan = should_use_plan(user_message)
+    single_call = (mode or ORCHESTRATION_MODE) == "single_call"
+    plan_round = use_plan and single_call
+
+    if use_plan and PREFETCH_ENABLED:
+        # Warm caches for the destinations while the plan streams; execute-round calls then mostly hit.
+        prefetcher = Prefetcher(places=_wants_places_or_itinerary(user_message))
+        prefetcher.feed(user_message, final=True)
+
+    assembler: _ToolCallAssembler | None = None
+    # However the turn ends (including cancellation, e.g. a client disconnect), tool calls dispatched early
+    # and prefetches must not outlive it.
+    try:
+        if plan_round:
+            messages.append({"role": "user", "content": PLAN_AND_EXECUTE_REQUEST})
+        elif use_plan:
+            messages.append({"role": "user", "content": PLAN_REQUEST})
+            plan_parts: list[str] = []
+            stats.completion(tools, messages)
+            async for chunk in llm.stream_completion(messages, tools, "none"):
+                stats.usage(chunk.usage)
+                if chunk.content:
+                    plan_parts.append(chunk.content)
+                    if prefetcher is not None:
+                        prefetcher.feed(chunk.content)
+                    yield ("plan_delta", chunk.content)
+            plan_text = "".join(plan_parts)
+            if prefetcher is not None:
+                prefetcher.feed("", final=True)
+            messages.append({"role": "assistant", "content": plan_text or ""})
+            messages.append({"role": "user", "content": EXECUTE_REQUEST})
+            yield ("plan", (plan_text or "").strip() or None)
+
+        weather_api_used = False
+        places_api_used = False
+
+        while True:
+            content_parts: list[str] = []
+            assembler = _ToolCallAssembler(tool_registry, deadline)
+            finish_reason = None
+
+            stats.completion(tools, messages)
+            tool_choice = "auto" if time.monotonic() < deadline else "none"
+            async for chunk in llm.stream_completion(messages, tools, tool_choice):
+                stats.usage(chunk.usage)
+                if chunk.finish_reason:
+                    finish_reason = chunk.finish_reason
+                for tc in chunk.tool_calls:
+                    assembler.add(tc)
+                if chunk.content:
+                    content_parts.append(chunk.content)
+                    if plan_round:
+                        if prefetcher is not None:
+                            prefetcher.feed(chunk.content)
+                        yield ("plan_delta", chunk.content)
+                    elif not assembler.started:
+                        yield ("delta", chunk.content)
+
+            content = "".join(content_parts)
+            tool_calls = assembler.finish() if finish_reason == "tool_calls" else []
+            if plan_round:
+                plan_round = False
+                if tool_calls:
+                    yield ("plan", content.strip() or None)
+                else:
+                    # The model answered without tools: what streamed as the plan is the answer.
+                    yield ("plan", None)
+                    if content:
+                        yield ("delta", content)
+
+            if finish_reason == "stop":
+                assembler.cancel()
+                messages.append({"role": "assistant", "content": content or ""})
+                trimmed = trim_history(messages)
+                yield ("stats", stats.as_dict())
+                yield (
+                    "result",
+                    content or "",
+                    weather_api_used,
+                    places_api_used,
+                    trimmed,
                 )
-                if tc.get("id"):
-                    entry["id"] = tc["id"]
-                fn = tc.get("function", {})
-                if fn.get("name"):
-                    entry["function"]["name"] = fn["name"]
-                if fn.get("arguments"):
-                    entry["function"]["arguments"] += fn["arguments"]
-            if chunk.content:
-                content_parts.append(chunk.content)
-                if not saw_tool_calls:
-                    yield ("delta", chunk.content)
-
-        content = "".join(content_parts)
-        tool_calls = [tool_calls_by_index[i] for i in sorted(tool_calls_by_index.keys())]
-
-        if finish_reason == "stop":
+                return
+
+            if finish_reason == "tool_calls" and tool_calls:
+                messages.append({"role": "assistant", "content": content or "", "tool_calls": tool_calls})
+                yield ("tools", [tc["function"]["name"] for tc in tool_calls])
+                # Results are appended in the original tool_calls order, whatever order they finish in.
+                for tc, (future, is_weather, is_places) in zip(tool_calls, assembler.submitted()):
+                    messages.append(
+                        {
+                            "role": "tool",
+                            "tool_call_id": tc["id"],
+                            "content": await future,
+                        }
+                    )
+                    if is_weather:
+                        weather_api_used = True
+                    if is_places:
+                        places_api_used = True
+                if prefetcher is not None:
+                    # The real calls have joined the warm-ups they needed; the rest were wrong guesses.
+                    prefetcher.cancel()
+                    prefetcher = None
+                continue
+
+            assembler.cancel()
             messages.append({"role": "assistant", "content": content or ""})
             trimmed = trim_history(messages)
+            yield ("stats", stats.as_dict())
             yield (
                 "result",
                 content or "",
@@ -296,56 +614,40 @@ def run_assistant(
                 trimmed,
             )
             return
+    finally:
+        if assembler is not None:
+            assembler.cancel()
+        if prefetcher is not None:
+            prefetcher.cancel()
 
-        if finish_reason == "tool_calls" and tool_calls:
-            messages.append({"role": "assistant", "content": content or "", "tool_calls": tool_calls})
-            results_by_id: dict[str, tuple[str, bool, bool]] = {}
 
-            def process_one_tool_call(tc):
-                if isinstance(tc, dict):
-                    name = tc.get("function", {}).get("name", "")
-                    args_raw = tc.get("function", {}).get("arguments", "") or "{}"
-                    tool_call_id = tc.get("id", "")
-                else:
-                    name = tc.function.name
-                    args_raw = tc.function.arguments or "{}"
-                    tool_call_id = tc.id
-
-                args = json.loads(args_raw)
-                result = tool_registry.run(name, args)
-                is_weather = name in ("get_current_temperature", "get_weather_forecast")
-                is_places = name == "search_places"
-                return tool_call_id, result, is_weather, is_places
-
-            with ThreadPoolExecutor(max_workers=min(32, len(tool_calls) * 2)) as executor:
-                futures = [executor.submit(process_one_tool_call, tc) for tc in tool_calls]
-                for future in as_completed(futures):
-                    tool_call_id, result, is_weather, is_places = future.result()
-                    results_by_id[tool_call_id] = (result, is_weather, is_places)
-                    if is_weather:
-                        weather_api_used = True
-                    if is_places:
-                        places_api_used = True
+# --- Sync wrapper ---
 
-            for tc in tool_calls:
-                tc_id = tc["id"] if isinstance(tc, dict) else tc.id
-                tool_content, _, _ = results_by_id[tc_id]
-                messages.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": tc_id,
-                        "content": tool_content,
-                    }
-                )
-            continue
 
-        messages.append({"role": "assistant", "content": content or ""})
-        trimmed = trim_history(messages)
-        yield (
-            "result",
-            content or "",
-            weather_api_used,
-            places_api_used,
-            trimmed,
-        )
-        return
+async def _anext(agen):
+    return await agen.__anext__()
+
+
+def run_assistant(
+    conversation_history: list,
+    user_message: str,
+    llm: LLMClient | AsyncLLMClient,
+    tool_registry: Any,
+    user_preferences: str | None = None,
+    mode: str | None = None,
+    prefix_tracker: PrefixTracker | None = None,
+):
+    """Blocking generator over arun_assistant's events (same arguments), run on a background event loop."""
+    loop = background_loop()
+    agen = arun_assistant(
+        conversation_history, user_message, llm, tool_registry, user_preferences, mode, prefix_tracker
+    )
+    try:
+        while True:
+            try:
+                event = asyncio.run_coroutine_threadsafe(_anext(agen), loop).result()
+            except StopAsyncIteration:
+                return
+            yield event
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
@@ -0,0 +1,163 @@
+"""
+Batch itinerary generation: run many conversations from a JSONL file concurrently.
+
+    python batch.py requests.jsonl -o results.jsonl --concurrency 16
+
+Each input line is {"prompt": "...", "preferences": "...", "history": [...], "id": ...}; only prompt is
+required (id defaults to the line number). Conversations run as arun_assistant coroutines on one event
+loop, at most --concurrency at a time, sharing the tool registry's caches and the HTTP connection pools.
+Results are written as JSONL in completion order, each with per-item timings; a throughput summary
+(conversations per minute) goes to stderr at the end.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, TextIO
+
+import http_client
+from assistant import arun_assistant
+from config import BATCH_CONCURRENCY
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def run_item(item: dict, llm: Any, tool_registry: Any, mode: str | None = None) -> dict:
+    """Run one conversation turn; returns the output record (answer, plan, flags, stats, timings)."""
+    start = time.perf_counter()
+    first_token = None
+    plan = None
+    record: dict = {"id": item.get("id")}
+    async for event in arun_assistant(
+        item.get("history") or [],
+        item["prompt"],
+        llm,
+        tool_registry,
+        user_preferences=item.get("preferences"),
+        mode=mode,
+    ):
+        kind = event[0]
+        if first_token is None and kind in ("plan_delta", "delta"):
+            first_token = time.perf_counter()
+        if kind == "plan":
+            plan = event[1]
+        elif kind == "stats":
+            record["stats"] = event[1]
+        elif kind == "result":
+            record.update(answer=event[1], plan=plan, weather_api_used=event[2], places_api_used=event[3])
+    end = time.perf_counter()
+    record["timings"] = {
+        "first_token_ms": round(1000 * (first_token - start), 1) if first_token is not None else None,
+        "total_ms": round(1000 * (end - start), 1),
+    }
+    return record
+
+
+def _parse(line: str, line_no: int) -> dict:
+    item = json.loads(line)
+    if not isinstance(item, dict) or not str(item.get("prompt") or "").strip():
+        raise ValueError("each line must be a JSON object with a non-empty 'prompt'")
+    item.setdefault("id", line_no)
+    return item
+
+
+async def run_batch(
+    lines: TextIO,
+    out: TextIO,
+    llm: Any,
+    tool_registry: Any,
+    concurrency: int = BATCH_CONCURRENCY,
+    mode: str | None = None,
+) -> dict:
+    """
+    Run every request in lines with at most concurrency in flight; write one JSON line to out per request
+    as it completes. Returns a summary: counts, elapsed time, conversations per minute, latency percentiles.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2 * concurrency)  # bounded: input is read as workers free up
+    totals: list[float] = []
+    first_tokens: list[float] = []
+    errors = 0
+    start = time.perf_counter()
+
+    def emit(record: dict) -> None:
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+
+    async def worker() -> None:
+        nonlocal errors
+        while (entry := await queue.get()) is not None:
+            line_no, line = entry
+            item_start = time.perf_counter()
+            try:
+                record = await run_item(_parse(line, line_no), llm, tool_registry, mode)
+            except Exception as e:
+                errors += 1
+                emit({"id": line_no, "error": str(e), "timings": {"total_ms": round(1000 * (time.perf_counter() - item_start), 1)}})
+                continue
+            totals.append(record["timings"]["total_ms"])
+            if record["timings"]["first_token_ms"] is not None:
+                first_tokens.append(record["timings"]["first_token_ms"])
+            emit(record)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    for line_no, line in enumerate(lines, 1):
+        if line.strip():
+            await queue.put((line_no, line))
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - start
+    return {
+        "conversations": len(totals),
+        "errors": errors,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "conversations_per_minute": round(60 * len(totals) / elapsed, 1) if elapsed else 0.0,
+        "first_token_p50_ms": round(_percentile(first_tokens, 0.5), 1),
+        "total_p50_ms": round(_percentile(totals, 0.5), 1),
+        "total_p95_ms": round(_percentile(totals, 0.95), 1),
+        "tool_cache": tool_registry.cache_stats() if hasattr(tool_registry, "cache_stats") else {},
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run assistant requests from a JSONL file concurrently.")
+    parser.add_argument("input", help="JSONL file of requests ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results file ('-' for stdout)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--mode", choices=("two_phase", "single_call"), help="Orchestration mode (default ORCHESTRATION_MODE)")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    args = parser.parse_args(argv)
+
+    from openai import AsyncOpenAI
+
+    from assistant import AsyncOpenAILLMClient
+    from config import OPENAI_API_KEY
+    from tools import tool_registry
+
+    if not OPENAI_API_KEY:
+        raise SystemExit("Error: OPENAI_API_KEY is not set in .env")
+    llm = AsyncOpenAILLMClient(AsyncOpenAI(api_key=OPENAI_API_KEY), model=args.model)
+
+    async def run() -> dict:
+        source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        try:
+            return await run_batch(source, out, llm, tool_registry, args.concurrency, args.mode)
+        finally:
+            await http_client.aclose()
+            if source is not sys.stdin:
+                source.close()
+            if out is not sys.stdout:
+                out.close()
+
+    print(json.dumps(asyncio.run(run())), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
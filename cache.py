@@ -0,0 +1,521 @@
+"""
+In-memory TTL cache used by the tool implementations.
+Entries are fresh for their TTL, then served stale for a grace window while one background refresh runs.
+Lookups are single-flight: concurrent misses for one key share a single loader call, other keys load in parallel.
+Sync (get_or_load) and async (aget_or_load) callers share the same entries and in-flight loads. An async load
+runs as its own task: cancelling one caller never cancels it for the others, and it is only cancelled
+(and the key released for a fresh load) once every caller waiting on it is gone.
+Loads serve every waiter, so they run without the turn deadline (scheduler.current_deadline) and keep the
+upstream's own timeouts; a caller's deadline only bounds how long that caller waits (TimeoutError).
+
+Tool results can also be cached declaratively (CachePolicy): TieredCache puts a TTLCache in front of
+SqliteStore, an on-disk tier shared by every worker process on the host.
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Future
+from typing import Any, NamedTuple
+
+from scheduler import current_deadline, time_left
+
+
+def _is_none(value: Any) -> bool:
+    return value is None
+
+
+class _Abandoned(Exception):
+    """Resolves a flight whose load was cancelled or interrupted: its waiters claim the key again."""
+
+
+def _wait_timeout() -> float | None:
+    """Seconds the current caller may wait on another load: until its deadline, if it has one."""
+    left = time_left()
+    return None if left is None else max(0.0, left)
+
+
+def _consume(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
+
+
+class _Flight:
+    """One in-flight load: the Future its callers wait on, how many are waiting, and the async load task (if any)."""
+
+    __slots__ = ("future", "waiters", "task")
+
+    def __init__(self) -> None:
+        self.future: Future = Future()
+        self.waiters = 0
+        self.task: asyncio.Task | None = None
+
+
+class TTLCache:
+    """Thread-safe, size-bounded (LRU) key -> value cache with per-entry TTL and stale-while-revalidate."""
+
+    def __init__(
+        self,
+        ttl: float | Callable[[Any], float],
+        stale_ttl: float = 0.0,
+        *,
+        maxsize: int | None = None,
+        negative_ttl: float | None = None,
+        is_negative: Callable[[Any], bool] = _is_none,
+    ) -> None:
+        """
+        ttl is seconds, or a callable computing seconds from the loaded value.
+        Values for which is_negative(value) is true (default: None) use negative_ttl instead;
+        negative_ttl=0 disables caching them.
+        """
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._maxsize = maxsize
+        self._negative_ttl = negative_ttl
+        self._is_negative = is_negative
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._inflight: dict[Hashable, _Flight] = {}
+        self._refreshing: set[Hashable] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "inflight_waits": 0, "evictions": 0}
+
+    def _ttl_for(self, value: Any) -> float:
+        if self._negative_ttl is not None and self._is_negative(value):
+            return self._negative_ttl
+        return self._ttl(value) if callable(self._ttl) else self._ttl
+
+    def _store(self, key: Hashable, value: Any, ttl: float) -> None:
+        """Insert under self._lock, evicting least recently used entries past maxsize."""
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        if self._maxsize is not None:
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def put(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        ttl = self._ttl_for(value) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh or stale-but-servable value without triggering a load or refresh."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() > entry[1] + self._stale_ttl:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _claim(self, key: Hashable) -> tuple[str, Any]:
+        """
+        Under the lock, decide how to serve key: ("hit", value); ("refresh", value) for a stale value
+        this caller must refresh in the background; ("wait", flight) for another caller's in-flight
+        load; or ("load", flight) when this caller must load and resolve it. Both flight cases count
+        the caller as one of the flight's waiters until it calls _leave().
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if now <= expires_at:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return "hit", value
+            if now <= expires_at + self._stale_ttl:
+                self._entries.move_to_end(key)
+                self._stats["stale_hits"] += 1
+                if key not in self._refreshing and key not in self._inflight:
+                    self._refreshing.add(key)
+                    return "refresh", value
+                return "hit", value
+            del self._entries[key]
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self._stats["inflight_waits"] += 1
+            flight.waiters += 1
+            return "wait", flight
+        self._stats["misses"] += 1
+        flight = self._inflight[key] = _Flight()
+        flight.waiters += 1
+        return "load", flight
+
+    def _resolve(self, key: Hashable, flight: _Flight, value: Any = None, error: Exception | None = None) -> None:
+        """Finish a flight: store value (unless error), release the key and wake its waiters."""
+        with self._lock:
+            if error is None:
+                ttl = self._ttl_for(value)
+                if ttl > 0:
+                    self._store(key, value, ttl)
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+        if error is None:
+            flight.future.set_result(value)
+        else:
+            flight.future.set_exception(error)
+
+    def _leave(self, key: Hashable, flight: _Flight) -> None:
+        """A caller stopped waiting on flight. When it was the last one, cancel the async load and release the key."""
+        with self._lock:
+            flight.waiters -= 1
+            task = flight.task
+            if flight.waiters > 0 or task is None or flight.future.done():
+                return
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+        task.get_loop().call_soon_threadsafe(task.cancel)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, calling loader() on a miss.
+        Concurrent callers for the same key wait on the one in-flight load.
+        A stale entry is returned immediately and refreshed in a background thread.
+        Exceptions from loader propagate to every waiter and are not cached.
+        A caller with a deadline runs its load in a background thread, so that it can stop waiting
+        (TimeoutError) while the load goes on for the others; without one, it loads in its own thread.
+        """
+        while True:
+            with self._lock:
+                action, value = self._claim(key)
+            if action == "refresh":
+                threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+            if action in ("hit", "refresh"):
+                return value
+            if action == "load":
+                if time_left() is None:
+                    try:
+                        return self._load(key, value, loader)
+                    finally:
+                        self._leave(key, value)
+                context = contextvars.copy_context()  # keeps current_priority for the load's HTTP calls
+                threading.Thread(target=context.run, args=(self._load_quietly, key, value, loader), daemon=True).start()
+            try:
+                return value.future.result(_wait_timeout())
+            except _Abandoned:
+                continue  # the load was cancelled: claim the key again
+            finally:
+                self._leave(key, value)
+
+    def _load(self, key: Hashable, flight: _Flight, loader: Callable[[], Any]) -> Any:
+        token = current_deadline.set(None)
+        try:
+            result = loader()
+        except Exception as e:
+            self._resolve(key, flight, error=e)
+            raise
+        except BaseException:
+            self._resolve(key, flight, error=_Abandoned())
+            raise
+        finally:
+            current_deadline.reset(token)
+        self._resolve(key, flight, result)
+        return result
+
+    def _load_quietly(self, key: Hashable, flight: _Flight, loader: Callable[[], Any]) -> None:
+        try:
+            self._load(key, flight, loader)
+        except BaseException:
+            pass  # the flight carries the outcome to its waiters
+
+    async def aget_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async get_or_load: loader is a coroutine function, run as its own task. Shares in-flight loads
+        with sync callers, and refreshes stale entries in a background task.
+        Cancelling a caller only stops its own wait; the load is cancelled once no caller is left waiting on it.
+        """
+        while True:
+            with self._lock:
+                action, value = self._claim(key)
+            if action == "refresh":
+                self._spawn(self._arefresh(key, loader))
+            if action in ("hit", "refresh"):
+                return value
+            if action == "load":
+                task = self._spawn(self._aload(key, value, loader))
+                with self._lock:
+                    value.task = task
+            waiter = asyncio.wrap_future(value.future)
+            waiter.add_done_callback(_consume)  # a caller cancelled out of the shield never reads its outcome
+            try:
+                return await asyncio.wait_for(asyncio.shield(waiter), _wait_timeout())
+            except _Abandoned:
+                continue
+            finally:
+                self._leave(key, value)
+
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _aload(self, key: Hashable, flight: _Flight, loader: Callable[[], Awaitable[Any]]) -> None:
+        current_deadline.set(None)  # this task's own context
+        try:
+            result = await loader()
+        except Exception as e:
+            self._resolve(key, flight, error=e)
+        except BaseException:
+            # Cancelled (every waiter left) or interrupted: never hand CancelledError to other callers.
+            self._resolve(key, flight, error=_Abandoned())
+            raise
+        else:
+            self._resolve(key, flight, result)
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        try:
+            self.put(key, loader())
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def _arefresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> None:
+        current_deadline.set(None)
+        try:
+            self.put(key, await loader())
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self) -> dict[str, int]:
+        """Counters since creation plus current size and number of in-flight loads."""
+        with self._lock:
+            return {**self._stats, "size": len(self._entries), "inflight": len(self._inflight)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+# --- Shared on-disk tier ---
+
+
+class SqliteStore:
+    """
+    Key -> text value store in one SQLite file (WAL mode), shared by every worker process on a host
+    and kept across restarts. Expiry uses wall-clock time so all processes agree on it.
+    Rows past max_rows are trimmed (soonest-expiring first) every _PRUNE_EVERY writes.
+    A separate demand table counts user requests per key (record_demand), apart from what is cached,
+    so that warming the cache does not count as traffic.
+    """
+
+    _PRUNE_EVERY = 256
+    _DEMAND_KEEP_S = 30 * 24 * 3600
+
+    def __init__(self, path: str, max_rows: int = 100_000) -> None:
+        self.path = path
+        self._max_rows = max_rows
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not shared across threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (ns, key)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS demand ("
+                "ns TEXT NOT NULL, key TEXT NOT NULL, requests INTEGER NOT NULL, last_seen REAL NOT NULL, "
+                "PRIMARY KEY (ns, key)) WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, ns: str, key: str) -> tuple[str, float] | None:
+        """(value, seconds left) for a live entry, else None."""
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache WHERE ns = ? AND key = ? AND expires_at > ?", (ns, key, now)
+        ).fetchone()
+        return (row[0], row[1] - now) if row else None
+
+    def put(self, ns: str, key: str, value: str, ttl: float) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (ns, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (ns, key, value, time.time() + ttl),
+        )
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self._PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def record_demand(self, ns: str, key: str) -> None:
+        """Count one user request for key."""
+        self._conn().execute(
+            "INSERT INTO demand (ns, key, requests, last_seen) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT (ns, key) DO UPDATE SET requests = requests + 1, last_seen = excluded.last_seen",
+            (ns, key, time.time()),
+        )
+
+    def demand(self, ns: str, since: float) -> list[tuple[str, int]]:
+        """(key, requests) under ns for keys last requested after since (time.time())."""
+        return self._conn().execute(
+            "SELECT key, requests FROM demand WHERE ns = ? AND last_seen > ?", (ns, since)
+        ).fetchall()
+
+    def prune(self) -> None:
+        """Drop expired rows, then the soonest-expiring rows beyond max_rows, and demand idle for _DEMAND_KEEP_S."""
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        conn.execute("DELETE FROM demand WHERE last_seen <= ?", (time.time() - self._DEMAND_KEEP_S,))
+        conn.execute(
+            "DELETE FROM cache WHERE (ns, key) IN "
+            "(SELECT ns, key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self._max_rows,),
+        )
+
+
+# --- Declarative tool-result caching ---
+
+
+def _default_key(args: dict) -> str:
+    return json.dumps(args, sort_keys=True, default=str)
+
+
+class CachePolicy(NamedTuple):
+    """How a registered tool's results are cached (see ToolRegistry.register(cache=...))."""
+
+    ttl: float | Callable[[Any], float]  # seconds, or computed from the result
+    maxsize: int = 1024  # in-process entries
+    key: Callable[[dict], str] = _default_key  # tool arguments -> cache key
+    shared: bool = True  # also use the on-disk tier shared by all worker processes
+    cacheable: Callable[[Any], bool] = lambda result: True  # results failing this are never stored
+
+
+class TieredCache:
+    """
+    One tool's result cache: an in-process TTLCache (LRU, single-flight) in front of an optional
+    SqliteStore. A miss in memory checks the shared tier before calling the tool, and fresh results are
+    written to both. Counts memory hits, shared-tier hits and misses (tool executions) for hit rates.
+    """
+
+    def __init__(self, name: str, policy: CachePolicy, store: SqliteStore | None = None) -> None:
+        self.name = name
+        self._policy = policy
+        self._store = store if policy.shared else None
+        self._memory = TTLCache(
+            policy.ttl,
+            maxsize=policy.maxsize,
+            negative_ttl=0,
+            is_negative=lambda value: not policy.cacheable(value),
+        )
+        self._stats = {"shared_hits": 0, "misses": 0, "shared_errors": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _ttl(self, value: Any) -> float:
+        return self._policy.ttl(value) if callable(self._policy.ttl) else self._policy.ttl
+
+    def _shared_get(self, key: str) -> tuple[Any, float] | None:
+        try:
+            entry = self._store.get(self.name, key)
+        except sqlite3.Error:
+            self._count("shared_errors")
+            return None
+        if entry is not None:
+            self._count("shared_hits")
+        return entry
+
+    def _shared_put(self, key: str, value: Any) -> None:
+        if not self._policy.cacheable(value) or self._ttl(value) <= 0:
+            return
+        try:
+            self._store.put(self.name, key, value, self._ttl(value))
+        except sqlite3.Error:
+            self._count("shared_errors")
+
+    def record_demand(self, args: dict) -> None:
+        """Count a user request for args in the shared tier's demand table (no-op without a store)."""
+        if self._store is None:
+            return
+        try:
+            self._store.record_demand(self.name, self._policy.key(args))
+        except sqlite3.Error:
+            self._count("shared_errors")
+
+    def get_or_load(self, args: dict, loader: Callable[[], Any]) -> Any:
+        key = self._policy.key(args)
+        shared: tuple[Any, float] | None = None
+
+        def load() -> Any:
+            nonlocal shared
+            if self._store is not None:
+                shared = self._shared_get(key)
+                if shared is not None:
+                    return shared[0]
+            self._count("misses")
+            value = loader()
+            if self._store is not None:
+                self._shared_put(key, value)
+            return value
+
+        value = self._memory.get_or_load(key, load)
+        if shared is not None:
+            self._memory.put(key, value, ttl=shared[1])  # expire with the shared entry, not a fresh TTL
+        return value
+
+    async def aget_or_load(self, args: dict, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Async get_or_load; shared-tier reads and writes run in a worker thread."""
+        key = self._policy.key(args)
+        shared: tuple[Any, float] | None = None
+
+        async def load() -> Any:
+            nonlocal shared
+            if self._store is not None:
+                shared = await asyncio.to_thread(self._shared_get, key)
+                if shared is not None:
+                    return shared[0]
+            self._count("misses")
+            value = await loader()
+            if self._store is not None:
+                await asyncio.to_thread(self._shared_put, key, value)
+            return value
+
+        value = await self._memory.aget_or_load(key, load)
+        if shared is not None:
+            self._memory.put(key, value, ttl=shared[1])
+        return value
+
+    def stats(self) -> dict[str, Any]:
+        """Memory hits, shared-tier hits, misses (tool executions) and the overall hit rate."""
+        memory = self._memory.stats()
+        with self._lock:
+            stats = dict(self._stats)
+        hits = memory["hits"] + memory["stale_hits"] + memory["inflight_waits"]
+        lookups = hits + stats["shared_hits"] + stats["misses"]
+        return {
+            "memory_hits": hits,
+            **stats,
+            "size": memory["size"],
+            "hit_rate": round((hits + stats["shared_hits"]) / lookups, 3) if lookups else None,
+        }
@@ -30,3 +30,112 @@ PLACE_CATEGORIES = {
     "museum": '["tourism"~"museum|gallery"]',
     "park": '["leisure"~"park|garden"]',
 }
+
+# Forecast cache: OpenWeather refreshes the 5-day/3-hour series every 3 hours
+FORECAST_REFRESH_INTERVAL_S = 3 * 3600
+FORECAST_CACHE_STALE_S = int(os.getenv("FORECAST_CACHE_STALE_S", "1800"))
+# get_current_temperature reads the city's cached forecast when a 3-hour slot is within this many seconds
+# of now (one upstream fetch per city for both weather tools); otherwise it asks the current-weather endpoint
+WEATHER_CURRENT_MAX_SLOT_DISTANCE_S = int(os.getenv("WEATHER_CURRENT_MAX_SLOT_DISTANCE_S", "5400"))
+
+# Geocode cache: bounded LRU; "not found" results expire much sooner than hits
+GEOCODE_CACHE_MAXSIZE = int(os.getenv("GEOCODE_CACHE_MAXSIZE", "4096"))
+GEOCODE_CACHE_TTL_S = int(os.getenv("GEOCODE_CACHE_TTL_S", str(7 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL_S = int(os.getenv("GEOCODE_NEGATIVE_TTL_S", "600"))
+
+# Tool execution: size of the process-wide tool worker pool (HTTP pools are sized to match)
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "32"))
+
+# Per-host HTTP settings: (connect, read) timeouts in seconds, retry count, and whether POST is retried
+# (Overpass queries are read-only, so retrying the POST is safe)
+HTTP_HOST_SETTINGS = {
+    "api.openweathermap.org": {"timeout": (3.05, 5), "retries": 2, "retry_post": False},
+    "nominatim.openstreetmap.org": {"timeout": (3.05, 10), "retries": 1, "retry_post": False},
+    "overpass-api.de": {"timeout": (3.05, 20), "retries": 1, "retry_post": True},
+}
+HTTP_DEFAULT_TIMEOUT = (3.05, 10)
+
+# Process-wide upstream limits: token bucket (rate_per_s, burst) and max concurrent requests per host.
+# Nominatim's usage policy is 1 request/second; OpenWeather's free tier is 60 calls/minute;
+# the public Overpass instance allows a couple of concurrent queries per client.
+UPSTREAM_LIMITS = {
+    "api.openweathermap.org": {"rate_per_s": float(os.getenv("OPENWEATHER_RATE_PER_S", "1.0")), "burst": 10, "max_in_flight": 16},
+    "nominatim.openstreetmap.org": {"rate_per_s": 1.0, "burst": 1, "max_in_flight": 1},
+    "overpass-api.de": {"rate_per_s": None, "burst": 1, "max_in_flight": 2},
+}
+HTTP_RETRY_BACKOFF_S = 0.3
+
+# Per-host circuit breaker: after this many consecutive failures a host is skipped (calls fail fast)
+# for CIRCUIT_BREAKER_RESET_S, then one trial request decides whether it is back
+CIRCUIT_BREAKER_FAILURES = int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5"))
+CIRCUIT_BREAKER_RESET_S = float(os.getenv("CIRCUIT_BREAKER_RESET_S", "30"))
+
+# Turn latency budget: tool calls must finish within TURN_DEADLINE_S of the turn's start (HTTP timeouts
+# are clamped to the time left); a tool still running TOOL_DEADLINE_GRACE_S after it returns its degraded payload
+TURN_DEADLINE_S = float(os.getenv("TURN_DEADLINE_S", "12"))
+TOOL_DEADLINE_GRACE_S = 0.25
+
+# Overpass: search radius, and how long one all-categories result per location is reused
+# (search_places calls for one location within this window share a single Overpass query)
+OVERPASS_RADIUS_M = 5000
+# The whole Overpass response is scanned: no server-side count cap, so its size is bounded only by OVERPASS_RADIUS_M
+# and the query's 20 s server timeout. OVERPASS_MAX_CANDIDATES nearest places per category are kept; `limit` are returned
+OVERPASS_MAX_CANDIDATES = int(os.getenv("OVERPASS_MAX_CANDIDATES", "100"))
+OVERPASS_COALESCE_WINDOW_S = int(os.getenv("OVERPASS_COALESCE_WINDOW_S", "300"))
+
+# Offline POI index (built with `python poi_index.py ingest`); used before Overpass when the file exists
+POI_INDEX_PATH = os.getenv("POI_INDEX_PATH", "data/poi_index.bin")
+
+# Offline gazetteer (GeoNames cities dump, e.g. cities15000.txt); Nominatim is used only on a miss
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", "data/cities15000.txt")
+GAZETTEER_MIN_POPULATION = int(os.getenv("GAZETTEER_MIN_POPULATION", "0"))
+GAZETTEER_ALTERNATE_NAMES = os.getenv("GAZETTEER_ALTERNATE_NAMES", "1") == "1"
+# Optional GeoNames countryInfo.txt: lets country names ("Paris, France") narrow a lookup like ISO codes do
+GAZETTEER_COUNTRIES_PATH = os.getenv("GAZETTEER_COUNTRIES_PATH", "data/countryInfo.txt")
+
+# Speculative prefetch while the plan streams: warm forecast/places caches for up to
+# PREFETCH_MAX_LOCATIONS destinations per turn, named in the user message or plan and known to the
+# gazetteer with at least PREFETCH_MIN_POPULATION inhabitants
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_MAX_LOCATIONS = int(os.getenv("PREFETCH_MAX_LOCATIONS", "3"))
+PREFETCH_MIN_POPULATION = int(os.getenv("PREFETCH_MIN_POPULATION", "50000"))
+
+# Orchestration for requests that get a plan: "two_phase" streams the plan in its own completion
+# (tool_choice="none") before executing it; "single_call" asks for the plan and the first tool calls
+# in one completion, saving a full LLM round trip
+ORCHESTRATION_MODE = os.getenv("ORCHESTRATION_MODE", "two_phase")
+
+# plan_destination: include parks only when the highest daily precipitation chance in the stay is below this
+PARK_MAX_PRECIPITATION_CHANCE = int(os.getenv("PARK_MAX_PRECIPITATION_CHANCE", "50"))
+
+# Conversation history sent with each completion: once over HISTORY_TOKEN_BUDGET (estimated tokens),
+# turns older than the last HISTORY_KEEP_RECENT_TURNS are folded into a capped rolling summary
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))
+HISTORY_KEEP_RECENT_TURNS = int(os.getenv("HISTORY_KEEP_RECENT_TURNS", "3"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "600"))
+
+# Follow-up turns: digest of the previous turn's tool results kept in history (capped in characters),
+# (repeated identical calls are answered by the registry's tool-result cache below)
+TOOL_DIGEST_MAX_CHARS = int(os.getenv("TOOL_DIGEST_MAX_CHARS", "2000"))
+
+# Registry-level tool-result cache: in-process LRU per tool, optionally in front of an on-disk SQLite (WAL)
+# tier shared by all worker processes on the host and kept across restarts (opt in with a TOOL_CACHE_PATH,
+# e.g. data/tool_cache.sqlite; off by default)
+TOOL_CACHE_PATH = os.getenv("TOOL_CACHE_PATH", "")
+TOOL_CACHE_SHARED_MAX_ROWS = int(os.getenv("TOOL_CACHE_SHARED_MAX_ROWS", "100000"))
+CURRENT_WEATHER_CACHE_TTL_S = int(os.getenv("CURRENT_WEATHER_CACHE_TTL_S", "600"))
+PLACES_CACHE_TTL_S = int(os.getenv("PLACES_CACHE_TTL_S", str(24 * 3600)))
+# warm_cache --from-traffic: how far back user requests count toward a destination's rank
+WARM_TRAFFIC_WINDOW_S = int(os.getenv("WARM_TRAFFIC_WINDOW_S", str(7 * 24 * 3600)))
+
+# HTTP/SSE server (server.py): concurrent turns per worker (more get 503; turns are coroutines, not threads)
+# and in-memory session limits
+SERVER_MAX_TURNS = int(os.getenv("SERVER_MAX_TURNS", "256"))
+SERVER_MAX_SESSIONS = int(os.getenv("SERVER_MAX_SESSIONS", "10000"))
+SERVER_SESSION_TTL_S = int(os.getenv("SERVER_SESSION_TTL_S", "3600"))
+
+# Streamlit UI: streamed text is re-rendered at most once per interval (seconds)
+UI_RENDER_INTERVAL_S = float(os.getenv("UI_RENDER_INTERVAL_S", "0.05"))
+
+# Batch runner (batch.py): conversations in flight at once
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
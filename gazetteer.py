@@ -0,0 +1,277 @@
+"""
+Offline gazetteer: resolves city names to coordinates and a canonical "City, CC" identity in-process.
+
+Loaded from a GeoNames cities dump (e.g. cities15000.txt from https://download.geonames.org/export/dump/).
+Names are normalized (case, accents, punctuation) and kept in one sorted array that acts as an implicit
+prefix trie: prefix lookups are a bisect range, and typo-tolerant lookups walk it depth-first with a
+Levenshtein row per shared prefix, skipping whole subtrees that cannot match.
+
+Only exact name matches resolve a location; a near miss is often a different place ('Capri' vs 'Carpi'),
+so typo-tolerant matches are offered as suggestions only. Country hints ('Paris, FR', 'Paris, France'
+with the GeoNames countryInfo.txt loaded) narrow the match; any other hint ('Paris, Texas') is left to Nominatim.
+"""
+
+import bisect
+import threading
+import unicodedata
+from array import array
+from os.path import commonprefix
+from pathlib import Path
+from typing import NamedTuple
+
+from config import GAZETTEER_ALTERNATE_NAMES, GAZETTEER_COUNTRIES_PATH, GAZETTEER_MIN_POPULATION, GAZETTEER_PATH
+
+
+class City(NamedTuple):
+    name: str
+    country: str
+    lat: float
+    lon: float
+    population: int
+
+    @property
+    def canonical(self) -> str:
+        """One identity per city, used as a cache key across tools (e.g. 'Paris, FR')."""
+        return f"{self.name}, {self.country}" if self.country else self.name
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents, turn punctuation into spaces and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    chars = []
+    for ch in decomposed:
+        if unicodedata.combining(ch):
+            continue
+        chars.append(ch.lower() if ch.isalnum() else " ")
+    return " ".join("".join(chars).split())
+
+
+def _max_typos(query: str) -> int:
+    return 0 if len(query) <= 3 else 1 if len(query) <= 7 else 2
+
+
+class Gazetteer:
+    """Array-backed city index. Build with Gazetteer.load(path)."""
+
+    def __init__(self) -> None:
+        self._names: list[str] = []
+        self._countries: list[str] = []
+        self._lat = array("d")
+        self._lon = array("d")
+        self._population = array("Q")
+        self._keys: list[str] = []  # sorted normalized names (duplicates allowed)
+        self._key_city = array("I")  # parallel to _keys: city index
+        self._country_codes: set[str] = set()
+        self._country_names: dict[str, str] = {}  # normalized country name or ISO3 code -> lowercase ISO code
+
+    @classmethod
+    def load(
+        cls,
+        path: str | Path,
+        min_population: int = 0,
+        alternate_names: bool = True,
+        countries_path: str | Path | None = None,
+    ) -> "Gazetteer":
+        """Load a GeoNames cities dump (tab-separated geoname table), plus country names from countryInfo.txt if given."""
+        gaz = cls()
+        if countries_path is not None:
+            gaz._load_countries(countries_path)
+        pairs: list[tuple[str, int]] = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) < 15:
+                    continue
+                population = int(cols[14] or 0)
+                if population < min_population:
+                    continue
+                idx = len(gaz._names)
+                gaz._names.append(cols[1])
+                gaz._countries.append(cols[8])
+                gaz._lat.append(float(cols[4]))
+                gaz._lon.append(float(cols[5]))
+                gaz._population.append(population)
+                gaz._country_codes.add(cols[8].lower())
+                names = {cols[1], cols[2]}
+                if alternate_names and cols[3]:
+                    names.update(cols[3].split(","))
+                for key in {normalize(n) for n in names}:
+                    if key and key.isascii():
+                        pairs.append((key, idx))
+        pairs.sort()
+        gaz._keys = [k for k, _ in pairs]
+        gaz._key_city = array("I", (i for _, i in pairs))
+        return gaz
+
+    def _load_countries(self, path: str | Path) -> None:
+        """Country names and ISO3 codes from a GeoNames countryInfo.txt, so 'Paris, France' is a country hint."""
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#"):
+                    continue
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) < 5 or not cols[0]:
+                    continue
+                code = cols[0].lower()
+                for name in (cols[1], cols[4]):
+                    if normalize(name):
+                        self._country_names[normalize(name)] = code
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _city(self, i: int) -> City:
+        return City(self._names[i], self._countries[i], self._lat[i], self._lon[i], self._population[i])
+
+    def _exact(self, key: str) -> list[int]:
+        lo = bisect.bisect_left(self._keys, key)
+        hi = bisect.bisect_right(self._keys, key, lo)
+        return [self._key_city[j] for j in range(lo, hi)]
+
+    def _prefix_range(self, prefix: str) -> range:
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + "\U0010ffff", lo)
+        return range(lo, hi)
+
+    def _fuzzy(self, query: str, max_dist: int) -> list[tuple[int, int]]:
+        """
+        (edit_distance, city_index) for keys within max_dist edits (incl. transpositions) of query.
+        Only keys sharing the query's first character are searched: typos there are rare and it
+        keeps the walk to one subtree.
+        """
+        keys = self._keys
+        rows = [list(range(len(query) + 1))]  # rows[d]: DP row after the first d chars of the current prefix
+        prev = ""
+        out: list[tuple[int, int]] = []
+        subtree = self._prefix_range(query[:1])
+        i = subtree.start
+        while i < subtree.stop:
+            key = keys[i]
+            depth = len(commonprefix([prev, key]))
+            del rows[depth + 1 :]
+            pruned = False
+            for d in range(depth, len(key)):
+                ch = key[d]
+                above = rows[-1]
+                above2 = rows[-2] if d >= 1 else None
+                row = [above[0] + 1]
+                for j in range(1, len(query) + 1):
+                    cost = min(row[j - 1] + 1, above[j] + 1, above[j - 1] + (query[j - 1] != ch))
+                    if above2 is not None and j >= 2 and query[j - 1] == key[d - 1] and query[j - 2] == ch:
+                        cost = min(cost, above2[j - 2] + 1)
+                    row.append(cost)
+                rows.append(row)
+                if min(row) > max_dist:
+                    # No key under this prefix can get back within max_dist: skip the whole subtree.
+                    prev = key[: d + 1]
+                    i = self._prefix_range(prev).stop
+                    pruned = True
+                    break
+            if pruned:
+                continue
+            if rows[-1][-1] <= max_dist:
+                out.append((rows[-1][-1], self._key_city[i]))
+            prev = key
+            i += 1
+        return out
+
+    def _country(self, hint: str) -> str | None:
+        """Lowercase ISO code for a country hint (ISO code, ISO3 code or country name), or None if it is not one."""
+        if hint in self._country_codes:
+            return hint
+        return self._country_names.get(hint)
+
+    def _split_query(self, location: str) -> tuple[str, list[str]]:
+        """Split 'Paris, France' / 'Paris FR' into (normalized name, normalized hints after the name)."""
+        parts = [normalize(p) for p in (location or "").split(",")]
+        name, hints = parts[0], [p for p in parts[1:] if p]
+        if not hints:
+            tokens = name.rsplit(" ", 1)
+            if len(tokens) == 2 and self._country(tokens[1]) and not self._exact(name):
+                name, hints = tokens[0], [tokens[1]]
+        return name, hints
+
+    def _most_populous(self, indices: list[int]) -> City | None:
+        return self._city(max(indices, key=lambda i: self._population[i])) if indices else None
+
+    def resolve(self, location: str) -> City | None:
+        """
+        City whose name (or alternate name) equals location's after normalization, most populous first.
+        Every hint must be a known country, which the city must be in; a hint that is not one (a state,
+        region or unknown country) returns None, as do near misses (see similar()).
+        """
+        name, hints = self._split_query(location)
+        if not name:
+            return None
+        countries = {self._country(h) for h in hints}
+        if None in countries or len(countries) > 1:
+            return None
+        matches = self._exact(name)
+        if countries:
+            matches = [i for i in matches if self._countries[i].lower() in countries]
+        return self._most_populous(matches)
+
+    def exact(self, name: str) -> City | None:
+        """Most populous city whose name (or alternate name) equals name after normalization; no hints, no typo tolerance."""
+        return self._most_populous(self._exact(normalize(name)))
+
+    def similar(self, location: str, limit: int = 5) -> list[City]:
+        """
+        Cities named within a few typos of location (closest, then most populous first). For suggestions
+        only, never for resolving: the nearest spelling is often another place.
+        """
+        name, _ = self._split_query(location)
+        max_dist = _max_typos(name)
+        if max_dist == 0:
+            return []
+        best: dict[int, int] = {}
+        for dist, i in self._fuzzy(name, max_dist):
+            best[i] = min(dist, best.get(i, dist))
+        ranked = sorted(best, key=lambda i: (best[i], -self._population[i]))
+        return [self._city(i) for i in ranked[:limit]]
+
+    def suggest(self, prefix: str, limit: int = 10) -> list[City]:
+        """Most populous cities with a name starting with prefix."""
+        seen: set[int] = set()
+        for j in self._prefix_range(normalize(prefix)):
+            seen.add(self._key_city[j])
+        ranked = sorted(seen, key=lambda i: -self._population[i])
+        return [self._city(i) for i in ranked[:limit]]
+
+
+_gazetteer: Gazetteer | None = None
+_gazetteer_loaded = False
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer | None:
+    """Load the gazetteer at GAZETTEER_PATH once, if the file exists."""
+    global _gazetteer, _gazetteer_loaded
+    with _gazetteer_lock:
+        if not _gazetteer_loaded:
+            _gazetteer_loaded = True
+            path = Path(GAZETTEER_PATH) if GAZETTEER_PATH else None
+            if path is not None and path.exists():
+                try:
+                    countries = Path(GAZETTEER_COUNTRIES_PATH) if GAZETTEER_COUNTRIES_PATH else None
+                    _gazetteer = Gazetteer.load(
+                        path,
+                        GAZETTEER_MIN_POPULATION,
+                        GAZETTEER_ALTERNATE_NAMES,
+                        countries if countries is not None and countries.exists() else None,
+                    )
+                except (OSError, ValueError):
+                    _gazetteer = None
+        return _gazetteer
+
+
+def lookup(location: str) -> City | None:
+    """Resolve location with the offline gazetteer, or None if it is not loaded or has no exact match."""
+    gaz = get_gazetteer()
+    return gaz.resolve(location) if gaz is not None else None
+
+
+def did_you_mean(location: str, limit: int = 3) -> list[str]:
+    """Canonical names of cities spelled like location, for 'not found' messages; [] without a gazetteer."""
+    gaz = get_gazetteer()
+    return [city.canonical for city in gaz.similar(location, limit)] if gaz is not None else []
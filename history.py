@@ -0,0 +1,182 @@
+"""
+Token-budgeted conversation history. Recent turns are kept verbatim; once the history is over
+HISTORY_TOKEN_BUDGET, older turns are folded into a rolling extractive summary kept as a system
+message (marked with SUMMARY_PREFIX), and the summary itself is capped at HISTORY_SUMMARY_MAX_TOKENS.
+
+The latest turn's tool results survive as a compact digest (a system message marked with DIGEST_PREFIX),
+so follow-ups can reuse weather and places instead of calling the tools again. A turn without tool calls
+keeps the previous digest: it is still the newest data the conversation has.
+"""
+
+import json
+
+from config import HISTORY_KEEP_RECENT_TURNS, HISTORY_SUMMARY_MAX_TOKENS, HISTORY_TOKEN_BUDGET, TOOL_DIGEST_MAX_CHARS
+from router import estimate_tokens
+
+SUMMARY_PREFIX = "Summary of earlier conversation (oldest first):\n"
+DIGEST_PREFIX = "Tool results from the previous turn (reuse these instead of calling the same tools again):\n"
+_DIGEST_PLACES_PER_CATEGORY = 8
+_MESSAGE_OVERHEAD_TOKENS = 4  # role and separators per chat message
+_EXCERPT_CHARS = 240
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(message.get("content") or "") + _MESSAGE_OVERHEAD_TOKENS
+
+
+def history_tokens(messages: list[dict]) -> int:
+    """Estimated tokens of messages, including per-message overhead."""
+    return sum(message_tokens(m) for m in messages)
+
+
+def is_summary(message: dict) -> bool:
+    return message.get("role") == "system" and (message.get("content") or "").startswith(SUMMARY_PREFIX)
+
+
+def is_digest(message: dict) -> bool:
+    return message.get("role") == "system" and (message.get("content") or "").startswith(DIGEST_PREFIX)
+
+
+def _excerpt(text: str) -> str:
+    """Leading part of text on one line, cut at a word boundary."""
+    flat = " ".join((text or "").split())
+    if len(flat) <= _EXCERPT_CHARS:
+        return flat
+    return flat[:_EXCERPT_CHARS].rsplit(" ", 1)[0] + " …"
+
+
+def _summary_lines(turn: list[dict]) -> list[str]:
+    lines = []
+    for m in turn:
+        label = "User" if m["role"] == "user" else "Assistant"
+        lines.append(f"- {label}: {_excerpt(m.get('content', ''))}")
+    return lines
+
+
+def _split_turns(messages: list[dict]) -> list[list[dict]]:
+    """Group user/assistant messages into turns, each starting at a user message."""
+    turns: list[list[dict]] = []
+    for m in messages:
+        if m["role"] == "user" or not turns:
+            turns.append([])
+        turns[-1].append(m)
+    return turns
+
+
+def compact_history(
+    history: list[dict],
+    budget: int = HISTORY_TOKEN_BUDGET,
+    keep_recent: int = HISTORY_KEEP_RECENT_TURNS,
+    summary_max_tokens: int = HISTORY_SUMMARY_MAX_TOKENS,
+) -> tuple[list[dict], int]:
+    """
+    Fit trimmed history (system prompt, optional summary, user/assistant turns) into budget tokens;
+    the system prompt itself is not counted (it is rebuilt every turn).
+    Turns older than the last keep_recent are folded into the summary; if the recent turns alone are
+    still over budget, the oldest of them are folded too (the latest turn is always kept verbatim).
+    Returns (history, tokens saved).
+    """
+    head = [m for m in history if m.get("role") == "system" and not is_summary(m) and not is_digest(m)][:1]
+    body = [m for m in history if not (head and m is head[0])]
+    digests = [m for m in body if is_digest(m)]
+    before = history_tokens(body)
+    if before <= budget:
+        return list(history), 0
+
+    summary_lines: list[str] = []
+    for m in body:
+        if is_summary(m):
+            summary_lines.extend(m["content"][len(SUMMARY_PREFIX):].splitlines())
+    turns = _split_turns([m for m in body if m.get("role") in ("user", "assistant")])
+
+    def total(lines: list[str], kept: list[list[dict]]) -> int:
+        summary = [{"content": SUMMARY_PREFIX + "\n".join(lines)}] if lines else []
+        return history_tokens(summary) + history_tokens(digests) + sum(history_tokens(t) for t in kept)
+
+    fold = max(0, len(turns) - keep_recent)
+    while True:
+        for turn in turns[:fold]:
+            summary_lines.extend(_summary_lines(turn))
+        kept = turns[fold:]
+        turns, fold = kept, 0
+        # Oldest summary lines go first once the summary is over its own cap.
+        while summary_lines and estimate_tokens("\n".join(summary_lines)) > summary_max_tokens:
+            summary_lines.pop(0)
+        if total(summary_lines, kept) <= budget or len(kept) <= 1:
+            break
+        fold = 1
+
+    compacted = []
+    if summary_lines:
+        compacted.append({"role": "system", "content": SUMMARY_PREFIX + "\n".join(summary_lines)})
+    for turn in kept:
+        compacted.extend(turn)
+    compacted.extend(digests)
+    return head + compacted, max(0, before - history_tokens(compacted))
+
+# --- Tool-result digest ---
+
+
+def _fmt_temp(value) -> str:
+    return "?" if value is None else f"{value:.0f}"
+
+
+def _fmt_precip(value) -> str:
+    return "precip ?" if value is None else f"precip {value}%"
+
+
+def _digest_forecast(days: list[dict]) -> str:
+    return "; ".join(
+        f"{d.get('date')} {_fmt_temp(d.get('temp_min_celsius'))}-{_fmt_temp(d.get('temp_max_celsius'))}°C "
+        f"{d.get('description') or ''}, {_fmt_precip(d.get('precipitation_chance_percent'))}"
+        for d in days
+    )
+
+
+def _digest_places(places: list[dict]) -> str:
+    parts = []
+    for p in places[:_DIGEST_PLACES_PER_CATEGORY]:
+        if p.get("lat") is not None and p.get("lon") is not None:
+            parts.append(f"{p['name']} ({p['lat']:.4f},{p['lon']:.4f})")
+        else:
+            parts.append(p.get("name", ""))
+    return ", ".join(parts)
+
+
+def _digest_line(name: str, args: dict, result: str) -> str | None:
+    """One digest line for a successful tool result; None for errors and knowledge fallbacks."""
+    try:
+        data = json.loads(result)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict) or "error" in data or data.get("use_knowledge"):
+        return None
+    if name == "get_weather_forecast":
+        return f"- forecast {data.get('location')}: {_digest_forecast(data.get('forecast', []))}"
+    if name == "get_current_temperature":
+        return f"- now {data.get('location')}: {_fmt_temp(data.get('temperature_celsius'))}°C {data.get('description', '')}"
+    if name == "search_places":
+        return f"- {args.get('category', 'restaurant')}s near {data.get('location')}: {_digest_places(data.get('places', []))}"
+    if name == "plan_destination":
+        lines = []
+        for city in data.get("destinations", []):
+            line = f"- {city.get('location')}: forecast {_digest_forecast(city.get('forecast', []))}"
+            for cat, places in city.get("places", {}).items():
+                line += f" | {cat}s: {_digest_places(places)}"
+            lines.append(line)
+        return "\n".join(lines) or None
+    return None
+
+
+def tool_digest(calls: list[tuple[str, dict, str]], max_chars: int = TOOL_DIGEST_MAX_CHARS) -> dict | None:
+    """
+    System message digesting (tool name, args, result) calls: locations, dates, temperatures, precipitation
+    and place names/coordinates, at most max_chars long. None if no call produced usable data.
+    """
+    lines = [line for name, args, result in calls if (line := _digest_line(name, args, result))]
+    if not lines:
+        return None
+    content = DIGEST_PREFIX + "\n".join(lines)
+    if len(content) > max_chars:
+        content = content[: max_chars - 1].rsplit(" ", 1)[0] + "…"
+    return {"role": "system", "content": content}
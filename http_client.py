@@ -0,0 +1,464 @@
+"""
+Shared HTTP layer for tool calls: one keep-alive connection pool per upstream host,
+per-host connect/read timeouts, and jittered-backoff retries for idempotent requests.
+Sync calls use a pooled requests session; async calls use one httpx.AsyncClient per event loop.
+Every attempt, retries included, waits for the host's limiter (a rate token and an in-flight slot),
+and a streamed response holds its slot until it is closed. Streamed requests are retried like the others
+until their body is handed over, never after.
+
+Timeouts are clamped to the time left before the turn deadline (scheduler.current_deadline; unset inside
+shared cache loads, which keep the host's own timeouts), and a per-host circuit breaker fails calls fast
+while a host is down; both raise UpstreamUnavailable.
+"""
+
+import asyncio
+import contextlib
+import random
+import threading
+import time
+import weakref
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    CIRCUIT_BREAKER_FAILURES,
+    CIRCUIT_BREAKER_RESET_S,
+    HTTP_DEFAULT_TIMEOUT,
+    HTTP_HOST_SETTINGS,
+    HTTP_RETRY_BACKOFF_S,
+    REQUEST_HEADERS,
+    TOOL_MAX_WORKERS,
+)
+from scheduler import host_limiter, time_left
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _build_session() -> tuple[requests.Session, dict[str, HTTPAdapter]]:
+    """Session with one pool per host. Retries are not left to urllib3: request() retries through the host limiter."""
+    session = requests.Session()
+    session.headers.update(REQUEST_HEADERS)
+    adapters: dict[str, HTTPAdapter] = {}
+    for host in HTTP_HOST_SETTINGS:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=TOOL_MAX_WORKERS)
+        session.mount(f"https://{host}/", adapter)
+        adapters[host] = adapter
+    return session, adapters
+
+
+_session, _adapters = _build_session()
+_counters: dict[str, dict[str, int]] = {}
+_counters_lock = threading.Lock()
+
+
+def _count(host: str, key: str) -> None:
+    with _counters_lock:
+        host_counters = _counters.setdefault(host, {"requests": 0, "errors": 0, "short_circuited": 0})
+        host_counters[key] += 1
+
+
+class UpstreamUnavailable(requests.RequestException):
+    """Raised without (or instead of) sending a request: the host's circuit is open or the turn deadline has passed."""
+
+
+# --- Circuit breaker ---
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker for one host. Closed until `failures` failures in a row, then open
+    (calls are refused) for reset_s; after that one trial request is let through (half-open), and
+    its outcome closes the circuit or opens it again.
+    """
+
+    def __init__(self, host: str, failures: int = CIRCUIT_BREAKER_FAILURES, reset_s: float = CIRCUIT_BREAKER_RESET_S) -> None:
+        self.host = host
+        self._threshold = failures
+        self._reset_s = reset_s
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened_at >= self._reset_s else "open"
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def allow(self) -> bool:
+        """May a request go out now? Every allowed request must be followed by record()."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record(self, ok: bool | None) -> None:
+        """Outcome of an allowed request: True success, False failure, None inconclusive (e.g. cut short by the deadline)."""
+        with self._lock:
+            self._trial = False
+            if ok is None:
+                return
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self._threshold:
+                self._opened_at = time.monotonic()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def _breaker(host: str) -> CircuitBreaker:
+    with _counters_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+def _admit(host: str) -> CircuitBreaker:
+    """The host's breaker, if it lets a request through; raises UpstreamUnavailable otherwise."""
+    breaker = _breaker(host)
+    if not breaker.allow():
+        _count(host, "short_circuited")
+        raise UpstreamUnavailable(f"{host} is failing; skipped for up to {CIRCUIT_BREAKER_RESET_S:.0f}s")
+    return breaker
+
+
+def _deadline_timeout(host: str, timeout: float | tuple[float, float] | None) -> tuple[float | tuple[float, float], bool]:
+    """(timeout, clamped): the host's default timeout unless given, cut to the time left before the deadline."""
+    if timeout is None:
+        timeout = HTTP_HOST_SETTINGS.get(host, {}).get("timeout", HTTP_DEFAULT_TIMEOUT)
+    left = time_left()
+    if left is None:
+        return timeout, False
+    if left <= 0:
+        raise UpstreamUnavailable(f"Turn deadline passed before the {host} request")
+    if isinstance(timeout, tuple):
+        return tuple(min(t, left) for t in timeout), max(timeout) > left
+    return min(timeout, left), timeout > left
+
+
+def _retry_delay(attempt: int, response: httpx.Response | requests.Response | None) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return random.uniform(0, HTTP_RETRY_BACKOFF_S * (2 ** attempt))
+
+
+def _time_for(delay: float) -> bool:
+    """Is there time for a retry after sleeping delay seconds before the deadline?"""
+    left = time_left()
+    return left is None or delay < left
+
+
+def _idempotent(method: str, settings: dict) -> bool:
+    return method.upper() in ("GET", "HEAD") or (method.upper() == "POST" and bool(settings.get("retry_post")))
+
+
+def request(method: str, url: str, *, timeout: float | tuple[float, float] | None = None, **kwargs) -> requests.Response:
+    """
+    Send a request through the shared session. timeout defaults to the host's (connect, read) setting.
+    Each attempt waits for the host's rate/concurrency limiter first, in current_priority order, and the
+    body is read before its slot is released (use stream() for bodies read incrementally).
+    Idempotent requests are retried on connection errors and RETRY_STATUSES with jittered backoff
+    (honoring Retry-After), while the deadline leaves time for it.
+    Raises requests.RequestException like requests.request does (UpstreamUnavailable when skipped).
+    """
+    host = urlsplit(url).hostname or ""
+    settings = HTTP_HOST_SETTINGS.get(host, {})
+    retries = settings.get("retries", 0)
+    idempotent = _idempotent(method, settings)
+    limiter = host_limiter(host)
+    attempt = 0
+    while True:
+        timeout_s, clamped = _deadline_timeout(host, timeout)
+        breaker = _admit(host)
+        if attempt == 0:
+            _count(host, "requests")
+        outcome = None
+        try:
+            with limiter.slot() if limiter is not None else contextlib.nullcontext():
+                resp = _session.request(method, url, timeout=timeout_s, **kwargs)
+            outcome = resp.status_code < 500
+        except TimeoutError as e:  # no limiter slot before the deadline
+            raise UpstreamUnavailable(str(e)) from None
+        except requests.RequestException as e:
+            if not (clamped and isinstance(e, requests.Timeout)):
+                outcome = False
+            # Connect timeouts never reached the server, so they are safe to retry for any method.
+            retryable = idempotent or isinstance(e, requests.ConnectTimeout)
+            delay = _retry_delay(attempt, None)
+            if attempt >= retries or not retryable or not _time_for(delay):
+                _count(host, "errors")
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        finally:
+            breaker.record(outcome)
+        if resp.status_code in RETRY_STATUSES and idempotent and attempt < retries:
+            delay = _retry_delay(attempt, resp)
+            if _time_for(delay):
+                resp.close()
+                time.sleep(delay)
+                attempt += 1
+                continue
+        return resp
+
+
+@contextmanager
+def stream(method: str, url: str, *, timeout: float | tuple[float, float] | None = None, **kwargs) -> Iterator[requests.Response]:
+    """
+    Sync counterpart of astream(): a response whose body is read incrementally. The host's limiter slot
+    is held until the response is closed on exit. Retries follow request()'s policy, each attempt back
+    through the limiter, but only before the response is yielded: once its body is read, errors propagate.
+    """
+    host = urlsplit(url).hostname or ""
+    settings = HTTP_HOST_SETTINGS.get(host, {})
+    retries = settings.get("retries", 0)
+    idempotent = _idempotent(method, settings)
+    limiter = host_limiter(host)
+    attempt = 0
+    while True:
+        timeout_s, clamped = _deadline_timeout(host, timeout)
+        breaker = _admit(host)
+        if attempt == 0:
+            _count(host, "requests")
+        outcome = None
+        delay = None
+        with contextlib.ExitStack() as held:
+            try:
+                held.enter_context(limiter.slot() if limiter is not None else contextlib.nullcontext())
+                try:
+                    resp = _session.request(method, url, timeout=timeout_s, stream=True, **kwargs)
+                except requests.RequestException as e:
+                    retryable = idempotent or isinstance(e, requests.ConnectTimeout)
+                    delay = _retry_delay(attempt, None)
+                    if attempt >= retries or not retryable or not _time_for(delay):
+                        raise
+                    if not (clamped and isinstance(e, requests.Timeout)):
+                        outcome = False
+                else:
+                    held.callback(resp.close)
+                    outcome = resp.status_code < 500
+                    if resp.status_code in RETRY_STATUSES and idempotent and attempt < retries:
+                        delay = _retry_delay(attempt, resp)
+                    if delay is None or not _time_for(delay):
+                        yield resp
+                        return
+            except TimeoutError as e:  # no limiter slot before the deadline
+                raise UpstreamUnavailable(str(e)) from None
+            except requests.RequestException as e:
+                _count(host, "errors")
+                if not (clamped and isinstance(e, requests.Timeout)):
+                    outcome = False
+                raise
+            finally:
+                breaker.record(outcome)
+        time.sleep(delay)  # slot released, response closed
+        attempt += 1
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def pool_stats() -> dict[str, dict[str, int]]:
+    """Per-host request/error counts, circuit state and connection pool usage (connections opened, idle, pool size)."""
+    with _counters_lock:
+        stats = {host: dict(c) for host, c in _counters.items()}
+        breakers = dict(_breakers)
+    for host, breaker in breakers.items():
+        stats.setdefault(host, {"requests": 0, "errors": 0, "short_circuited": 0})["circuit"] = breaker.state
+    for host, adapter in _adapters.items():
+        host_stats = stats.setdefault(host, {"requests": 0, "errors": 0, "short_circuited": 0})
+        host_stats.update({"connections_opened": 0, "idle_connections": 0, "pool_maxsize": TOOL_MAX_WORKERS})
+        pools = adapter.poolmanager.pools
+        for pool_key in list(pools.keys()):
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            host_stats["connections_opened"] += pool.num_connections
+            if pool.pool is not None:
+                host_stats["idle_connections"] += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+    return stats
+
+# --- Async client ---
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def _async_client() -> httpx.AsyncClient:
+    """The shared AsyncClient for the running event loop (clients cannot be shared across loops)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            headers=REQUEST_HEADERS,
+            limits=httpx.Limits(
+                max_connections=TOOL_MAX_WORKERS * max(1, len(HTTP_HOST_SETTINGS)),
+                max_keepalive_connections=TOOL_MAX_WORKERS,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _async_timeout(timeout: float | tuple[float, float]) -> httpx.Timeout:
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+async def arequest(
+    method: str,
+    url: str,
+    *,
+    timeout: float | tuple[float, float] | None = None,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Async counterpart of request(), with the same per-host timeouts, retry policy, deadline and breaker.
+    Raises httpx.HTTPError on transport failures, UpstreamUnavailable when the request is skipped.
+    """
+    host = urlsplit(url).hostname or ""
+    settings = HTTP_HOST_SETTINGS.get(host, {})
+    retries = settings.get("retries", 0)
+    idempotent = _idempotent(method, settings)
+    client = _async_client()
+    limiter = host_limiter(host)
+    attempt = 0
+    while True:
+        timeout_s, clamped = _deadline_timeout(host, timeout)
+        breaker = _admit(host)
+        if attempt == 0:
+            _count(host, "requests")
+        outcome = None
+        try:
+            if limiter is None:
+                resp = await client.request(method, url, timeout=_async_timeout(timeout_s), **kwargs)
+            else:
+                async with limiter.aslot():
+                    resp = await client.request(method, url, timeout=_async_timeout(timeout_s), **kwargs)
+            outcome = resp.status_code < 500
+        except TimeoutError as e:  # no limiter slot before the deadline
+            raise UpstreamUnavailable(str(e)) from None
+        except httpx.TransportError as e:
+            if not (clamped and isinstance(e, httpx.TimeoutException)):
+                outcome = False
+            # Connect failures never reached the server, so they are safe to retry for any method.
+            retryable = idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+            delay = _retry_delay(attempt, None)
+            if attempt >= retries or not retryable or not _time_for(delay):
+                _count(host, "errors")
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        finally:
+            breaker.record(outcome)
+        if resp.status_code in RETRY_STATUSES and idempotent and attempt < retries:
+            delay = _retry_delay(attempt, resp)
+            if _time_for(delay):
+                await resp.aclose()
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+        return resp
+
+
+async def aget(url: str, **kwargs) -> httpx.Response:
+    return await arequest("GET", url, **kwargs)
+
+
+async def apost(url: str, **kwargs) -> httpx.Response:
+    return await arequest("POST", url, **kwargs)
+
+
+@asynccontextmanager
+async def astream(
+    method: str,
+    url: str,
+    *,
+    timeout: float | tuple[float, float] | None = None,
+    **kwargs,
+) -> AsyncIterator[httpx.Response]:
+    """
+    Stream a response body, holding the host's limiter slot until the response is closed on exit.
+    Retried like arequest() until the response is yielded, never after.
+    """
+    host = urlsplit(url).hostname or ""
+    settings = HTTP_HOST_SETTINGS.get(host, {})
+    retries = settings.get("retries", 0)
+    idempotent = _idempotent(method, settings)
+    limiter = host_limiter(host)
+    attempt = 0
+    while True:
+        timeout_s, clamped = _deadline_timeout(host, timeout)
+        breaker = _admit(host)
+        if attempt == 0:
+            _count(host, "requests")
+        outcome = None
+        delay = None
+        async with contextlib.AsyncExitStack() as held:
+            try:
+                if limiter is not None:
+                    await held.enter_async_context(limiter.aslot())
+                try:
+                    resp = await held.enter_async_context(
+                        _async_client().stream(method, url, timeout=_async_timeout(timeout_s), **kwargs)
+                    )
+                except httpx.TransportError as e:
+                    retryable = idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                    delay = _retry_delay(attempt, None)
+                    if attempt >= retries or not retryable or not _time_for(delay):
+                        raise
+                    if not (clamped and isinstance(e, httpx.TimeoutException)):
+                        outcome = False
+                else:
+                    outcome = resp.status_code < 500
+                    if resp.status_code in RETRY_STATUSES and idempotent and attempt < retries:
+                        delay = _retry_delay(attempt, resp)
+                    if delay is None or not _time_for(delay):
+                        yield resp
+                        return
+            except TimeoutError as e:  # no limiter slot before the deadline
+                raise UpstreamUnavailable(str(e)) from None
+            except httpx.TransportError as e:
+                _count(host, "errors")
+                if not (clamped and isinstance(e, httpx.TimeoutException)):
+                    outcome = False
+                raise
+            finally:
+                breaker.record(outcome)
+        await asyncio.sleep(delay)  # slot released, response closed
+        attempt += 1
+
+
+async def aclose() -> None:
+    """Close the running loop's AsyncClient (call before the loop shuts down)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
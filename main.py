@@ -8,6 +8,7 @@ from openai import OpenAI
 from assistant import OpenAILLMClient, run_assistant
 from config import OPENAI_API_KEY, OPENWEATHER_API_KEY
 from preferences import load_user_preferences, save_user_preferences
+from prompt_layout import PrefixTracker
 from tools import tool_registry
 
 PREFERENCES_PROMPT = (
@@ -41,6 +42,7 @@ def main():
         print()
 
     conversation_history: list = []
+    prefix_tracker = PrefixTracker()
 
     while True:
         try:
@@ -59,7 +61,12 @@ def main():
         streamed_response = False
         streamed_plan = False
         for event in run_assistant(
-            conversation_history, user_input, llm, tool_registry, user_preferences=user_preferences
+            conversation_history,
+            user_input,
+            llm,
+            tool_registry,
+            user_preferences=user_preferences,
+            prefix_tracker=prefix_tracker,
         ):
             kind = event[0]
             if kind == "plan_delta":
@@ -0,0 +1,364 @@
+"""
+Offline POI store backing search_places: restaurants, museums and parks from a local OSM extract.
+
+The store is one binary file of packed arrays (coordinates, category, string offsets, grid cells)
+that is memory-mapped read-only, with a fixed-degree grid index for radius and k-nearest queries.
+
+Build it with:
+    python poi_index.py ingest data/poi_index.bin paris.json london.osm.pbf
+where inputs are Overpass JSON dumps (`[out:json]` with `out center tags`) or OSM PBF extracts
+(PBF needs the optional `osmium` package).
+"""
+
+import argparse
+import bisect
+import heapq
+import json
+import math
+import mmap
+import re
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+from config import PLACE_CATEGORIES
+
+MAGIC = b"POIIDX1\0"
+CELL_DEG = 0.01  # ~1.1 km of latitude per grid cell
+COORD_SCALE = 10_000_000
+_GRID_COLS = math.ceil(360 / CELL_DEG)
+_M_PER_DEG = 111_320.0
+
+# --- Shared helpers (also used by tools.py for Overpass results) ---
+
+
+def _category_matchers() -> dict[str, list[tuple[str, re.Pattern]]]:
+    """Parse PLACE_CATEGORIES filters like '["amenity"~"restaurant|fast_food"]' into (tag, regex) pairs."""
+    return {
+        cat: [(tag, re.compile(pattern)) for tag, pattern in re.findall(r'\["([^"]+)"~"([^"]+)"\]', osm_filter)]
+        for cat, osm_filter in PLACE_CATEGORIES.items()
+    }
+
+
+_CATEGORY_MATCHERS = _category_matchers()
+
+
+def matching_categories(tags: dict) -> list[str]:
+    """Categories in PLACE_CATEGORIES whose OSM tag filters all match tags."""
+    return [
+        cat
+        for cat, matchers in _CATEGORY_MATCHERS.items()
+        if all(tag in tags and rx.search(tags[tag]) for tag, rx in matchers)
+    ]
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(a))
+
+
+def _cell_row_col(lat: float, lon: float) -> tuple[int, int]:
+    return int((lat + 90) // CELL_DEG), int((lon + 180) // CELL_DEG) % _GRID_COLS
+
+
+def _address(tags: dict) -> str:
+    addr = tags.get("addr:street") or tags.get("address") or ""
+    if tags.get("addr:housenumber"):
+        addr = f"{tags.get('addr:housenumber', '')} {addr}".strip()
+    return addr
+
+# --- Read side ---
+
+
+class PoiStore:
+    """Read-only, memory-mapped POI store. Open with PoiStore.open(path)."""
+
+    def __init__(self, buf, header: dict) -> None:
+        self._buf = buf
+        self.header = header
+        self.categories: list[str] = header["categories"]
+        self.kinds: list[str] = header["kinds"]
+        self.regions: list[list[float]] = header["regions"]
+        view = memoryview(buf)
+
+        def section(name: str, fmt: str):
+            offset, length = header["sections"][name]
+            return view[offset : offset + length].cast(fmt)
+
+        self._lat = section("lat", "i")
+        self._lon = section("lon", "i")
+        self._category = section("category", "B")
+        self._kind = section("kind", "B")
+        self._name_off = section("name_off", "I")
+        self._addr_off = section("addr_off", "I")
+        self._cell_keys = section("cell_keys", "q")
+        self._cell_start = section("cell_start", "I")
+        self._strings = section("strings", "B")
+
+    @classmethod
+    def open(cls, path: str | Path) -> "PoiStore":
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if buf[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a POI index file")
+        (header_len,) = struct.unpack_from("<I", buf, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(buf[start : start + header_len]))
+        return cls(buf, header)
+
+    def __len__(self) -> int:
+        return len(self._lat)
+
+    def covers(self, lat: float, lon: float) -> bool:
+        """True if (lat, lon) lies inside one of the ingested regions' bounding boxes."""
+        return any(s <= lat <= n and w <= lon <= e for s, w, n, e in self.regions)
+
+    def _string(self, offsets, i: int) -> str:
+        return bytes(self._strings[offsets[i] : offsets[i + 1]]).decode("utf-8")
+
+    def place(self, i: int) -> dict:
+        """Place dict in the same shape search_places returns for Overpass results."""
+        return {
+            "name": self._string(self._name_off, i),
+            "category": self.kinds[self._kind[i]],
+            "address": self._string(self._addr_off, i) or None,
+            "lat": self._lat[i] / COORD_SCALE,
+            "lon": self._lon[i] / COORD_SCALE,
+        }
+
+    def _cell_range(self, row: int, col: int) -> range:
+        key = row * _GRID_COLS + col
+        j = bisect.bisect_left(self._cell_keys, key)
+        if j == len(self._cell_keys) or self._cell_keys[j] != key:
+            return range(0)
+        return range(self._cell_start[j], self._cell_start[j + 1])
+
+    def _scan_cells(self, cells, lat: float, lon: float, cat_idx: int | None):
+        """Yield (approx_distance_m, index) for points in cells, optionally of one category."""
+        kx = _M_PER_DEG * math.cos(math.radians(lat))
+        lat_i, lon_i = lat * COORD_SCALE, lon * COORD_SCALE
+        lats, lons, cats = self._lat, self._lon, self._category
+        for row, col in cells:
+            for i in self._cell_range(row, col):
+                if cat_idx is not None and cats[i] != cat_idx:
+                    continue
+                dy = (lats[i] - lat_i) / COORD_SCALE * _M_PER_DEG
+                dx = (lons[i] - lon_i) / COORD_SCALE * kx
+                yield math.hypot(dx, dy), i
+
+    def _category_index(self, category: str | None) -> int | None:
+        if category is None:
+            return None
+        return self.categories.index(category) if category in self.categories else -1
+
+    def radius(self, lat: float, lon: float, radius_m: float, category: str | None = None) -> list[tuple[float, int]]:
+        """All (distance_m, index) within radius_m of (lat, lon), nearest first."""
+        cat_idx = self._category_index(category)
+        row0, col0 = _cell_row_col(lat, lon)
+        dr = math.ceil(radius_m / _M_PER_DEG / CELL_DEG)
+        dc = math.ceil(radius_m / (_M_PER_DEG * max(math.cos(math.radians(lat)), 1e-6)) / CELL_DEG)
+        cells = ((r, (col0 + c) % _GRID_COLS) for r in range(row0 - dr, row0 + dr + 1) for c in range(-dc, dc + 1))
+        return sorted((d, i) for d, i in self._scan_cells(cells, lat, lon, cat_idx) if d <= radius_m)
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int,
+        category: str | None = None,
+        max_radius_m: float | None = None,
+    ) -> list[tuple[float, int]]:
+        """
+        The k nearest (distance_m, index) to (lat, lon), nearest first.
+        Scans rings of grid cells outward and stops once no unscanned cell can beat the k-th best.
+        """
+        cat_idx = self._category_index(category)
+        if k <= 0 or cat_idx == -1:
+            return []
+        row0, col0 = _cell_row_col(lat, lon)
+        cell_m = CELL_DEG * _M_PER_DEG * max(math.cos(math.radians(abs(lat) + CELL_DEG)), 1e-6)
+        max_ring = math.ceil((max_radius_m or 50_000) / cell_m) + 1
+        best: list[tuple[float, int]] = []  # max-heap as (-distance, index)
+        for ring in range(max_ring + 1):
+            if ring == 0:
+                cells = [(row0, col0)]
+            else:
+                cells = [(row0 + dr, (col0 + dc) % _GRID_COLS)
+                         for dr in range(-ring, ring + 1)
+                         for dc in range(-ring, ring + 1)
+                         if max(abs(dr), abs(dc)) == ring]
+            for d, i in self._scan_cells(cells, lat, lon, cat_idx):
+                if max_radius_m is not None and d > max_radius_m:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-d, i))
+                elif d < -best[0][0]:
+                    heapq.heapreplace(best, (-d, i))
+            # Every point beyond this ring is at least ring * cell_m away.
+            if len(best) == k and -best[0][0] <= ring * cell_m:
+                break
+        return sorted((-nd, i) for nd, i in best)
+
+# --- Ingest ---
+
+
+def _overpass_records(path: Path):
+    """Yield (lat, lon, tags) from an Overpass JSON dump."""
+    data = json.loads(path.read_text(encoding="utf-8"))
+    for el in data.get("elements", []):
+        tags = el.get("tags")
+        if not tags:
+            continue
+        center = el.get("center") or el
+        if center.get("lat") is None or center.get("lon") is None:
+            continue
+        yield float(center["lat"]), float(center["lon"]), tags
+
+
+def _pbf_records(path: Path):
+    """Yield (lat, lon, tags) from an OSM PBF extract; ways use the mean of their node locations."""
+    try:
+        import osmium
+    except ImportError:
+        raise SystemExit("Reading .pbf extracts requires the 'osmium' package (pip install osmium)")
+
+    records: list[tuple[float, float, dict]] = []
+
+    class Handler(osmium.SimpleHandler):
+        def node(self, n):
+            tags = {t.k: t.v for t in n.tags}
+            if tags.get("name") and matching_categories(tags):
+                records.append((n.location.lat, n.location.lon, tags))
+
+        def way(self, w):
+            tags = {t.k: t.v for t in w.tags}
+            if not tags.get("name") or not matching_categories(tags):
+                return
+            locs = [(nd.location.lat, nd.location.lon) for nd in w.nodes if nd.location.valid()]
+            if locs:
+                records.append((sum(p[0] for p in locs) / len(locs), sum(p[1] for p in locs) / len(locs), tags))
+
+    Handler().apply_file(str(path), locations=True)
+    return records
+
+
+def ingest(output: str | Path, inputs: list[str | Path]) -> dict:
+    """Build a POI index file from Overpass JSON dumps and/or PBF extracts. Returns the header written."""
+    categories = list(PLACE_CATEGORIES)
+    kinds: list[str] = []
+    rows: list[tuple[int, int, int, int, int, str, str]] = []  # (cell_key, lat, lon, cat, kind, name, addr)
+    regions: list[list[float]] = []
+    seen: set[tuple[str, int, int, int]] = set()
+
+    for path in map(Path, inputs):
+        records = _pbf_records(path) if path.suffix == ".pbf" else _overpass_records(path)
+        south = west = math.inf
+        north = east = -math.inf
+        for lat, lon, tags in records:
+            name = tags.get("name") or tags.get("brand")
+            cats = matching_categories(tags)
+            if not name or not cats:
+                continue
+            south, north, west, east = min(south, lat), max(north, lat), min(west, lon), max(east, lon)
+            row, col = _cell_row_col(lat, lon)
+            lat_i, lon_i = round(lat * COORD_SCALE), round(lon * COORD_SCALE)
+            for cat in cats:
+                key = (name, categories.index(cat), lat_i // 1000, lon_i // 1000)
+                if key in seen:
+                    continue
+                seen.add(key)
+                kind = tags.get("amenity") or tags.get("tourism") or tags.get("leisure") or cat
+                if kind not in kinds:
+                    kinds.append(kind)
+                rows.append((row * _GRID_COLS + col, lat_i, lon_i, categories.index(cat), kinds.index(kind), name, _address(tags)))
+        if south <= north:
+            regions.append([south, west, north, east])
+    if len(kinds) > 255:
+        raise ValueError("Too many distinct place kinds for the index format")
+
+    rows.sort(key=lambda r: r[0])
+    lat_a, lon_a = array("i"), array("i")
+    cat_a, kind_a = array("B"), array("B")
+    name_off, addr_off = array("I", [0]), array("I", [0])
+    cell_keys, cell_start = array("q"), array("I")
+    names = bytearray()
+    addrs = bytearray()
+    for i, (cell, lat_i, lon_i, cat, kind, name, addr) in enumerate(rows):
+        if not cell_keys or cell_keys[-1] != cell:
+            cell_keys.append(cell)
+            cell_start.append(i)
+        lat_a.append(lat_i)
+        lon_a.append(lon_i)
+        cat_a.append(cat)
+        kind_a.append(kind)
+        names += name.encode("utf-8")
+        name_off.append(len(names))
+        addrs += addr.encode("utf-8")
+        addr_off.append(len(addrs))
+    cell_start.append(len(rows))
+    # Names and addresses share one blob: address offsets are shifted past the names.
+    addr_off = array("I", (o + len(names) for o in addr_off))
+    strings = bytes(names + addrs)
+
+    blobs = {
+        "lat": lat_a.tobytes(),
+        "lon": lon_a.tobytes(),
+        "category": cat_a.tobytes(),
+        "kind": kind_a.tobytes(),
+        "name_off": name_off.tobytes(),
+        "addr_off": addr_off.tobytes(),
+        "cell_keys": cell_keys.tobytes(),
+        "cell_start": cell_start.tobytes(),
+        "strings": strings,
+    }
+    header = {"count": len(rows), "cell_deg": CELL_DEG, "categories": categories, "kinds": kinds, "regions": regions}
+    # Section offsets depend on the header length, so size the header with placeholder offsets first.
+    header["sections"] = {name: [0, len(blob)] for name, blob in blobs.items()}
+    base = len(MAGIC) + 4 + len(json.dumps(header)) + 16 * len(blobs) + 64
+    offset = base
+    for name, blob in blobs.items():
+        offset += -offset % 8
+        header["sections"][name] = [offset, len(blob)]
+        offset += len(blob)
+    header_bytes = json.dumps(header).encode("utf-8")
+    assert len(header_bytes) <= base - len(MAGIC) - 4, "POI index header outgrew its reserved space"
+    header_bytes = header_bytes.ljust(base - len(MAGIC) - 4)
+
+    with open(output, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        for name, blob in blobs.items():
+            f.write(b"\0" * (header["sections"][name][0] - f.tell()))
+            f.write(blob)
+    return header
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build or query the offline POI index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_ingest = sub.add_parser("ingest", help="Build an index from Overpass JSON dumps or .osm.pbf extracts")
+    p_ingest.add_argument("output")
+    p_ingest.add_argument("inputs", nargs="+")
+    p_query = sub.add_parser("query", help="Print the nearest places to a point")
+    p_query.add_argument("index")
+    p_query.add_argument("lat", type=float)
+    p_query.add_argument("lon", type=float)
+    p_query.add_argument("--category", choices=list(PLACE_CATEGORIES))
+    p_query.add_argument("-k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.command == "ingest":
+        header = ingest(args.output, args.inputs)
+        print(f"Wrote {header['count']} places in {len(header['regions'])} region(s) to {args.output}")
+    else:
+        store = PoiStore.open(args.index)
+        for d, i in store.nearest(args.lat, args.lon, args.k, args.category):
+            print(f"{d:8.0f} m  {json.dumps(store.place(i), ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,134 @@
+"""
+Speculative prefetch: while the plan is streaming, guess the destinations from the user message and
+the plan text and warm the forecast/places caches, so execute-round tool calls mostly hit warm entries.
+
+Guesses are validated against the offline gazetteer (exact name, minimum population) and capped per
+turn. Warm-ups are tasks on the turn's event loop: they take no tool worker, and their limiter waits
+queue at PRIORITY_PREFETCH, behind every real tool call. Once the real tool calls are known all of them
+are cancelled, running ones included; a load a real call has already joined keeps going for that call
+(see cache.py), anything else gives its limiter slot back.
+"""
+
+import asyncio
+import re
+from collections.abc import Awaitable, Callable
+
+import gazetteer
+import tools
+from config import PREFETCH_MAX_LOCATIONS, PREFETCH_MIN_POPULATION
+from scheduler import PRIORITY_PREFETCH, current_priority
+
+_WORD = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+# Words after which a lowercase place name is still likely ("3 days in rome then florence").
+_PREPOSITIONS = frozenset({"in", "to", "visit", "visiting", "then", "from", "via", "and", "around", "near"})
+# Capitalized words that are also city names somewhere but almost never meant as one here.
+_STOPWORDS = frozenset(
+    {
+        "i", "day", "days", "plan", "step", "weather", "reading", "march", "may", "june", "july", "august",
+        "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", "today", "tomorrow",
+    }
+)
+_MAX_NAME_WORDS = 3
+# A chunk boundary inside a word or a multi-word name must not split it: only scan up to the last break.
+_BOUNDARY = re.compile(r"[.,;:!?()\n]")
+
+
+def candidate_names(text: str) -> list[str]:
+    """
+    Place-name candidates in text, longest first within each run: runs of capitalized words
+    ('New York', 'Rome') and lowercase words right after a preposition ('in rome').
+    """
+    words = [(m.group(), m.start(), m.end()) for m in _WORD.finditer(text or "")]
+    runs: list[list[str]] = []
+    run: list[str] = []
+    for i, (word, start, _) in enumerate(words):
+        adjacent = i > 0 and text[words[i - 1][2]:start].isspace()
+        capitalized = word[0].isupper() and word.lower() not in _STOPWORDS
+        after_preposition = i > 0 and words[i - 1][0].lower() in _PREPOSITIONS
+        if capitalized or (after_preposition and word.lower() not in _PREPOSITIONS):
+            if run and not adjacent:
+                runs.append(run)
+                run = []
+            run.append(word)
+        elif run:
+            runs.append(run)
+            run = []
+    if run:
+        runs.append(run)
+
+    out: list[str] = []
+    for run in runs:
+        for size in range(min(_MAX_NAME_WORDS, len(run)), 0, -1):
+            for start in range(len(run) - size + 1):
+                out.append(" ".join(run[start:start + size]))
+    return out
+
+
+async def _warm(warm: Callable[[str], Awaitable[None]], location: str) -> None:
+    current_priority.set(PRIORITY_PREFETCH)  # this task's context only
+    await warm(location)
+
+
+class Prefetcher:
+    """
+    Per-turn prefetcher, used from the turn's event loop. feed() text as it arrives (user message, plan deltas);
+    each newly recognized city starts a forecast warm-up task, plus a places warm-up when places=True.
+    cancel() stops every warm-up still running.
+    """
+
+    def __init__(self, places: bool = False, max_locations: int = PREFETCH_MAX_LOCATIONS) -> None:
+        self._places = places
+        self._max_locations = max_locations
+        self._buffer = ""
+        self._locations: list[str] = []
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def locations(self) -> list[str]:
+        """Canonical 'City, CC' names prefetched so far, in discovery order."""
+        return list(self._locations)
+
+    def feed(self, text: str, final: bool = False) -> None:
+        """Scan text up to its last word boundary (all of it when final) and prefetch new cities."""
+        self._buffer += text or ""
+        if final:
+            scan, self._buffer = self._buffer, ""
+        else:
+            last = None
+            for last in _BOUNDARY.finditer(self._buffer):
+                pass
+            if last is None:
+                return
+            scan, self._buffer = self._buffer[: last.end()], self._buffer[last.end():]
+        for name in candidate_names(scan):
+            if len(self._locations) >= self._max_locations:
+                return
+            self._consider(name)
+
+    def _consider(self, name: str) -> None:
+        gaz = gazetteer.get_gazetteer()
+        if gaz is None:
+            return  # no way to validate a guess offline: prefetching it could burn quota on a non-place
+        city = gaz.exact(name)
+        if city is None or city.population < PREFETCH_MIN_POPULATION:
+            return
+        location = city.canonical
+        if location in self._locations:
+            return
+        self._locations.append(location)
+        loop = asyncio.get_running_loop()
+        self._tasks.append(loop.create_task(_warm(tools.awarm_forecast, location)))
+        if self._places:
+            self._tasks.append(loop.create_task(_warm(tools.awarm_places, location)))
+
+    def cancel(self) -> int:
+        """Cancel warm-ups still running or waiting to start; returns how many were cancelled."""
+        return sum(1 for t in self._tasks if t.cancel())
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "locations": len(self._locations),
+            "submitted": len(self._tasks),
+            "done": sum(1 for t in self._tasks if t.done() and not t.cancelled()),
+            "cancelled": sum(1 for t in self._tasks if t.cancelled()),
+        }
@@ -0,0 +1,62 @@
+"""
+Request layout for provider prompt caching. Providers reuse the longest previously seen prefix of a
+request (tool schemas first, then messages in order), so requests are assembled most-static first:
+tool schemas, the static system prompt, per-user preferences, then history. The router sends a
+different schema list per route, so a request on another route than the previous one repeats only the
+schemas both routes send. PrefixTracker measures how much of each request repeats the one before it.
+"""
+
+import json
+import threading
+from os.path import commonprefix
+
+from history import is_digest, is_summary
+from router import estimate_tokens
+
+PREFERENCES_PREFIX = "User's travel preferences (use these to personalize recommendations and itineraries):\n"
+
+
+def is_preferences(message: dict) -> bool:
+    return message.get("role") == "system" and (message.get("content") or "").startswith(PREFERENCES_PREFIX)
+
+
+def assemble_messages(system_prompt: str, user_preferences: str | None, history: list[dict]) -> list[dict]:
+    """
+    [static system prompt, preferences (if any), history]. The system prompt and preferences already in
+    history are replaced; history summary and tool digest messages are kept in place.
+    """
+    messages = [{"role": "system", "content": system_prompt}]
+    if user_preferences and user_preferences.strip():
+        messages.append({"role": "system", "content": PREFERENCES_PREFIX + user_preferences.strip()})
+    for m in history:
+        if m.get("role") == "system" and not (is_summary(m) or is_digest(m)):
+            continue
+        messages.append(m)
+    return messages
+
+
+def _segments(tools: list[dict], messages: list[dict]) -> list[str]:
+    """The request serialized in provider order, one segment per tool schema and per message."""
+    return [json.dumps(t, sort_keys=True) for t in tools] + [json.dumps(m, sort_keys=True, default=str) for m in messages]
+
+
+class PrefixTracker:
+    """Remembers the last request and reports how many of the next one's (estimated) tokens are an identical prefix."""
+
+    def __init__(self) -> None:
+        self._previous: list[str] = []
+        self._lock = threading.Lock()
+
+    def observe(self, tools: list[dict], messages: list[dict]) -> tuple[int, int]:
+        """Record a request; returns (prefix tokens identical to the previous request, total tokens)."""
+        segments = _segments(tools, messages)
+        total = sum(estimate_tokens(s) for s in segments)
+        with self._lock:
+            previous, self._previous = self._previous, segments
+        shared = 0
+        for old, new in zip(previous, segments):
+            if old != new:
+                shared += len(commonprefix([old, new])) // 4
+                break
+            shared += estimate_tokens(new)
+        return min(shared, total), total
@@ -0,0 +1,75 @@
+"""
+Intent routing: one compiled keyword matcher decides, per request, which tool schemas and system
+prompt modules are sent. Weather-only turns get the two weather tools and the weather rules;
+anything mentioning places or a trip, both, or nothing recognizable gets the full set.
+
+A wrong weather-only route hides the places tools for the turn, while a wrong full route only costs
+tokens, so weather keywords match whole words only and places keywords match any word they start.
+"""
+
+import json
+import re
+from typing import NamedTuple
+
+from prompts import build_system_prompt
+
+# Whole words, inflections spelled out: "train", "temple" and "Sunday" are not weather.
+_WEATHER_KEYWORDS = (
+    "weather", "forecast", "forecasts", "temperature", "temperatures", "temp", "temps", "rain", "rainy", "raining",
+    "rainfall", "wind", "windy", "humidity", "humid", "cloud", "clouds", "cloudy", "sun", "sunny", "sunshine",
+    "snow", "snowy", "snowing", "storm", "stormy",
+)
+# Word starts: "restaurants", "galleries", "sightseeing", "eateries" all match.
+_PLACES_KEYWORDS = (
+    "itinerar", "plan a trip", "trip", "things to do", "what to do", "recommend", "suggest", "where to",
+    "restaurant", "museum", "park", "place", "poi", "eat", "food", "dine", "dining", "dinner", "lunch",
+    "breakfast", "brunch", "cafe", "café", "galler", "garden", "sight", "attraction", "tour", "activit",
+)
+
+
+def _alternation(keywords: tuple[str, ...]) -> str:
+    # Longest first so e.g. "temperature" is reported rather than its prefix "temp".
+    return "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+
+
+_MATCHER = re.compile(
+    rf"\b(?:(?P<places>{_alternation(_PLACES_KEYWORDS)})|(?P<weather>(?:{_alternation(_WEATHER_KEYWORDS)})\b))"
+)
+
+WEATHER_TOOLS = ("get_current_temperature", "get_weather_forecast")
+
+
+class Route(NamedTuple):
+    name: str  # "weather" or "full"
+    weather: bool  # message mentions weather
+    places: bool  # message asks for places, things to do or a trip
+    tools: tuple[str, ...] | None  # tool names to send; None = all registered tools
+    modules: tuple[str, ...] | None  # prompt modules to send; None = all
+
+    @property
+    def system_prompt(self) -> str:
+        return build_system_prompt(self.modules)
+
+
+def intents(text: str) -> set[str]:
+    """Intent kinds ("weather", "places") mentioned in text, found in one scan."""
+    return {m.lastgroup for m in _MATCHER.finditer((text or "").lower())}
+
+
+def route(text: str) -> Route:
+    """Weather tools and prompt only when weather is the sole intent found; otherwise everything."""
+    found = intents(text)
+    weather, places = "weather" in found, "places" in found
+    if weather and not places:
+        return Route("weather", weather, places, WEATHER_TOOLS, ("core", "weather", "errors"))
+    return Route("full", weather, places, None, None)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English prose and JSON)."""
+    return (len(text) + 3) // 4
+
+
+def prompt_tokens(system_prompt: str, schemas: list[dict]) -> int:
+    """Estimated tokens of the per-request static prefix: system prompt plus tool schemas."""
+    return estimate_tokens(system_prompt) + sum(estimate_tokens(json.dumps(s)) for s in schemas)
@@ -0,0 +1,319 @@
+"""
+Process-wide tool scheduling: one long-lived worker pool with a priority queue for tool calls,
+and per-upstream-host limiters (token-bucket rate + max in-flight) that HTTP calls wait on
+in priority order, so bursts queue up instead of turning into 429s. Sync code drives async
+code on one long-lived background event loop (run_coroutine).
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any
+
+from config import TOOL_MAX_WORKERS, UPSTREAM_LIMITS
+
+# Lower runs first. Weather gates the turn (trip planning waits on it), POI lookups can wait,
+# and speculative prefetches only use capacity nothing else is waiting for.
+PRIORITY_WEATHER = 0
+PRIORITY_DEFAULT = 5
+PRIORITY_POI = 10
+PRIORITY_PREFETCH = 20
+
+current_priority: contextvars.ContextVar[int] = contextvars.ContextVar("current_priority", default=PRIORITY_DEFAULT)
+# Absolute time.monotonic() by which the current tool call must finish (the turn's deadline); None = unbounded.
+# Shared cache loads (cache.TTLCache) run with it unset: it bounds each caller's wait, not the load.
+current_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("current_deadline", default=None)
+
+
+def time_left() -> float | None:
+    """Seconds until current_deadline (negative once it has passed); None without a deadline."""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class _WaitStats:
+    """Count / total / max of wait times in seconds."""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "avg_wait_ms": round(1000 * self.total / self.count, 2) if self.count else 0.0,
+            "max_wait_ms": round(1000 * self.max, 2),
+        }
+
+# --- Per-host limiter ---
+
+
+class _Ticket:
+    __slots__ = ("granted", "wake")
+
+    def __init__(self, wake: Callable[[], None]) -> None:
+        self.granted = False
+        self.wake = wake
+
+
+class HostLimiter:
+    """
+    Token bucket (rate_per_s, burst) plus a max-in-flight cap for one upstream host.
+    Waiters are granted slots in priority order, then FIFO.
+    """
+
+    def __init__(self, host: str, rate_per_s: float | None, burst: int, max_in_flight: int) -> None:
+        self.host = host
+        self._rate = rate_per_s
+        self._burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._waiters: list[tuple[int, int, _Ticket]] = []
+        self._seq = itertools.count()
+        self._timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+        self._wait_stats = _WaitStats()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self._rate is not None:
+            self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+    def _dispatch(self) -> None:
+        """Under the lock: grant slots to the highest-priority waiters while capacity and tokens allow."""
+        while self._waiters and self._in_flight < self._max_in_flight:
+            if self._rate is not None:
+                self._refill()
+                if self._tokens < 1:
+                    if self._timer is None:
+                        self._timer = threading.Timer((1 - self._tokens) / self._rate, self._on_timer)
+                        self._timer.daemon = True
+                        self._timer.start()
+                    return
+                self._tokens -= 1
+            _, _, ticket = heapq.heappop(self._waiters)
+            ticket.granted = True
+            self._in_flight += 1
+            ticket.wake()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _enqueue(self, priority: int, wake: Callable[[], None]) -> _Ticket:
+        ticket = _Ticket(wake)
+        with self._lock:
+            heapq.heappush(self._waiters, (priority, next(self._seq), ticket))
+            self._dispatch()
+        return ticket
+
+    def _abandon(self, ticket: _Ticket) -> None:
+        """Withdraw a waiter (timeout/cancel); if it was granted meanwhile, give the slot back."""
+        with self._lock:
+            if not ticket.granted:
+                self._waiters = [w for w in self._waiters if w[2] is not ticket]
+                heapq.heapify(self._waiters)
+                return
+        self.release()
+
+    def acquire(self, priority: int = PRIORITY_DEFAULT, timeout: float | None = None) -> bool:
+        """Block until a slot is granted (True) or timeout expires (False)."""
+        start = time.monotonic()
+        event = threading.Event()
+        ticket = self._enqueue(priority, event.set)
+        if not event.wait(timeout):
+            self._abandon(ticket)
+            return False
+        with self._lock:
+            self._wait_stats.add(time.monotonic() - start)
+        return True
+
+    async def aacquire(self, priority: int = PRIORITY_DEFAULT) -> None:
+        """Async acquire; cancelling the awaiting task withdraws the request."""
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        ticket = self._enqueue(priority, wake)
+        try:
+            await granted
+        except asyncio.CancelledError:
+            self._abandon(ticket)
+            raise
+        with self._lock:
+            self._wait_stats.add(time.monotonic() - start)
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: int | None = None):
+        """Hold a slot; waits at most until current_deadline, raising TimeoutError once it passes."""
+        left = time_left()
+        if not self.acquire(current_priority.get() if priority is None else priority, None if left is None else max(0.0, left)):
+            raise TimeoutError(f"No {self.host} slot before the deadline")
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, priority: int | None = None):
+        left = time_left()
+        acquire = self.aacquire(current_priority.get() if priority is None else priority)
+        try:
+            await asyncio.wait_for(acquire, None if left is None else max(0.0, left))
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No {self.host} slot before the deadline") from None
+        try:
+            yield
+        finally:
+            self.release()
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self._max_in_flight,
+                "waiting": len(self._waiters),
+                "rate_per_s": self._rate,
+                **self._wait_stats.as_dict(),
+            }
+
+
+_limiters = {
+    host: HostLimiter(host, limits.get("rate_per_s"), limits.get("burst", 1), limits.get("max_in_flight", TOOL_MAX_WORKERS))
+    for host, limits in UPSTREAM_LIMITS.items()
+}
+
+
+def host_limiter(host: str) -> HostLimiter | None:
+    """The limiter for an upstream host, or None if the host is not limited."""
+    return _limiters.get(host)
+
+# --- Tool scheduler ---
+
+
+class ToolScheduler:
+    """
+    Long-lived worker pool fed by a priority queue. Replaces per-round executors: every tool call
+    in the process shares these workers, and higher-priority calls start first.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        self._max_workers = max_workers
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._workers: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._wait_stats: dict[int, _WaitStats] = {}
+        self._running = 0
+
+    def _ensure_workers(self) -> None:
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self._max_workers):
+                t = threading.Thread(target=self._work, name=f"tool-worker-{i}", daemon=True)
+                t.start()
+                self._workers.append(t)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, priority: int = PRIORITY_DEFAULT, **kwargs: Any) -> Future:
+        """Queue fn(*args, **kwargs); returns a Future. The call runs with current_priority set to priority."""
+        self._ensure_workers()
+        future: Future = Future()
+        ctx = contextvars.copy_context()
+        self._queue.put((priority, next(self._seq), time.monotonic(), future, ctx, fn, args, kwargs))
+        return future
+
+    def _work(self) -> None:
+        while True:
+            priority, _, enqueued_at, future, ctx, fn, args, kwargs = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self._wait_stats.setdefault(priority, _WaitStats()).add(time.monotonic() - enqueued_at)
+                self._running += 1
+            try:
+                ctx.run(current_priority.set, priority)
+                future.set_result(ctx.run(fn, *args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self._max_workers,
+                "running": self._running,
+                "queue_depth": self._queue.qsize(),
+                "wait_by_priority": {p: s.as_dict() for p, s in sorted(self._wait_stats.items())},
+            }
+
+
+tool_scheduler = ToolScheduler(TOOL_MAX_WORKERS)
+
+
+def metrics() -> dict[str, Any]:
+    """Scheduler queue depth and wait times, plus per-host limiter state and wait times."""
+    return {
+        "scheduler": tool_scheduler.metrics(),
+        "hosts": {host: limiter.metrics() for host, limiter in _limiters.items()},
+    }
+
+# --- Background event loop ---
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Process-wide event loop thread for sync callers of async code (run_assistant, sync tool wrappers),
+    so per-loop HTTP keep-alive connections and background refreshes outlive a single call.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="background-loop", daemon=True).start()
+        return _loop
+
+
+def run_coroutine(coro: Any) -> Any:
+    """Run coro on the background loop and block the calling thread for its result (context variables carry over)."""
+    loop = background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_coroutine() called from the background loop would deadlock it")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
@@ -0,0 +1,452 @@
+"""
+HTTP service: a dependency-free ASGI app streaming run_assistant events as Server-Sent Events.
+
+Sessions (conversation history, preferences, prompt-prefix tracking) are kept server-side.
+Each turn is an arun_assistant coroutine on the server's event loop (no thread per turn); events are
+sent as they are produced, so a slow reader pauses the turn instead of buffering it, and a client
+disconnect cancels the turn early.
+
+    POST   /sessions                    {"preferences": "..."}   -> {"session_id": "..."}
+    PUT    /sessions/{id}/preferences   {"preferences": "..."}
+    POST   /sessions/{id}/messages      {"message": "..."}       -> text/event-stream
+    DELETE /sessions/{id}
+    GET    /healthz
+
+Run with any ASGI server, e.g. `uvicorn server:app` (pip install uvicorn), or `python server.py serve`.
+`python server.py bench` measures concurrent sessions per worker in-process with a stand-in LLM and tools.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+import gazetteer
+import http_client
+from assistant import StreamChunk, arun_assistant
+from config import SERVER_MAX_SESSIONS, SERVER_MAX_TURNS, SERVER_SESSION_TTL_S
+from prompt_layout import PrefixTracker
+from scheduler import metrics as scheduler_metrics
+
+# --- Sessions ---
+
+
+class Session:
+    """One conversation: history and preferences persisted across turns; one turn at a time."""
+
+    def __init__(self, session_id: str, preferences: str = "") -> None:
+        self.id = session_id
+        self.preferences = preferences
+        self.history: list[dict] = []
+        self.prefix_tracker = PrefixTracker()
+        self.busy = False
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """In-memory session store: LRU-bounded, sessions idle for more than ttl seconds expire."""
+
+    def __init__(self, max_sessions: int = SERVER_MAX_SESSIONS, ttl: float = SERVER_SESSION_TTL_S) -> None:
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._max_sessions = max_sessions
+        self._ttl = ttl
+        self._lock = threading.Lock()
+
+    def create(self, preferences: str = "") -> Session:
+        session = Session(uuid.uuid4().hex, preferences)
+        with self._lock:
+            self._sessions[session.id] = session
+            self._evict()
+        return session
+
+    def get(self, session_id: str) -> Session | None:
+        with self._lock:
+            self._evict()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.monotonic()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self._max_sessions and now - oldest.last_used <= self._ttl:
+                break
+            if oldest.busy:
+                break  # never drop a session mid-turn
+            self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+# --- SSE ---
+
+
+def _sse(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+
+def _event_payload(event: tuple) -> tuple[str, Any]:
+    """Client-facing (name, data) for a run_assistant event; the history in "result" stays server-side."""
+    kind = event[0]
+    if kind in ("plan_delta", "delta", "plan"):
+        return kind, {"text": event[1]}
+    if kind == "result":
+        return kind, {"text": event[1], "weather_api_used": event[2], "places_api_used": event[3]}
+    if kind == "tools":
+        return kind, {"tools": event[1]}
+    return kind, event[1]
+
+
+# --- App ---
+
+
+class AssistantApp:
+    """ASGI application. llm and tool_registry default to the async OpenAI client and the default tools."""
+
+    def __init__(
+        self,
+        llm: Any = None,
+        tool_registry: Any = None,
+        store: SessionStore | None = None,
+        max_turns: int = SERVER_MAX_TURNS,
+    ) -> None:
+        self._llm = llm
+        self._tool_registry = tool_registry
+        self.store = store or SessionStore()
+        self._max_turns = max_turns
+        self._active_turns = 0
+        self._stats = {"turns": 0, "rejected": 0, "disconnects": 0}
+
+    def _deps(self) -> tuple[Any, Any]:
+        if self._llm is None:
+            from openai import AsyncOpenAI
+
+            from assistant import AsyncOpenAILLMClient
+            from config import OPENAI_API_KEY
+
+            self._llm = AsyncOpenAILLMClient(AsyncOpenAI(api_key=OPENAI_API_KEY))
+        if self._tool_registry is None:
+            from tools import tool_registry
+
+            self._tool_registry = tool_registry
+        return self._llm, self._tool_registry
+
+    async def __call__(self, scope: dict, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        method, parts = scope["method"], [p for p in scope["path"].split("/") if p]
+        try:
+            if method == "GET" and parts == ["healthz"]:
+                await _json(send, 200, self.health())
+            elif method == "POST" and parts == ["sessions"]:
+                body = await _read_json(receive)
+                session = self.store.create(str(body.get("preferences") or ""))
+                await _json(send, 201, {"session_id": session.id})
+            elif len(parts) >= 2 and parts[0] == "sessions":
+                await self._session_route(method, parts[1], parts[2:], receive, send)
+            else:
+                await _json(send, 404, {"error": "Not found"})
+        except ValueError as e:
+            await _json(send, 400, {"error": str(e)})
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Load the offline gazetteer before the first turn needs it, off the event loop.
+                await asyncio.to_thread(gazetteer.get_gazetteer)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await http_client.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _session_route(self, method: str, session_id: str, rest: list[str], receive, send) -> None:
+        session = self.store.get(session_id)
+        if session is None:
+            await _json(send, 404, {"error": "Unknown session"})
+        elif method == "DELETE" and not rest:
+            self.store.delete(session_id)
+            await _json(send, 200, {"deleted": session_id})
+        elif method == "PUT" and rest == ["preferences"]:
+            session.preferences = str((await _read_json(receive)).get("preferences") or "")
+            await _json(send, 200, {"session_id": session_id})
+        elif method == "POST" and rest == ["messages"]:
+            message = str((await _read_json(receive)).get("message") or "").strip()
+            if not message:
+                raise ValueError("'message' is required")
+            await self._stream_turn(session, message, receive, send)
+        else:
+            await _json(send, 404, {"error": "Not found"})
+
+    async def _stream_turn(self, session: Session, message: str, receive, send) -> None:
+        # Admission control: beyond max_turns concurrent turns, shed load instead of queueing unboundedly.
+        if self._active_turns >= self._max_turns:
+            self._stats["rejected"] += 1
+            await _json(send, 503, {"error": "Server busy"}, [(b"retry-after", b"1")])
+            return
+        if session.busy:
+            await _json(send, 409, {"error": "A turn is already running for this session"})
+            return
+        session.busy = True
+        self._active_turns += 1
+        self._stats["turns"] += 1
+        llm, tool_registry = self._deps()
+
+        async def pump() -> None:
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+            })
+            events = arun_assistant(
+                session.history,
+                message,
+                llm,
+                tool_registry,
+                user_preferences=session.preferences,
+                prefix_tracker=session.prefix_tracker,
+            )
+            async with contextlib.aclosing(events):
+                try:
+                    async for event in events:
+                        if event[0] == "result":
+                            session.history = event[4]
+                        # Awaiting send is the backpressure: a slow client pauses the turn.
+                        await send({"type": "http.response.body", "body": _sse(*_event_payload(event)), "more_body": True})
+                except OSError:
+                    raise  # the client is gone; nothing left to send to
+                except Exception as e:
+                    await send({"type": "http.response.body", "body": _sse("error", {"error": str(e)}), "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        async def watch_disconnect() -> None:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        turn = asyncio.ensure_future(pump())
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await asyncio.wait({turn, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not turn.done():
+                # Client went away mid-turn: cancelling closes the turn, its LLM stream and pending tool calls.
+                self._stats["disconnects"] += 1
+                turn.cancel()
+            try:
+                await turn
+            except asyncio.CancelledError:
+                pass
+            except OSError:
+                self._stats["disconnects"] += 1
+        finally:
+            watcher.cancel()
+            session.busy = False
+            self._active_turns -= 1
+
+    def health(self) -> dict:
+        return {
+            "sessions": len(self.store),
+            "active_turns": self._active_turns,
+            "max_turns": self._max_turns,
+            **self._stats,
+            "scheduler": scheduler_metrics()["scheduler"],
+            "tool_deadline_misses": self._tool_registry.deadline_misses() if self._tool_registry is not None else {},
+            "tool_cache": self._tool_registry.cache_stats() if self._tool_registry is not None else {},
+            "circuits": {host: s["circuit"] for host, s in http_client.pool_stats().items() if "circuit" in s},
+        }
+
+
+async def _read_json(receive) -> dict:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    raw = b"".join(chunks)
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        raise ValueError("Request body must be JSON") from None
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    return data
+
+
+async def _json(send, status: int, data: dict, headers: list[tuple[bytes, bytes]] | None = None) -> None:
+    body = json.dumps(data).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + (headers or []),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+app = AssistantApp()
+
+# --- Benchmark ---
+
+
+class _BenchLLM:
+    """Stand-in LLM: a weather tool call, then a streamed answer, with model-like latencies."""
+
+    def __init__(self, first_token_s: float, token_s: float, tokens: int) -> None:
+        self._first_token_s = first_token_s
+        self._token_s = token_s
+        self._tokens = tokens
+
+    async def stream_completion(self, messages, tools, tool_choice, **kwargs):
+        await asyncio.sleep(self._first_token_s * random.uniform(0.5, 1.5))
+        if tool_choice == "auto" and messages[-1].get("role") == "user":
+            args = json.dumps({"location": "Rome", "days": 3})
+            yield StreamChunk(tool_calls=[{"index": 0, "id": "call_0", "function": {"name": "get_weather_forecast", "arguments": args}}])
+            yield StreamChunk(finish_reason="tool_calls")
+            return
+        for i in range(self._tokens):
+            await asyncio.sleep(self._token_s)
+            yield StreamChunk(content=f"word{i} ")
+        yield StreamChunk(finish_reason="stop")
+
+
+def _bench_registry(tool_s: float):
+    from tools import WEATHER_FORECAST_TOOL, ToolRegistry
+
+    reg = ToolRegistry()
+
+    def forecast(**kwargs) -> str:
+        time.sleep(tool_s)
+        return json.dumps({"location": "Rome, IT", "forecast": [], "count": 0})
+
+    async def aforecast(**kwargs) -> str:
+        await asyncio.sleep(tool_s)
+        return json.dumps({"location": "Rome, IT", "forecast": [], "count": 0})
+
+    reg.register("get_weather_forecast", WEATHER_FORECAST_TOOL, forecast)
+    reg.register_async("get_weather_forecast", WEATHER_FORECAST_TOOL, aforecast)
+    return reg
+
+
+async def _call(asgi, method: str, path: str, body: dict | None = None) -> tuple[int, list[tuple[float, bytes]]]:
+    """Drive one request through the ASGI app in-process; returns status and timestamped body chunks."""
+    payload = json.dumps(body or {}).encode()
+    sent = False
+    status = 0
+    chunks: list[tuple[float, bytes]] = []
+    done = asyncio.Event()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append((time.perf_counter(), message.get("body", b"")))
+            if not message.get("more_body"):
+                done.set()
+
+    scope = {"type": "http", "method": method, "path": path, "headers": []}
+    await asgi(scope, receive, send)
+    return status, chunks
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def _bench(sessions: int, turns: int, args: argparse.Namespace) -> dict:
+    asgi = AssistantApp(
+        llm=_BenchLLM(args.first_token_ms / 1000, args.token_ms / 1000, args.tokens),
+        tool_registry=_bench_registry(args.tool_ms / 1000),
+        max_turns=args.max_turns,
+    )
+    first_event: list[float] = []
+    turn_times: list[float] = []
+    statuses: dict[int, int] = {}
+
+    async def one_session() -> None:
+        _, chunks = await _call(asgi, "POST", "/sessions", {"preferences": "museums"})
+        session_id = json.loads(chunks[-1][1])["session_id"]
+        for turn in range(turns):
+            start = time.perf_counter()
+            status, chunks = await _call(asgi, "POST", f"/sessions/{session_id}/messages", {"message": f"Weather in Rome? ({turn})"})
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200 and chunks:
+                first_event.append(chunks[0][0] - start)
+                turn_times.append(chunks[-1][0] - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_session() for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+    return {
+        "sessions": sessions,
+        "turns": sessions * turns,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 2),
+        "turns_per_s": round(len(turn_times) / elapsed, 1),
+        "first_event_p50_ms": round(1000 * _percentile(first_event, 0.5), 1),
+        "first_event_p95_ms": round(1000 * _percentile(first_event, 0.95), 1),
+        "turn_p50_ms": round(1000 * _percentile(turn_times, 0.5), 1),
+        "turn_p95_ms": round(1000 * _percentile(turn_times, 0.95), 1),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the assistant over HTTP/SSE, or benchmark it.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_serve = sub.add_parser("serve", help="Run with uvicorn (pip install uvicorn)")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8000)
+    p_bench = sub.add_parser("bench", help="Concurrent sessions per worker, in-process, with a stand-in LLM and tools")
+    p_bench.add_argument("--sessions", type=int, nargs="+", default=[10, 50, 100, 200])
+    p_bench.add_argument("--turns", type=int, default=2)
+    p_bench.add_argument("--max-turns", type=int, default=SERVER_MAX_TURNS)
+    p_bench.add_argument("--first-token-ms", type=float, default=300)
+    p_bench.add_argument("--token-ms", type=float, default=5)
+    p_bench.add_argument("--tokens", type=int, default=50)
+    p_bench.add_argument("--tool-ms", type=float, default=150)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            import uvicorn
+        except ImportError:
+            raise SystemExit("Serving requires an ASGI server, e.g. pip install uvicorn") from None
+        uvicorn.run(app, host=args.host, port=args.port)
+    else:
+        for sessions in args.sessions:
+            print(json.dumps(asyncio.run(_bench(sessions, args.turns, args))))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
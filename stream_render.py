@@ -0,0 +1,56 @@
+"""
+Frame-rate-limited rendering of streamed text. Deltas are appended to a buffer and pushed to the
+display at most once per interval (the first delta immediately), instead of re-rendering the whole
+document on every token. The buffer is joined incrementally: each flush only joins the new deltas.
+Text held back by the throttle shows on the next append; call flush() whenever the stream pauses
+(e.g. for a tool round) so it does not wait for that.
+"""
+
+import time
+from collections.abc import Callable
+
+from config import UI_RENDER_INTERVAL_S
+
+
+class ThrottledRenderer:
+    """Coalesces appended text into at most one render(text) call per interval; flush() renders what is left."""
+
+    def __init__(self, render: Callable[[str], None], interval: float = UI_RENDER_INTERVAL_S) -> None:
+        self._render = render
+        self._interval = interval
+        self._text = ""
+        self._pending: list[str] = []
+        self._last_render: float | None = None
+        self.renders = 0
+
+    @property
+    def text(self) -> str:
+        """Everything appended so far (rendered or not)."""
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending.clear()
+        return self._text
+
+    def append(self, chunk: str) -> None:
+        if not chunk:
+            return
+        self._pending.append(chunk)
+        now = time.monotonic()
+        if self._last_render is None or now - self._last_render >= self._interval:
+            self._flush(now)
+
+    def set(self, text: str) -> None:
+        """Replace the buffer (e.g. with the final text) and render it now."""
+        self._text, self._pending = text, []
+        self._flush(time.monotonic(), force=True)
+
+    def flush(self) -> None:
+        if self._pending:
+            self._flush(time.monotonic())
+
+    def _flush(self, now: float, force: bool = False) -> None:
+        if not self._pending and not force:
+            return
+        self._render(self.text)
+        self._last_render = now
+        self.renders += 1
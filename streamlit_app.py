@@ -9,6 +9,8 @@ from openai import OpenAI
 from assistant import OpenAILLMClient, run_assistant
 from config import OPENAI_API_KEY, OPENWEATHER_API_KEY
 from preferences import load_user_preferences, save_user_preferences
+from prompt_layout import PrefixTracker
+from stream_render import ThrottledRenderer
 from tools import tool_registry
 
 PREFERENCES_PROMPT = (
@@ -18,11 +20,21 @@ PREFERENCES_PROMPT = (
 
 st.set_page_config(page_title="Travel Assistant", page_icon="✈️", layout="centered")
 
+
+@st.cache_resource
+def get_llm() -> OpenAILLMClient:
+    """One OpenAI client (and its connection pool) per process, shared by every session and rerun."""
+    return OpenAILLMClient(OpenAI(api_key=OPENAI_API_KEY))
+
+
 if not OPENAI_API_KEY:
     st.error("OPENAI_API_KEY is not set in .env")
     st.stop()
 
-user_preferences = load_user_preferences()
+# Read the preferences file once per session, not on every rerun.
+if "user_preferences" not in st.session_state:
+    st.session_state.user_preferences = load_user_preferences()
+user_preferences = st.session_state.user_preferences
 if not user_preferences:
     st.title("Travel Assistant")
     st.markdown(f"**{PREFERENCES_PROMPT}**")
@@ -35,6 +47,7 @@ if not user_preferences:
         if st.form_submit_button("Save and start"):
             if prefs_input and prefs_input.strip():
                 save_user_preferences(prefs_input.strip())
+                st.session_state.user_preferences = prefs_input.strip()
                 st.rerun()
             else:
                 st.warning("Please enter at least something so I can personalize your trip.")
@@ -44,9 +57,10 @@ if "display_messages" not in st.session_state:
     st.session_state.display_messages = []
 if "conversation_history" not in st.session_state:
     st.session_state.conversation_history = []
+if "prefix_tracker" not in st.session_state:
+    st.session_state.prefix_tracker = PrefixTracker()
 
-client = OpenAI(api_key=OPENAI_API_KEY)
-llm = OpenAILLMClient(client)
+llm = get_llm()
 
 if not OPENWEATHER_API_KEY:
     st.warning("OPENWEATHER_API_KEY not set in .env — weather queries will fail.")
@@ -79,8 +93,9 @@ if prompt:
         stream_placeholder = st.empty()
         badges_placeholder = st.empty()
 
-        plan_parts = []
-        response_parts = []
+        # Deltas are coalesced into frame-rate-limited re-renders of an incrementally joined buffer.
+        plan_view = ThrottledRenderer(plan_placeholder.markdown)
+        response_view = ThrottledRenderer(stream_placeholder.markdown)
         response_text = ""
         weather_used = False
         places_used = False
@@ -92,19 +107,20 @@ if prompt:
             llm,
             tool_registry,
             user_preferences=user_preferences,
+            prefix_tracker=st.session_state.prefix_tracker,
         ):
             kind = event[0]
             if kind == "plan_delta":
-                chunk = event[1]
-                if chunk:
-                    plan_parts.append(chunk)
-                    plan_placeholder.markdown("".join(plan_parts))
+                plan_view.append(event[1])
             elif kind == "plan":
-                plan_text = event[1] or ""
-                plan_placeholder.markdown(plan_text)
+                plan_view.set(event[1] or "")
+                response_view.flush()
+            elif kind == "tools":
+                # The stream pauses for the tool round: show whatever text is still buffered.
+                plan_view.flush()
+                response_view.flush()
             elif kind == "delta":
-                response_parts.append(event[1])
-                stream_placeholder.markdown("".join(response_parts))
+                response_view.append(event[1])
             elif kind == "result":
                 response_text, weather_used, places_used, new_history = (
                     event[1],
@@ -112,7 +128,7 @@ if prompt:
                     event[3],
                     event[4],
                 )
-                stream_placeholder.markdown(response_text)
+                response_view.set(response_text)
                 if weather_used or places_used:
                     parts = []
                     if weather_used:
@@ -125,8 +141,8 @@ if prompt:
         st.session_state.display_messages.append(
             {
                 "role": "assistant",
-                "content": response_text or "".join(response_parts),
-                "plan": "".join(plan_parts),
+                "content": response_text or response_view.text,
+                "plan": plan_view.text,
                 "weather_used": weather_used,
                 "places_used": places_used,
             }
@@ -0,0 +1,101 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Modules live at the repository root (no package), so tests import them by name.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+CITIES = [
+    # name, asciiname, alternate names, lat, lon, country, population
+    ("Paris", "Paris", "Lutetia,Parigi", 48.85341, 2.3488, "FR", 2138551),
+    ("Paris", "Paris", "", 33.66094, -95.55551, "US", 24171),
+    ("Carpi", "Carpi", "", 44.78237, 10.8777, "IT", 71148),
+    ("Zürich", "Zurich", "Zurigo", 47.36667, 8.55, "CH", 341730),
+    ("Portland", "Portland", "", 45.52345, -122.67621, "US", 652503),
+    ("Portland", "Portland", "", 43.66147, -70.25533, "US", 66881),
+    ("New York City", "New York City", "New York,NYC", 40.71427, -74.00597, "US", 8804190),
+    ("Tokyo", "Tokyo", "", 35.6895, 139.69171, "JP", 8336599),
+    ("Rome", "Rome", "Roma", 41.89193, 12.51133, "IT", 2318895),
+    ("Florence", "Florence", "Firenze", 43.77925, 11.24626, "IT", 349296),
+]
+
+def write_cities(path):
+    rows = []
+    for i, (name, ascii_name, alternates, lat, lon, cc, population) in enumerate(CITIES):
+        cols = [str(i), name, ascii_name, alternates, str(lat), str(lon), "P", "PPL", cc, "", "", "", "", "", str(population), "", "", "UTC", "2024-01-01"]
+        rows.append("\t".join(cols))
+    path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+
+
+@pytest.fixture
+def cities_file(tmp_path):
+    """A small GeoNames-shaped cities dump."""
+    path = tmp_path / "cities.txt"
+    write_cities(path)
+    return path
+
+
+class _FakeResponse:
+    def __init__(self, status_code: int, data: dict) -> None:
+        self.status_code = status_code
+        self._data = data
+
+    def json(self) -> dict:
+        return self._data
+
+
+class FakeOpenWeather:
+    """
+    Stands in for OpenWeather's /forecast and /weather endpoints (sync and async http_client calls):
+    a 5-day/3-hour series starting at the current slot, for any city. Records every request.
+    """
+
+    def __init__(self) -> None:
+        self.requests: list[tuple[str, dict]] = []
+        self.missing: set[str] = set()
+        self.pop = 0.2
+
+    def _respond(self, url: str, params: dict) -> _FakeResponse:
+        self.requests.append((url.rsplit("/", 1)[-1], dict(params)))
+        name = str(params.get("q") or f"City {params.get('id')}").split(",")[0]
+        if name.lower() in self.missing:
+            return _FakeResponse(404, {"cod": "404", "message": "city not found"})
+        if url.endswith("/weather"):
+            return _FakeResponse(200, {"name": name, "sys": {"country": "XX"}, "main": {"temp": 21.0, "feels_like": 20.0}, "weather": [{"description": "sunny"}]})
+        start = int(time.time()) // 10800 * 10800
+        slots = [
+            {
+                "dt": start + i * 10800,
+                "dt_txt": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start + i * 10800)),
+                "main": {"temp": 10.0 + i % 8, "feels_like": 9.0 + i % 8},
+                "weather": [{"description": "clear sky"}],
+                "pop": self.pop,
+            }
+            for i in range(40)
+        ]
+        return _FakeResponse(200, {"city": {"name": name, "country": "XX", "id": abs(hash(name)) % 10**6}, "list": slots})
+
+    def forecast_requests(self) -> int:
+        return sum(1 for endpoint, _ in self.requests if endpoint == "forecast")
+
+
+@pytest.fixture
+def openweather(monkeypatch):
+    """FakeOpenWeather behind the weather tools, with their process-wide forecast caches emptied."""
+    import tools
+
+    fake = FakeOpenWeather()
+
+    async def aget(url, **kwargs):
+        return fake._respond(url, kwargs.get("params") or {})
+
+    monkeypatch.setattr(tools, "OPENWEATHER_API_KEY", "test-key")
+    monkeypatch.setattr(tools.http_client, "get", lambda url, **kwargs: fake._respond(url, kwargs.get("params") or {}))
+    monkeypatch.setattr(tools.http_client, "aget", aget)
+    for cache in (tools._forecast_cache, tools._forecast_aliases):
+        cache.clear()
+    yield fake
+    for cache in (tools._forecast_cache, tools._forecast_aliases):
+        cache.clear()
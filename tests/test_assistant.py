@@ -0,0 +1,308 @@
+import asyncio
+import json
+import threading
+import time
+
+import assistant
+import router
+from assistant import StreamChunk, _ToolCallAssembler, arun_assistant, run_assistant
+from prompt_layout import PrefixTracker, assemble_messages
+from prompts import PLAN_AND_EXECUTE_REQUEST
+from tools import WEATHER_FORECAST_TOOL, ToolRegistry, create_default_registry
+
+
+class _HangingLLM:
+    """Streams one complete tool call, then never finishes the completion."""
+
+    async def stream_completion(self, messages, tools, tool_choice):
+        args = json.dumps({"location": "Rome"})
+        yield StreamChunk(tool_calls=[{"index": 0, "id": "call_0", "function": {"name": "get_weather_forecast", "arguments": args}}])
+        await asyncio.sleep(3600)
+        yield StreamChunk(finish_reason="tool_calls")
+
+
+def test_cancelled_turn_cancels_tool_calls_dispatched_early():
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def forecast(**kwargs) -> str:
+        started.set()
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "{}"
+
+    reg = ToolRegistry()
+    reg.register_async("get_weather_forecast", WEATHER_FORECAST_TOOL, forecast)
+
+    async def main():
+        events = arun_assistant([], "Weather in Rome?", _HangingLLM(), reg)
+        turn = asyncio.ensure_future(events.__anext__())
+        await asyncio.wait_for(started.wait(), 1)
+        turn.cancel()  # what the server does when the client disconnects
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+    asyncio.run(main())
+
+
+class _RecordingRegistry:
+    """Records each call the assembler submits; results are immediate."""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, dict]] = []
+
+    async def run_async(self, name, args, deadline=None):
+        self.calls.append((name, args))
+        return "{}"
+
+
+def test_assembler_dispatches_each_call_once_its_arguments_are_complete():
+    reg = _RecordingRegistry()
+
+    async def main():
+        assembler = _ToolCallAssembler(reg)
+        assembler.add({"index": 0, "id": "call_0", "function": {"name": "get_weather_forecast", "arguments": '{"locat'}})
+        await asyncio.sleep(0)
+        assert reg.calls == []  # arguments still streaming
+        assembler.add({"index": 0, "function": {"arguments": 'ion": "Rome"}'}})
+        await asyncio.sleep(0)
+        assert reg.calls == [("get_weather_forecast", {"location": "Rome"})]
+        assembler.add({"index": 1, "id": "call_1", "function": {"name": "search_places", "arguments": '{"location": "Rome", "category": "park"} '}})
+        assembler.add({"index": 2, "id": "call_2", "function": {"name": "search_places", "arguments": '{"location": "Rome", "category": "museum"'}})
+        await asyncio.sleep(0)
+        assert len(reg.calls) == 2  # call 2 has not closed its arguments yet
+        assembler.add({"index": 2, "function": {"arguments": "}"}})
+        calls = assembler.finish()
+        await asyncio.gather(*(future for future, _, _ in assembler.submitted()))
+        assert [c["id"] for c in calls] == ["call_0", "call_1", "call_2"]
+        assert [args.get("category") for _, args in reg.calls] == [None, "park", "museum"]  # nothing twice
+
+    asyncio.run(main())
+
+
+def test_tool_runs_while_the_model_is_still_streaming_later_calls():
+    started = asyncio.Event()
+
+    async def forecast(**kwargs) -> str:
+        started.set()
+        return "{}"
+
+    class _SlowLLM:
+        """Streams a second call only after the first call's tool has started."""
+
+        def __init__(self) -> None:
+            self.overlapped = None
+
+        async def stream_completion(self, messages, tools, tool_choice, **kwargs):
+            if messages[-1]["role"] != "user":
+                yield StreamChunk(content="Done.")
+                yield StreamChunk(finish_reason="stop")
+                return
+            args = json.dumps({"location": "Rome"})
+            yield StreamChunk(tool_calls=[{"index": 0, "id": "call_0", "function": {"name": "get_weather_forecast", "arguments": args}}])
+            try:
+                await asyncio.wait_for(started.wait(), 1)
+                self.overlapped = True
+            except asyncio.TimeoutError:
+                self.overlapped = False
+            args = json.dumps({"location": "Paris"})
+            yield StreamChunk(tool_calls=[{"index": 1, "id": "call_1", "function": {"name": "get_weather_forecast", "arguments": args}}])
+            yield StreamChunk(finish_reason="tool_calls")
+
+    reg = ToolRegistry()
+    reg.register_async("get_weather_forecast", WEATHER_FORECAST_TOOL, forecast)
+    llm = _SlowLLM()
+
+    async def main():
+        return [e async for e in arun_assistant([], "Weather in Rome and Paris?", llm, reg)]
+
+    events = asyncio.run(main())
+    assert llm.overlapped is True
+    assert events[-1][0] == "result"
+
+
+class _AnsweringLLM:
+    """Answers straight away, without tool calls."""
+
+    async def stream_completion(self, messages, tools, tool_choice, **kwargs):
+        yield StreamChunk(content="Sunny.")
+        yield StreamChunk(finish_reason="stop")
+
+
+def _turn_stats(history, message, tracker):
+    async def forecast(**kwargs) -> str:
+        return "{}"
+
+    reg = ToolRegistry()
+    reg.register_async("get_weather_forecast", WEATHER_FORECAST_TOOL, forecast)
+
+    async def main():
+        return [e async for e in arun_assistant(history, message, _AnsweringLLM(), reg, prefix_tracker=tracker)]
+
+    return next(e[1] for e in asyncio.run(main()) if e[0] == "stats")
+
+
+def test_prefix_reuse_is_tracked_per_conversation():
+    first, second = PrefixTracker(), PrefixTracker()
+    a = _turn_stats([], "Weather in Rome?", first)
+    b = _turn_stats([], "Weather in Rome?", second)
+    assert a["prefix_identical_tokens"] == b["prefix_identical_tokens"] == 0
+
+    again = _turn_stats([], "Weather in Rome?", first)
+    assert again["prefix_identical_tokens"] == again["request_tokens"] > 0
+
+
+def test_route_switch_shares_only_the_weather_schemas():
+    reg = create_default_registry(store=None)
+    tracker = PrefixTracker()
+    for message in ("Weather in Rome?", "Restaurants in Rome?"):
+        route = router.route(message)
+        messages = assemble_messages(route.system_prompt, None, [{"role": "user", "content": message}])
+        shared, _ = tracker.observe(reg.get_schemas(route.tools), messages)
+    weather_schemas = reg.get_schemas(router.WEATHER_TOOLS)
+    assert shared == sum(router.estimate_tokens(json.dumps(s, sort_keys=True)) for s in weather_schemas)
+
+
+class _ForecastLLM:
+    """Calls get_weather_forecast for location on the first completion of a turn, then answers."""
+
+    def __init__(self, location: str) -> None:
+        self.location = location
+
+    async def stream_completion(self, messages, tools, tool_choice, **kwargs):
+        if messages[-1]["role"] == "user":
+            args = json.dumps({"location": self.location, "days": 2})
+            yield StreamChunk(tool_calls=[{"index": 0, "id": "call_0", "function": {"name": "get_weather_forecast", "arguments": args}}])
+            yield StreamChunk(finish_reason="tool_calls")
+            return
+        yield StreamChunk(content="Mild.")
+        yield StreamChunk(finish_reason="stop")
+
+
+def test_repeated_call_in_a_conversation_is_answered_without_io(openweather):
+    reg = create_default_registry(store=None)
+    llm = _ForecastLLM("Zyxburg")
+
+    async def turn(history, message):
+        events = [e async for e in arun_assistant(history, message, llm, reg)]
+        return next(e for e in events if e[0] == "result")
+
+    async def main():
+        events = [e async for e in arun_assistant([], "Weather in Zyxburg?", llm, reg)]
+        assert [e[0] for e in events] == ["tools", "delta", "stats", "result"]
+        assert events[0][1] == ["get_weather_forecast"]
+        result = events[-1]
+        assert result[2] is True  # weather_api_used
+        await turn(result[4], "And the weather there again?")
+
+    asyncio.run(main())
+    assert openweather.forecast_requests() == 1
+    assert reg.cache_stats()["get_weather_forecast"]["memory_hits"] == 1
+
+
+class _ScriptedLLM:
+    """Plays one list of chunks per completion and records each request's tool_choice and last message."""
+
+    def __init__(self, *completions: list[StreamChunk]) -> None:
+        self.completions = list(completions)
+        self.requests: list[tuple[str, str]] = []
+
+    async def stream_completion(self, messages, tools, tool_choice, **kwargs):
+        self.requests.append((tool_choice, messages[-1]["content"]))
+        for chunk in self.completions.pop(0):
+            yield chunk
+
+
+def _forecast_call(location: str) -> StreamChunk:
+    args = json.dumps({"location": location})
+    return StreamChunk(tool_calls=[{"index": 0, "id": "call_0", "function": {"name": "get_weather_forecast", "arguments": args}}])
+
+
+def _single_call_turn(monkeypatch, llm, message="Plan a trip to Rome"):
+    monkeypatch.setattr(assistant, "PREFETCH_ENABLED", False)
+
+    async def forecast(**kwargs) -> str:
+        return json.dumps({"location": kwargs["location"], "forecast": []})
+
+    reg = ToolRegistry()
+    reg.register_async("get_weather_forecast", WEATHER_FORECAST_TOOL, forecast)
+
+    async def main():
+        return [e async for e in arun_assistant([], message, llm, reg, mode="single_call")]
+
+    return asyncio.run(main())
+
+
+def test_single_call_plans_and_calls_tools_in_one_completion(monkeypatch):
+    llm = _ScriptedLLM(
+        [StreamChunk(content="1. Check the "), StreamChunk(content="weather."), _forecast_call("Rome"), StreamChunk(finish_reason="tool_calls")],
+        [StreamChunk(content="Rome it is."), StreamChunk(finish_reason="stop")],
+    )
+    events = _single_call_turn(monkeypatch, llm)
+    assert llm.requests[0] == ("auto", PLAN_AND_EXECUTE_REQUEST)
+    assert json.loads(llm.requests[1][1]) == {"location": "Rome", "forecast": []}  # no separate plan completion
+    assert [e[0] for e in events] == ["plan_delta", "plan_delta", "plan", "tools", "delta", "stats", "result"]
+    assert events[2] == ("plan", "1. Check the weather.")
+    assert events[-2][1]["completions"] == 2
+    assert events[-1][1:4] == ("Rome it is.", True, False)
+
+
+def test_single_call_answer_without_tools_is_not_shown_as_a_plan(monkeypatch):
+    llm = _ScriptedLLM([StreamChunk(content="Rome is lovely in May."), StreamChunk(finish_reason="stop")])
+    events = _single_call_turn(monkeypatch, llm)
+    assert [e[0] for e in events] == ["plan_delta", "plan", "delta", "stats", "result"]
+    assert events[1] == ("plan", None)
+    assert events[2] == ("delta", "Rome is lovely in May.")
+    assert events[-1][1] == "Rome is lovely in May."
+
+
+class _SyncTwoCitiesLLM:
+    """A sync LLMClient: asks for two forecasts in one round, then answers."""
+
+    def __init__(self) -> None:
+        self.threads: set[int] = set()
+
+    def stream_completion(self, messages, tools, tool_choice, **kwargs):
+        self.threads.add(threading.get_ident())
+        if messages[-1]["role"] == "user":
+            for i, city in enumerate(("Rome", "Paris")):
+                args = json.dumps({"location": city})
+                yield StreamChunk(tool_calls=[{"index": i, "id": f"call_{i}", "function": {"name": "get_weather_forecast", "arguments": args}}])
+            yield StreamChunk(finish_reason="tool_calls")
+            return
+        yield StreamChunk(content=" / ".join(m["content"] for m in messages if m["role"] == "tool"))
+        yield StreamChunk(finish_reason="stop")
+
+
+def _two_city_registry(delay: float) -> ToolRegistry:
+    async def forecast(location: str, **kwargs) -> str:
+        await asyncio.sleep(delay)
+        return location
+
+    reg = ToolRegistry()
+    reg.register_async("get_weather_forecast", WEATHER_FORECAST_TOOL, forecast)
+    return reg
+
+
+def test_arun_assistant_reads_a_sync_llm_off_the_loop_and_runs_a_round_concurrently():
+    llm = _SyncTwoCitiesLLM()
+    reg = _two_city_registry(0.3)
+
+    async def main():
+        return [e async for e in arun_assistant([], "Weather in Rome and Paris?", llm, reg)]
+
+    started = time.monotonic()
+    events = asyncio.run(main())
+    assert time.monotonic() - started < 0.5  # both 0.3 s calls ran at once
+    assert threading.get_ident() not in llm.threads
+    assert events[0] == ("tools", ["get_weather_forecast", "get_weather_forecast"])
+    assert events[-1][1] == "Rome / Paris"  # results in call order
+
+
+def test_run_assistant_yields_the_same_events_from_a_plain_thread():
+    events = list(run_assistant([], "Weather in Rome and Paris?", _SyncTwoCitiesLLM(), _two_city_registry(0)))
+    assert [e[0] for e in events] == ["tools", "delta", "stats", "result"]
+    assert events[-1][1] == "Rome / Paris"
+    assert [m["role"] for m in events[-1][4]] == ["system", "user", "assistant"]
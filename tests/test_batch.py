@@ -0,0 +1,59 @@
+import asyncio
+import io
+import json
+
+from assistant import StreamChunk
+from batch import run_batch
+from tools import ToolRegistry
+
+
+class _EchoLLM:
+    """Answers each prompt with its preferences message (if any); tracks completions in flight."""
+
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def stream_completion(self, messages, tools, tool_choice, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        prefs = [m["content"] for m in messages[1:] if m["role"] == "system"]
+        yield StreamChunk(content=prefs[0].splitlines()[-1] if prefs else messages[-1]["content"])
+        yield StreamChunk(finish_reason="stop")
+
+
+def _run(lines: list[str], llm, concurrency: int = 4) -> tuple[dict, list[dict]]:
+    out = io.StringIO()
+    summary = asyncio.run(run_batch(io.StringIO("\n".join(lines) + "\n"), out, llm, ToolRegistry(), concurrency))
+    return summary, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_every_line_gets_a_result_or_an_error():
+    lines = [
+        json.dumps({"id": "a", "prompt": "Hi", "preferences": "Vegetarian"}),
+        "",
+        json.dumps({"prompt": "Hello"}),
+        json.dumps({"preferences": "no prompt"}),
+        "not json",
+    ]
+    summary, records = _run(lines, _EchoLLM())
+    by_id = {r["id"]: r for r in records}
+    assert by_id["a"]["answer"] == "Vegetarian"
+    assert by_id[3]["answer"] == "Hello"  # id defaults to the line number
+    assert "prompt" in by_id[4]["error"] and "error" in by_id[5]
+    assert all(r["timings"]["total_ms"] >= 0 for r in records)
+    assert (summary["conversations"], summary["errors"]) == (2, 2)
+
+
+def test_concurrency_bounds_the_conversations_in_flight():
+    llm = _EchoLLM(delay=0.05)
+    summary, records = _run([json.dumps({"prompt": f"Hi {i}"}) for i in range(8)], llm, concurrency=3)
+    assert llm.max_in_flight == 3
+    assert sorted(r["answer"] for r in records) == sorted(f"Hi {i}" for i in range(8))
+    assert summary["conversations"] == 8 and summary["conversations_per_minute"] > 0
+    assert records[0]["timings"]["first_token_ms"] is not None
@@ -0,0 +1,237 @@
+import asyncio
+import threading
+import time
+import types
+
+import pytest
+
+import cache as cache_module
+from cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic() for the cache module: advance with clock.now += seconds."""
+    fake = types.SimpleNamespace(now=1000.0, time=time.time)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(cache_module, "time", fake)
+    return fake
+
+
+def test_concurrent_sync_callers_share_one_load():
+    cache = TTLCache(ttl=60)
+    calls = 0
+    barrier = threading.Barrier(8)
+    results = []
+
+    def loader():
+        nonlocal calls
+        calls += 1
+        time.sleep(0.05)
+        return "value"
+
+    def caller():
+        barrier.wait()
+        results.append(cache.get_or_load("k", loader))
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == 1
+    assert results == ["value"] * 8
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["inflight_waits"] + stats["hits"] == 7 and stats["inflight"] == 0
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = TTLCache(ttl=lambda v: v["ttl"])
+    values = iter([{"ttl": 10, "n": 1}, {"ttl": 10, "n": 2}])
+    assert cache.get_or_load("k", lambda: next(values))["n"] == 1
+    clock.now += 10
+    assert cache.get_or_load("k", lambda: next(values))["n"] == 1
+    clock.now += 0.1
+    assert cache.get("k") is None
+    assert cache.get_or_load("k", lambda: next(values))["n"] == 2
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(clock):
+    cache = TTLCache(ttl=10, stale_ttl=5)
+    release = threading.Event()
+    refreshes = 0
+
+    def refresh():
+        nonlocal refreshes
+        refreshes += 1
+        release.wait(1)
+        return "new"
+
+    cache.put("k", "old")
+    clock.now += 12
+    assert cache.get_or_load("k", refresh) == "old"
+    assert cache.get_or_load("k", refresh) == "old"  # refresh already running: no second one
+    release.set()
+    for _ in range(100):
+        if cache.get("k") == "new":
+            break
+        time.sleep(0.01)
+    assert cache.get("k") == "new"
+    assert refreshes == 1
+    assert cache.stats()["stale_hits"] == 2
+    clock.now += 16
+    assert cache.get("k") is None
+
+
+def test_negative_results_use_negative_ttl():
+    cache = TTLCache(ttl=60, negative_ttl=0)
+    calls = 0
+
+    def loader():
+        nonlocal calls
+        calls += 1
+        return None
+
+    assert cache.get_or_load("k", loader) is None
+    assert cache.get_or_load("k", loader) is None
+    assert calls == 2
+    assert len(cache) == 0
+
+
+def test_maxsize_evicts_least_recently_used():
+    cache = TTLCache(ttl=60, maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cancelled_owner_does_not_cancel_other_waiters():
+    cache = TTLCache(ttl=60)
+    started = asyncio.Event()
+    release = asyncio.Event()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await release.wait()
+        return "value"
+
+    async def main():
+        owner = asyncio.ensure_future(cache.aget_or_load("k", loader))
+        await started.wait()
+        waiter = asyncio.ensure_future(cache.aget_or_load("k", loader))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await waiter == "value"
+        assert owner.cancelled()
+
+    asyncio.run(main())
+    assert calls == 1
+    assert cache.get("k") == "value"
+
+
+def test_cancelled_waiter_does_not_affect_owner_or_sync_waiter():
+    cache = TTLCache(ttl=60)
+    release = threading.Event()
+    sync_result = []
+
+    async def loader():
+        await asyncio.to_thread(release.wait)
+        return "value"
+
+    async def main():
+        owner = asyncio.ensure_future(cache.aget_or_load("k", loader))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(cache.aget_or_load("k", loader))
+        sync_waiter = threading.Thread(target=lambda: sync_result.append(cache.get_or_load("k", lambda: "sync")))
+        sync_waiter.start()
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await owner == "value"
+        await asyncio.to_thread(sync_waiter.join)
+        assert waiter.cancelled()
+
+    asyncio.run(main())
+    assert sync_result == ["value"]
+
+
+def test_load_cancelled_when_every_waiter_leaves_and_key_is_released():
+    cache = TTLCache(ttl=60)
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def fast():
+        return "fresh"
+
+    async def main():
+        first = asyncio.ensure_future(cache.aget_or_load("k", slow))
+        second = asyncio.ensure_future(cache.aget_or_load("k", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert cache.stats()["inflight"] == 0
+        assert await cache.aget_or_load("k", fast) == "fresh"
+
+    asyncio.run(main())
+
+
+def test_loader_errors_reach_every_waiter_and_are_not_cached():
+    cache = TTLCache(ttl=60)
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def main():
+        results = await asyncio.gather(*(cache.aget_or_load("k", failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+
+    asyncio.run(main())
+    assert cache.get("k") is None
+    assert cache.stats()["inflight"] == 0
+
+
+def test_shared_load_ignores_the_owner_deadline_and_bounds_only_its_wait():
+    import time
+
+    from scheduler import current_deadline
+
+    cache = TTLCache(ttl=60)
+    seen_deadlines = []
+
+    async def loader():
+        seen_deadlines.append(current_deadline.get())
+        await asyncio.sleep(0.1)
+        return "value"
+
+    async def hurried():
+        current_deadline.set(time.monotonic() + 0.02)
+        return await cache.aget_or_load("k", loader)
+
+    async def main():
+        owner = asyncio.ensure_future(hurried())
+        await asyncio.sleep(0.005)
+        patient = asyncio.ensure_future(cache.aget_or_load("k", loader))
+        results = await asyncio.gather(owner, patient, return_exceptions=True)
+        assert isinstance(results[0], TimeoutError)
+        assert results[1] == "value"
+
+    asyncio.run(main())
+    assert seen_deadlines == [None]
@@ -0,0 +1,79 @@
+import pytest
+
+from gazetteer import Gazetteer, normalize
+
+COUNTRIES = [
+    # ISO, ISO3, ISO-Numeric, fips, Country
+    ("FR", "FRA", "250", "FR", "France"),
+    ("US", "USA", "840", "US", "United States"),
+    ("JP", "JPN", "392", "JA", "Japan"),
+]
+
+
+@pytest.fixture
+def gaz(cities_file):
+    return Gazetteer.load(cities_file)
+
+
+@pytest.fixture
+def gaz_with_countries(tmp_path, cities_file):
+    countries = tmp_path / "countryInfo.txt"
+    countries.write_text(
+        "#ISO\tISO3\tISO-Numeric\tfips\tCountry\n" + "".join("\t".join(c) + "\n" for c in COUNTRIES),
+        encoding="utf-8",
+    )
+    return Gazetteer.load(cities_file, countries_path=countries)
+
+
+def test_normalize_strips_case_accents_and_punctuation():
+    assert normalize("  Zürich,  CH ") == "zurich ch"
+    assert normalize("Saint-Étienne") == "saint etienne"
+
+
+def test_exact_name_resolves_to_most_populous(gaz):
+    assert gaz.resolve("Paris").country == "FR"
+    assert gaz.resolve("paris").canonical == "Paris, FR"
+    assert gaz.resolve("ZURICH").name == "Zürich"
+
+
+def test_alternate_names_resolve(gaz):
+    assert gaz.resolve("Parigi").country == "FR"
+    assert gaz.resolve("NYC").name == "New York City"
+
+
+def test_country_code_hint_narrows_the_match(gaz):
+    assert gaz.resolve("Paris, US").country == "US"
+    assert gaz.resolve("Paris US").country == "US"
+    assert gaz.resolve("Paris, FR").country == "FR"
+    assert gaz.resolve("Paris, JP") is None
+
+
+def test_hint_that_is_not_a_country_is_left_unresolved(gaz):
+    assert gaz.resolve("Paris, Texas") is None
+    assert gaz.resolve("Paris Texas") is None
+    assert gaz.resolve("Portland, Oregon") is None
+
+
+def test_country_names_need_the_countries_file(gaz, gaz_with_countries):
+    assert gaz.resolve("Paris, France") is None
+    assert gaz_with_countries.resolve("Paris, France").country == "FR"
+    assert gaz_with_countries.resolve("Paris, United States").country == "US"
+    assert gaz_with_countries.resolve("Paris, USA").country == "US"
+    assert gaz_with_countries.resolve("tokyo japan").name == "Tokyo"
+
+
+def test_near_misses_do_not_resolve(gaz):
+    assert gaz.resolve("Capri") is None
+    assert gaz.resolve("Pariss") is None
+
+
+def test_similar_suggests_near_misses(gaz):
+    assert [c.name for c in gaz.similar("Capri")] == ["Carpi"]
+    assert [c.canonical for c in gaz.similar("Pariss")] == ["Paris, FR", "Paris, US"]
+    assert [c.name for c in gaz.similar("Zurihc")] == ["Zürich"]
+    assert gaz.similar("Rom") == []  # too short for typo tolerance
+
+
+def test_suggest_by_prefix(gaz):
+    assert [c.canonical for c in gaz.suggest("port")] == ["Portland, US", "Portland, US"]
+    assert [c.name for c in gaz.suggest("new y")] == ["New York City"]
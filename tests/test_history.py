@@ -0,0 +1,129 @@
+import json
+
+from assistant import trim_history
+from history import (
+    DIGEST_PREFIX,
+    SUMMARY_PREFIX,
+    compact_history,
+    history_tokens,
+    is_digest,
+    is_summary,
+    tool_digest,
+)
+
+SYSTEM = {"role": "system", "content": "You are a travel assistant."}
+
+
+def _turns(n: int, words: int = 40) -> list[dict]:
+    messages = []
+    for i in range(n):
+        messages.append({"role": "user", "content": f"question {i} " + "word " * words})
+        messages.append({"role": "assistant", "content": f"answer {i} " + "word " * words})
+    return messages
+
+
+def _forecast(location: str, precip) -> str:
+    day = {"date": "2026-10-18", "temp_min_celsius": 11.4, "temp_max_celsius": 19.6, "description": "light rain", "precipitation_chance_percent": precip}
+    return json.dumps({"location": location, "forecast": [day], "count": 1})
+
+
+# --- compact_history ---
+
+
+def test_history_under_budget_is_unchanged():
+    history = [SYSTEM] + _turns(2)
+    compacted, saved = compact_history(history, budget=10_000)
+    assert compacted == history and saved == 0
+
+
+def test_older_turns_fold_into_a_rolling_summary():
+    history = [SYSTEM] + _turns(6, words=60)
+    compacted, saved = compact_history(history, budget=900, keep_recent=2, summary_max_tokens=1000)
+    assert compacted[0] == SYSTEM
+    assert is_summary(compacted[1])
+    summary = compacted[1]["content"]
+    assert summary.index("question 0") < summary.index("question 3")
+    assert [m["content"].split()[1] for m in compacted[2:]] == ["4", "4", "5", "5"]  # last two turns verbatim
+    assert saved == history_tokens(history[1:]) - history_tokens(compacted[1:]) > 0
+    assert history_tokens(compacted[1:]) <= 900
+
+    # The next turn carries the summary forward and adds to it.
+    again, _ = compact_history(compacted + _turns(1)[:1], budget=900, keep_recent=2, summary_max_tokens=1000)
+    assert [m for m in again if is_summary(m)][0]["content"].startswith(SUMMARY_PREFIX + "- User: question 0")
+    assert "question 4" in again[1]["content"]
+
+
+def test_summary_is_capped_and_the_latest_turn_always_kept():
+    history = [SYSTEM] + _turns(10) + [{"role": "user", "content": "latest " + "word " * 400}]
+    compacted, _ = compact_history(history, budget=50, keep_recent=3, summary_max_tokens=120)
+    summary = compacted[1]["content"][len(SUMMARY_PREFIX):]
+    assert len(summary) // 4 <= 120
+    assert "question 0" not in summary  # oldest lines dropped first
+    assert compacted[-1]["content"].startswith("latest")
+
+
+def test_digest_stays_after_the_turns():
+    digest = {"role": "system", "content": DIGEST_PREFIX + "- now Rome: 20°C sunny"}
+    compacted, _ = compact_history([SYSTEM] + _turns(6) + [digest], budget=300, keep_recent=1)
+    assert compacted[-1] == digest
+
+
+# --- tool_digest ---
+
+
+def test_digest_of_forecast_places_and_current_weather():
+    places = {"location": "Rome", "places": [{"name": "Roscioli", "lat": 41.8937, "lon": 12.4733}, {"name": "Armando"}]}
+    digest = tool_digest([
+        ("get_weather_forecast", {"location": "Rome"}, _forecast("Rome, IT", 40)),
+        ("search_places", {"category": "restaurant"}, json.dumps(places)),
+        ("get_current_temperature", {}, json.dumps({"location": "Rome, IT", "temperature_celsius": 20.4, "description": "sunny"})),
+    ])
+    lines = digest["content"][len(DIGEST_PREFIX):].splitlines()
+    assert lines == [
+        "- forecast Rome, IT: 2026-10-18 11-20°C light rain, precip 40%",
+        "- restaurants near Rome: Roscioli (41.8937,12.4733), Armando",
+        "- now Rome, IT: 20°C sunny",
+    ]
+
+
+def test_digest_handles_null_precipitation():
+    content = tool_digest([("get_weather_forecast", {}, _forecast("Oslo, NO", None))])["content"]
+    assert "None" not in content and "precip ?" in content
+
+
+def test_digest_skips_errors_and_knowledge_fallbacks_and_is_capped():
+    assert tool_digest([
+        ("get_weather_forecast", {}, json.dumps({"error": "city not found"})),
+        ("search_places", {}, json.dumps({"use_knowledge": True})),
+        ("search_places", {}, "not json"),
+    ]) is None
+    many = [("get_weather_forecast", {}, _forecast(f"City {i}", 10)) for i in range(50)]
+    assert len(tool_digest(many, max_chars=300)["content"]) <= 300
+
+
+# --- trim_history ---
+
+
+def _tool_turn(question: str, location: str) -> list[dict]:
+    call = {"id": f"call_{location}", "type": "function", "function": {"name": "get_weather_forecast", "arguments": json.dumps({"location": location})}}
+    return [
+        {"role": "user", "content": question},
+        {"role": "assistant", "content": None, "tool_calls": [call]},
+        {"role": "tool", "tool_call_id": call["id"], "content": _forecast(location, 10)},
+        {"role": "assistant", "content": f"{location} looks mild."},
+    ]
+
+
+def test_trim_keeps_the_latest_tool_turns_digest():
+    history = [SYSTEM] + _tool_turn("Weather in Rome?", "Rome") + [
+        {"role": "user", "content": "Thanks! Anything else?"},
+        {"role": "assistant", "content": "Bring an umbrella."},
+    ]
+    trimmed = trim_history(history)
+    assert [m["role"] for m in trimmed] == ["system", "user", "assistant", "user", "assistant", "system"]
+    assert is_digest(trimmed[-1]) and "Rome" in trimmed[-1]["content"]
+
+    # Digest messages carried in history survive until a newer tool turn replaces them.
+    trimmed = trim_history(trimmed + _tool_turn("And Oslo?", "Oslo"))
+    digests = [m for m in trimmed if is_digest(m)]
+    assert len(digests) == 1 and "Oslo" in digests[0]["content"] and "Rome" not in digests[0]["content"]
@@ -0,0 +1,128 @@
+import time
+
+import pytest
+
+import http_client
+from scheduler import HostLimiter
+
+URL = "https://api.openweathermap.org/data/2.5/weather"  # retries=2 in HTTP_HOST_SETTINGS
+
+
+class _Response:
+    def __init__(self, status_code: int, headers: dict | None = None) -> None:
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = HostLimiter("api.openweathermap.org", rate_per_s=20.0, burst=1, max_in_flight=1)
+    monkeypatch.setattr(http_client, "host_limiter", lambda host: limiter)
+    monkeypatch.setattr(http_client, "_breakers", {})
+    monkeypatch.setattr(http_client, "HTTP_RETRY_BACKOFF_S", 0.001)
+    return limiter
+
+
+def test_each_retry_attempt_goes_through_the_limiter(monkeypatch, limiter):
+    responses = [_Response(503), _Response(429), _Response(200)]
+    sent_at = []
+
+    def fake_request(method, url, **kwargs):
+        assert limiter.metrics()["in_flight"] == 1
+        sent_at.append(time.monotonic())
+        return responses[len(sent_at) - 1]
+
+    monkeypatch.setattr(http_client._session, "request", fake_request)
+    resp = http_client.get(URL)
+
+    assert resp.status_code == 200
+    assert responses[0].closed and responses[1].closed
+    assert limiter.metrics()["count"] == 3
+    # burst 1 at 20/s: every attempt after the first waits for a fresh token
+    assert all(b - a >= 0.04 for a, b in zip(sent_at, sent_at[1:]))
+
+
+def test_non_idempotent_requests_are_not_retried(monkeypatch, limiter):
+    calls = []
+    monkeypatch.setattr(http_client._session, "request", lambda *a, **kw: calls.append(1) or _Response(503))
+    assert http_client.post(URL).status_code == 503
+    assert len(calls) == 1
+
+
+def test_stream_holds_the_slot_until_the_response_is_closed(monkeypatch, limiter):
+    response = _Response(200)
+    monkeypatch.setattr(http_client._session, "request", lambda *a, **kw: response)
+
+    with http_client.stream("POST", URL) as r:
+        assert r is response
+        assert limiter.metrics()["in_flight"] == 1
+        assert not response.closed
+    assert response.closed
+    assert limiter.metrics()["in_flight"] == 0
+
+
+OVERPASS = "https://overpass-api.de/api/interpreter"  # retries=1, retry_post=True
+
+
+def test_stream_retries_before_the_body_is_read(monkeypatch, limiter):
+    responses = [_Response(504, {"Retry-After": "0"}), _Response(200)]
+    seen = []
+
+    def fake_request(method, url, **kwargs):
+        assert kwargs["stream"] and limiter.metrics()["in_flight"] == 1
+        seen.append(method)
+        return responses[len(seen) - 1]
+
+    monkeypatch.setattr(http_client._session, "request", fake_request)
+    with http_client.stream("POST", OVERPASS, data={"data": "q"}) as r:
+        assert r is responses[1]
+        assert responses[0].closed
+    assert seen == ["POST", "POST"]
+    assert limiter.metrics()["count"] == 2 and limiter.metrics()["in_flight"] == 0
+
+
+def test_stream_retries_connect_errors_but_not_errors_while_reading(monkeypatch, limiter):
+    import requests
+
+    attempts = []
+
+    def fake_request(method, url, **kwargs):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise requests.ConnectionError("refused")
+        return _Response(200)
+
+    monkeypatch.setattr(http_client._session, "request", fake_request)
+    with pytest.raises(requests.ConnectionError, match="reset"):
+        with http_client.stream("POST", OVERPASS):
+            raise requests.ConnectionError("reset while reading")
+    assert len(attempts) == 2
+    assert limiter.metrics()["in_flight"] == 0
+
+
+def test_astream_retries_through_the_limiter(monkeypatch, limiter):
+    import asyncio
+
+    import httpx
+
+    statuses = iter([429, 200])
+
+    def handler(request):
+        assert limiter.metrics()["in_flight"] == 1
+        status = next(statuses)
+        return httpx.Response(status, headers={"Retry-After": "0"} if status == 429 else {}, content=b"{}")
+
+    async def main():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(http_client, "_async_client", lambda: client)
+        async with http_client.astream("POST", OVERPASS, data={"data": "q"}) as r:
+            assert r.status_code == 200
+            assert await r.aread() == b"{}"
+        await client.aclose()
+
+    asyncio.run(main())
+    assert limiter.metrics()["count"] == 2 and limiter.metrics()["in_flight"] == 0
@@ -0,0 +1,92 @@
+import json
+import random
+
+import pytest
+
+import poi_index
+
+CENTER = (48.8566, 2.3522)  # Paris
+TAGS = {
+    "restaurant": {"amenity": "restaurant"},
+    "museum": {"tourism": "museum"},
+    "park": {"leisure": "park"},
+}
+
+
+@pytest.fixture(scope="module")
+def points():
+    """(lat, lon, category, name) spread over ~±6 km around CENTER."""
+    rng = random.Random(7)
+    return [
+        (CENTER[0] + rng.uniform(-0.05, 0.05), CENTER[1] + rng.uniform(-0.08, 0.08), rng.choice(list(TAGS)), f"Place {i}")
+        for i in range(1500)
+    ]
+
+
+@pytest.fixture(scope="module")
+def store(points, tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("poi")
+    elements = [
+        {"type": "node", "id": i, "lat": lat, "lon": lon, "tags": {"name": name, **TAGS[cat]}}
+        for i, (lat, lon, cat, name) in enumerate(points)
+    ]
+    elements.append({"type": "node", "id": -1, "lat": CENTER[0], "lon": CENTER[1], "tags": {"amenity": "bench"}})
+    elements.append({"type": "way", "id": -2, "center": {"lat": CENTER[0], "lon": CENTER[1]}, "tags": {"name": "Square", "leisure": "garden"}})
+    dump = tmp / "paris.json"
+    dump.write_text(json.dumps({"elements": elements}), encoding="utf-8")
+    header = poi_index.ingest(tmp / "poi.bin", [dump])
+    assert header["count"] == len(points) + 1  # the unnamed bench is dropped, the way's center kept
+    return poi_index.PoiStore.open(tmp / "poi.bin")
+
+
+def _brute_force(points, lat, lon, category=None):
+    return sorted(
+        (poi_index.distance_m(lat, lon, p_lat, p_lon), name)
+        for p_lat, p_lon, cat, name in points
+        if category is None or cat == category
+    )
+
+
+@pytest.mark.parametrize("radius_m", [150, 900, 2500])
+@pytest.mark.parametrize("category", [None, "museum"])
+def test_radius_matches_brute_force(store, points, radius_m, category):
+    lat, lon = CENTER[0] + 0.013, CENTER[1] - 0.021
+    found = {store.place(i)["name"] for d, i in store.radius(lat, lon, radius_m, category)}
+    expected = _brute_force(points, lat, lon, category)
+    inside = {name for d, name in expected if d < radius_m * 0.995}
+    outside = {name for d, name in expected if d > radius_m * 1.005}
+    assert inside <= found
+    assert not found & outside
+    distances = [d for d, _ in store.radius(lat, lon, radius_m, category)]
+    assert distances == sorted(distances)
+
+
+@pytest.mark.parametrize("k", [1, 10, 60])
+@pytest.mark.parametrize("category", [None, "park", "restaurant"])
+def test_nearest_matches_brute_force(store, points, k, category):
+    lat, lon = CENTER[0] - 0.007, CENTER[1] + 0.033
+    result = store.nearest(lat, lon, k, category)
+    expected = _brute_force(points, lat, lon, category)[:k]
+    assert len(result) == k
+    for (d, i), (expected_d, _) in zip(result, expected):
+        assert d == pytest.approx(expected_d, rel=0.01, abs=1.0)
+    if category:
+        assert {store.place(i)["name"] for _, i in result} <= {name for _, _, cat, name in points if cat == category}
+
+
+def test_nearest_respects_max_radius_and_unknown_categories(store, points):
+    lat, lon = CENTER
+    result = store.nearest(lat, lon, 50, max_radius_m=300)
+    assert result and all(d <= 300 for d, _ in result)
+    assert len(result) <= len(store.radius(lat, lon, 300))
+    assert store.nearest(lat, lon, 5, category="beach") == []
+    assert store.nearest(lat, lon, 0) == []
+
+
+def test_place_shape_and_coverage(store):
+    d, i = store.nearest(*CENTER, 1)[0]
+    place = store.place(i)
+    assert place["name"] == "Square" and place["category"] == "garden" and d < 1
+    assert set(place) == {"name", "category", "address", "lat", "lon"}
+    assert store.covers(*CENTER)
+    assert not store.covers(35.68, 139.69)
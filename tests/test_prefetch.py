@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+import gazetteer
+import prefetch
+import tools
+from cache import TTLCache
+from gazetteer import Gazetteer
+from scheduler import PRIORITY_PREFETCH, current_priority, tool_scheduler
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch, cities_file):
+    gaz = Gazetteer.load(cities_file)
+    monkeypatch.setattr(gazetteer, "get_gazetteer", lambda: gaz)
+    monkeypatch.setattr(tools, "OPENWEATHER_API_KEY", "test")
+    monkeypatch.setattr(tools, "_forecast_cache", TTLCache(ttl=60))
+    monkeypatch.setattr(tools, "_forecast_aliases", TTLCache(ttl=60))
+    monkeypatch.setattr(tools, "_forecast_by_name", TTLCache(ttl=0))
+
+
+def test_candidate_names():
+    assert "Florence" in prefetch.candidate_names("3 days in rome then Florence")
+    assert "rome" in prefetch.candidate_names("3 days in rome then Florence")
+
+
+def test_warm_ups_are_cancellable_tasks_at_prefetch_priority(monkeypatch):
+    priorities = []
+    cancelled = []
+
+    async def warm(location):
+        priorities.append(current_priority.get())
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.append(location)
+            raise
+
+    monkeypatch.setattr(tools, "awarm_forecast", warm)
+    monkeypatch.setattr(tools, "awarm_places", warm)
+
+    async def main():
+        p = prefetch.Prefetcher(places=True)
+        p.feed("2 days in Rome, then Florence", final=True)
+        await asyncio.sleep(0.01)
+        assert p.locations == ["Rome, IT", "Florence, IT"]
+        assert tool_scheduler.metrics()["running"] == 0
+        assert p.cancel() == 4  # running warm-ups are cancelled too
+        await asyncio.sleep(0.01)
+        assert p.stats()["cancelled"] == 4
+
+    asyncio.run(main())
+    assert priorities == [PRIORITY_PREFETCH] * 4
+    assert sorted(cancelled) == ["Florence, IT", "Florence, IT", "Rome, IT", "Rome, IT"]
+
+
+def test_cancelling_a_warm_up_a_real_call_joined_keeps_its_load(monkeypatch):
+    fetches = []
+
+    async def load_forecast(params):
+        fetches.append(params)
+        await asyncio.sleep(0.05)
+        return {"location": "Rome, IT", "city_id": 1, "slots": []}
+
+    monkeypatch.setattr(tools, "_aload_forecast", load_forecast)
+
+    async def main():
+        p = prefetch.Prefetcher()
+        p.feed("weekend in Rome", final=True)
+        await asyncio.sleep(0.01)
+        real = asyncio.ensure_future(tools._aforecast_data("Rome"))
+        await asyncio.sleep(0.01)
+        p.cancel()
+        assert (await real)["location"] == "Rome, IT"
+
+    asyncio.run(main())
+    assert fetches == [{"q": "Rome,IT"}]
@@ -0,0 +1,56 @@
+import pytest
+
+import router
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "What's the weather in Paris this week?",
+        "Temperature in Tokyo and London tomorrow",
+        "Will it be rainy in Rome on Saturday?",
+        "Is it going to rain during my train ride to Milan?",
+        "Forecasts for Oslo, is it snowing?",
+    ],
+)
+def test_weather_only_messages_get_the_weather_route(message):
+    r = router.route(message)
+    assert r.name == "weather"
+    assert r.tools == router.WEATHER_TOOLS
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "weather and restaurants in Rome",
+        "Weather in Rome and where to eat",
+        "weather in Lisbon, plus some good food spots",
+        "Is it sunny enough for sightseeing in Madrid?",
+        "forecast for Paris and a couple of galleries",
+        "rain in Vienna? suggest museums",
+    ],
+)
+def test_mixed_messages_get_the_full_schema_set(message):
+    r = router.route(message)
+    assert r.name == "full"
+    assert r.tools is None
+    assert r.weather and r.places
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "Take the train from Rome to Florence",
+        "Visit the temple in Kyoto",
+        "Sunday in Berlin",
+        "hello",
+    ],
+)
+def test_no_weather_words_inside_other_words(message):
+    assert "weather" not in router.intents(message)
+    assert router.route(message).tools is None
+
+
+def test_intents_are_found_in_one_scan():
+    assert router.intents("Plan a trip to Rome and check the forecast") == {"places", "weather"}
+    assert router.intents("") == set()
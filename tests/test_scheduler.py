@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from scheduler import HostLimiter
+
+
+def test_slots_are_granted_by_priority_then_fifo():
+    limiter = HostLimiter("example.org", rate_per_s=None, burst=1, max_in_flight=1)
+    order = []
+
+    async def waiter(priority, name):
+        await limiter.aacquire(priority)
+        order.append(name)
+
+    async def main():
+        await limiter.aacquire(0)
+        tasks = []
+        for priority, name in [(3, "low"), (1, "high"), (2, "mid"), (1, "high-later")]:
+            tasks.append(asyncio.ensure_future(waiter(priority, name)))
+            await asyncio.sleep(0)
+        assert limiter.metrics()["waiting"] == 4
+        for _ in tasks:
+            limiter.release()
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+        limiter.release()
+
+    asyncio.run(main())
+    assert order == ["high", "high-later", "mid", "low"]
+    assert limiter.metrics()["in_flight"] == 0
+
+
+def test_token_bucket_spaces_requests_after_the_burst():
+    limiter = HostLimiter("example.org", rate_per_s=20.0, burst=2, max_in_flight=10)
+    start = time.monotonic()
+    granted_at = []
+    for _ in range(6):
+        assert limiter.acquire(timeout=1)
+        granted_at.append(time.monotonic() - start)
+        limiter.release()
+    assert granted_at[1] < 0.02  # the burst goes out at once
+    assert 0.18 <= granted_at[-1] < 0.6  # then one every 50 ms
+
+
+def test_timed_out_and_cancelled_waiters_are_withdrawn():
+    limiter = HostLimiter("example.org", rate_per_s=None, burst=1, max_in_flight=1)
+    assert limiter.acquire()
+    assert not limiter.acquire(timeout=0.02)
+
+    async def cancel_waiter():
+        task = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(cancel_waiter())
+    assert limiter.metrics()["waiting"] == 0
+    limiter.release()
+    assert limiter.metrics()["in_flight"] == 0
+    assert limiter.acquire(timeout=0.1)
@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import server
+from assistant import StreamChunk
+
+
+def _events(chunks):
+    """Parse SSE body chunks into (event, data) pairs."""
+    events = []
+    for _, body in chunks:
+        for block in body.decode().split("\n\n"):
+            if block:
+                name, data = block.split("\n", 1)
+                events.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def _app(**kwargs):
+    return server.AssistantApp(llm=server._BenchLLM(0, 0, 3), tool_registry=server._bench_registry(0), **kwargs)
+
+
+async def _session(app):
+    status, chunks = await server._call(app, "POST", "/sessions", {"preferences": "museums"})
+    assert status == 201
+    return json.loads(chunks[-1][1])["session_id"]
+
+
+def test_turn_streams_sse_events_and_keeps_history():
+    app = _app()
+
+    async def main():
+        session_id = await _session(app)
+        status, chunks = await server._call(app, "POST", f"/sessions/{session_id}/messages", {"message": "Weather in Rome?"})
+        return session_id, status, chunks
+
+    session_id, status, chunks = asyncio.run(main())
+    assert status == 200
+    assert chunks[-1][1] == b""  # the stream is closed after the result
+    events = _events(chunks)
+    names = [name for name, _ in events]
+    assert names[-1] == "result" and "stats" in names
+    assert "".join(data["text"] for name, data in events if name == "delta") == "word0 word1 word2 "
+    assert events[-1][1]["weather_api_used"] is True
+    assert "history" not in json.dumps(events[-1][1])
+    session = app.store.get(session_id)
+    contents = [m.get("content") or "" for m in session.history]
+    assert "Weather in Rome?" in contents and "word0 word1 word2 " in contents
+    assert not session.busy
+    health = app.health()
+    assert health["turns"] == 1 and health["active_turns"] == 0 and health["disconnects"] == 0
+
+
+def test_busy_sessions_full_server_and_bad_requests_are_rejected():
+    async def main():
+        app = _app()
+        session_id = await _session(app)
+        app.store.get(session_id).busy = True
+        busy, _ = await server._call(app, "POST", f"/sessions/{session_id}/messages", {"message": "Weather?"})
+        missing, _ = await server._call(app, "POST", f"/sessions/{session_id}/messages", {})
+        unknown, _ = await server._call(app, "POST", "/sessions/nope/messages", {"message": "Weather?"})
+        full = _app(max_turns=0)
+        other = await _session(full)
+        shed, _ = await server._call(full, "POST", f"/sessions/{other}/messages", {"message": "Weather?"})
+        return busy, missing, unknown, shed, full.health()["rejected"]
+
+    assert asyncio.run(main()) == (409, 400, 404, 503, 1)
+
+
+class _StallingLLM:
+    """Streams one delta, then stalls until cancelled."""
+
+    def __init__(self) -> None:
+        self.closed = asyncio.Event()
+
+    async def stream_completion(self, messages, tools, tool_choice, **kwargs):
+        try:
+            yield StreamChunk(content="Let me check ")
+            await asyncio.sleep(3600)
+            yield StreamChunk(finish_reason="stop")
+        finally:
+            self.closed.set()
+
+
+def test_client_disconnect_cancels_the_turn_and_frees_the_session():
+    async def main():
+        llm = _StallingLLM()
+        app = server.AssistantApp(llm=llm, tool_registry=server._bench_registry(0))
+        session_id = await _session(app)
+        first_delta = asyncio.Event()
+        sent = []
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": json.dumps({"message": "Hello"}).encode(), "more_body": False}
+            await first_delta.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if b"event: delta" in message.get("body", b""):
+                first_delta.set()
+
+        scope = {"type": "http", "method": "POST", "path": f"/sessions/{session_id}/messages", "headers": []}
+        await asyncio.wait_for(app(scope, receive, send), 2)
+        await asyncio.wait_for(llm.closed.wait(), 1)
+        return app, session_id, sent
+
+    app, session_id, sent = asyncio.run(main())
+    assert sent[0]["status"] == 200
+    assert all(m.get("more_body", True) for m in sent[1:])  # no clean end of stream after the disconnect
+    assert app.health()["disconnects"] == 1 and app.health()["active_turns"] == 0
+    session = app.store.get(session_id)
+    assert not session.busy and session.history == []
@@ -0,0 +1,65 @@
+import types
+
+import pytest
+
+import stream_render
+from stream_render import ThrottledRenderer
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = types.SimpleNamespace(now=100.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(stream_render, "time", fake)
+    return fake
+
+
+def test_first_delta_renders_then_at_most_once_per_interval(clock):
+    frames = []
+    view = ThrottledRenderer(frames.append, interval=0.1)
+    view.append("Hello")
+    view.append(", ")
+    clock.now += 0.05
+    view.append("world")
+    assert frames == ["Hello"]
+    clock.now += 0.06
+    view.append("!")
+    assert frames == ["Hello", "Hello, world!"]
+    assert view.renders == 2
+
+
+def test_flush_shows_text_held_back_by_the_throttle(clock):
+    frames = []
+    view = ThrottledRenderer(frames.append, interval=0.1)
+    view.append("Checking the forecast")
+    view.append(" for Rome…")
+    view.flush()  # e.g. the stream pauses for a tool round
+    assert frames[-1] == "Checking the forecast for Rome…"
+    view.flush()
+    view.append("")
+    assert view.renders == 2  # nothing new: no re-render
+
+
+def test_set_replaces_the_buffer_and_renders_now(clock):
+    frames = []
+    view = ThrottledRenderer(frames.append, interval=0.1)
+    view.append("draft")
+    view.append(" text")
+    view.set("Final answer.")
+    assert frames == ["draft", "Final answer."]
+    assert view.text == "Final answer."
+
+
+def test_long_answer_renders_a_fraction_of_the_text(clock):
+    """A 1,500-token answer at 50 tokens/s: re-rendered characters drop from quadratic to ~one frame per interval."""
+    frames = []
+    view = ThrottledRenderer(frames.append, interval=0.05)
+    deltas = [f"word{i} " for i in range(1500)]
+    for delta in deltas:
+        view.append(delta)
+        clock.now += 0.02
+    view.flush()
+    naive_chars = sum(len("".join(deltas[: i + 1])) for i in range(len(deltas)))
+    assert frames[-1] == "".join(deltas)
+    assert len(frames) <= 1500 * 0.02 / 0.05 + 2
+    assert sum(map(len, frames)) < naive_chars / 2
@@ -0,0 +1,267 @@
+import asyncio
+import contextlib
+import json
+import threading
+import time
+import types
+
+import pytest
+import requests
+
+import cache as cache_module
+from cache import CachePolicy
+from config import GEOCODE_CACHE_MAXSIZE, GEOCODE_NEGATIVE_TTL_S
+from scheduler import PRIORITY_DEFAULT, current_deadline, current_priority
+from tools import ToolRegistry
+
+SCHEMA = {"type": "function", "function": {"name": "slow", "parameters": {"type": "object", "properties": {}}}}
+
+
+def _registry(delay: float, calls: list) -> ToolRegistry:
+    async def slow(**kwargs) -> str:
+        calls.append(current_deadline.get())
+        await asyncio.sleep(delay)
+        return json.dumps({"ok": True})
+
+    reg = ToolRegistry()
+    reg.register_async("slow", SCHEMA, slow, priority=1, fallback=lambda **kw: json.dumps({"fallback": True}), cache=CachePolicy(ttl=60))
+    return reg
+
+
+def test_run_async_resets_priority_and_deadline():
+    reg = _registry(0, [])
+
+    async def main():
+        assert json.loads(await reg.run_async("slow", {}, time.monotonic() + 5)) == {"ok": True}
+        assert current_priority.get() == PRIORITY_DEFAULT
+        assert current_deadline.get() is None
+
+    asyncio.run(main())
+
+
+def test_deadline_bounds_each_caller_not_the_shared_load():
+    calls: list = []
+    reg = _registry(0.2, calls)
+
+    async def main():
+        hurried = asyncio.ensure_future(reg.run_async("slow", {}, time.monotonic() + 0.02))
+        await asyncio.sleep(0.005)
+        patient = asyncio.ensure_future(reg.run_async("slow", {}))
+        assert json.loads(await hurried) == {"fallback": True}
+        assert json.loads(await patient) == {"ok": True}
+
+    asyncio.run(main())
+    assert calls == [None]  # one load, run without the hurried caller's deadline
+    assert reg.deadline_misses() == {"slow": 1}
+
+
+def test_sync_deadline_bounds_the_wait_on_a_cached_tool():
+    loaded = threading.Event()
+
+    def slow(**kwargs) -> str:
+        time.sleep(0.3)
+        loaded.set()
+        return json.dumps({"ok": True})
+
+    reg = ToolRegistry()
+    reg.register("slow", SCHEMA, slow, fallback=lambda **kw: json.dumps({"fallback": True}), cache=CachePolicy(ttl=60))
+    start = time.monotonic()
+    assert json.loads(reg.run("slow", {}, start + 0.05)) == {"fallback": True}
+    assert time.monotonic() - start < 0.2
+    assert reg.deadline_misses() == {"slow": 1}
+    assert loaded.wait(1)  # the load went on and serves the next caller
+    assert json.loads(reg.run("slow", {}, time.monotonic() + 0.05)) == {"ok": True}
+
+
+def _element(i: int, name: str, lat: float, lon: float, way: bool = False, **tags) -> dict:
+    if way:
+        return {"type": "way", "id": i, "center": {"lat": lat, "lon": lon}, "tags": {"name": name, **tags}}
+    return {"type": "node", "id": i, "lat": lat, "lon": lon, "tags": {"name": name, **tags}}
+
+
+class _StreamedResponse:
+    status_code = 200
+
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    def iter_content(self, chunk_size: int):
+        for i in range(0, len(self._body), 7):  # small chunks: elements straddle chunk boundaries
+            yield self._body[i:i + 7]
+
+    def close(self) -> None:
+        pass
+
+
+def test_overpass_query_has_no_server_side_cap():
+    import re
+
+    import tools
+
+    query = tools._overpass_query(48.85, 2.35)
+    assert "out body;" in query and "out tags center;" in query
+    assert not re.search(r"out [a-z ]*\d+;", query)
+
+
+def test_nearest_places_come_from_the_whole_response(monkeypatch):
+    import tools
+
+    monkeypatch.setattr(tools, "OVERPASS_MAX_CANDIDATES", 5)
+    lat, lon = 48.85, 2.35
+    # Overpass order: far restaurant nodes first (more than the cap), the nearest ones last; parks only as ways.
+    elements = [_element(i, f"far {i}", lat + 0.03 + i * 0.0001, lon, amenity="restaurant") for i in range(20)]
+    elements += [_element(100 + i, f"near {i}", lat + 0.0005 * (i + 1), lon, amenity="restaurant") for i in range(3)]
+    elements += [_element(200 + i, f"park {i}", lat - 0.001 * (i + 1), lon, way=True, leisure="park") for i in range(8)]
+    body = json.dumps({"version": 0.6, "elements": elements}).encode()
+    monkeypatch.setattr(tools.http_client, "stream", lambda *args, **kwargs: contextlib.nullcontext(_StreamedResponse(body)))
+
+    places = tools._load_places(lat, lon)
+
+    assert [p["name"] for p in places["restaurant"]] == ["near 0", "near 1", "near 2", "far 0", "far 1"]
+    assert [p["name"] for p in places["park"]] == ["park 0", "park 1", "park 2", "park 3", "park 4"]
+    assert places["museum"] == []
+
+
+def test_nearest_duplicate_name_wins_whatever_its_position(monkeypatch):
+    import tools
+
+    lat, lon = 48.85, 2.35
+    elements = [
+        _element(1, "Starbucks", lat + 0.04, lon, amenity="restaurant"),  # ~4.4 km, first in the response
+        _element(2, "Bistro", lat + 0.002, lon, amenity="restaurant"),
+        _element(3, "Starbucks", lat + 0.0001, lon, amenity="restaurant"),  # ~11 m
+    ]
+    body = json.dumps({"elements": elements}).encode()
+    monkeypatch.setattr(tools.http_client, "stream", lambda *args, **kwargs: contextlib.nullcontext(_StreamedResponse(body)))
+
+    restaurants = tools._load_places(lat, lon)["restaurant"]
+
+    assert [p["name"] for p in restaurants] == ["Starbucks", "Bistro"]
+    assert restaurants[0]["lat"] == lat + 0.0001
+
+
+def test_sync_run_of_async_only_tool_uses_the_shared_background_loop():
+    from scheduler import background_loop
+
+    loops = []
+
+    async def tool(**kwargs) -> str:
+        loops.append(asyncio.get_running_loop())
+        return json.dumps({"ok": True})
+
+    reg = ToolRegistry()
+    reg.register_async("slow", SCHEMA, tool)
+    assert json.loads(reg.run("slow", {})) == {"ok": True}
+    assert json.loads(reg.run("slow", {})) == {"ok": True}
+    assert loops == [background_loop(), background_loop()]
+
+
+def test_forecast_windows_are_sliced_from_one_cached_fetch(openweather):
+    from tools import get_weather_forecast
+
+    week = json.loads(get_weather_forecast("Zyxburg", days=5))
+    tomorrow_on = json.loads(get_weather_forecast("zyxburg ", days=2, offset_days=1))
+    last_day = json.loads(get_weather_forecast("Zyxburg", days=1, offset_days=4))
+    assert openweather.forecast_requests() == 1
+    assert tomorrow_on["forecast"] == week["forecast"][1:3]
+    assert last_day["forecast"] == week["forecast"][4:5]
+    assert week["forecast"][0]["precipitation_chance_percent"] == 20
+
+
+def test_forecast_summary_skips_slots_that_have_ended():
+    from tools import _summarize_forecast
+
+    now = int(time.time())
+    slot = {"description": "rain", "pop": 0.5, "feels_like": 0.0}
+    record = {
+        "location": "Zyxburg, XX",
+        "slots": [
+            {**slot, "dt": now - 4 * 3600, "time": "", "date": "2000-01-01", "temp": -5.0},
+            {**slot, "dt": now, "time": "", "date": "2000-01-02", "temp": 3.0},
+        ],
+    }
+    summary = _summarize_forecast(record, "Zyxburg", days=5, offset_days=0)
+    assert [day["date"] for day in summary["forecast"]] == ["2000-01-02"]
+    assert summary["forecast"][0]["temp_min_celsius"] == 3.0
+
+
+class _Nominatim:
+    """Stands in for http_client.get against Nominatim: known places resolve, others are empty or fail."""
+
+    def __init__(self, known: dict[str, tuple[float, float]]) -> None:
+        self.known = known
+        self.failing = False
+        self.queries: list[str] = []
+
+    def get(self, url, params=None, **kwargs):
+        self.queries.append(params["q"])
+        if self.failing:
+            raise requests.ConnectionError("nominatim down")
+        hit = self.known.get(params["q"].lower())
+        data = [{"lat": str(hit[0]), "lon": str(hit[1])}] if hit else []
+        return types.SimpleNamespace(json=lambda: data, raise_for_status=lambda: None)
+
+
+@pytest.fixture
+def nominatim(monkeypatch):
+    import tools
+
+    fake = _Nominatim({"zyxburg": (1.5, 2.5)})
+    monkeypatch.setattr(tools.gazetteer, "lookup", lambda location: None)
+    monkeypatch.setattr(tools.http_client, "get", fake.get)
+    tools._geocode_cache.clear()
+    yield fake
+    tools._geocode_cache.clear()
+
+
+def test_geocode_cache_is_bounded_and_keyed_by_normalized_name(nominatim):
+    import tools
+
+    assert tools._geocode_cache._maxsize == GEOCODE_CACHE_MAXSIZE
+    assert tools._geocode("Zyxburg") == (1.5, 2.5)
+    assert tools._geocode("  zyxburg ") == (1.5, 2.5)
+    assert nominatim.queries == ["Zyxburg"]
+
+
+def test_geocode_caches_unknown_places_briefly_and_errors_not_at_all(nominatim, monkeypatch):
+    import tools
+
+    assert tools._geocode("Nowhereville") is None
+    assert tools._geocode("Nowhereville") is None
+    assert nominatim.queries == ["Nowhereville"]
+
+    nominatim.failing = True
+    assert tools._geocode("Qwertyton") is None
+    nominatim.failing = False
+    nominatim.known["qwertyton"] = (3.0, 4.0)
+    assert tools._geocode("Qwertyton") == (3.0, 4.0)
+
+    later = time.monotonic() + GEOCODE_NEGATIVE_TTL_S + 1
+    monkeypatch.setattr(cache_module, "time", types.SimpleNamespace(monotonic=lambda: later, time=time.time))
+    nominatim.known["nowhereville"] = (5.0, 6.0)
+    assert tools._geocode("Nowhereville") == (5.0, 6.0)
+    assert nominatim.queries == ["Nowhereville", "Qwertyton", "Qwertyton", "Nowhereville"]
+
+
+def test_current_and_forecast_share_one_weather_record(openweather):
+    from tools import aget_current_temperature, aget_weather_forecast, get_current_temperature
+
+    async def main():
+        return await asyncio.gather(aget_current_temperature("Zyxburg"), aget_weather_forecast("Zyxburg", days=2))
+
+    current, forecast = map(json.loads, asyncio.run(main()))
+    assert openweather.requests and {endpoint for endpoint, _ in openweather.requests} == {"forecast"}
+    assert openweather.forecast_requests() == 1
+    assert current["location"] == forecast["location"] == "Zyxburg, XX"
+    assert current["temperature_celsius"] in (10.0, 11.0)  # the slot nearest now: the current or next one
+    assert json.loads(get_current_temperature("zyxburg")) == current
+    assert len(openweather.requests) == 1
+
+
+def test_current_conditions_fall_back_to_weather_endpoint_without_a_near_slot(openweather, monkeypatch):
+    import tools
+
+    monkeypatch.setattr(tools, "WEATHER_CURRENT_MAX_SLOT_DISTANCE_S", -1)
+    current = json.loads(tools.get_current_temperature("Zyxburg"))
+    assert [endpoint for endpoint, _ in openweather.requests] == ["forecast", "weather"]
+    assert current["temperature_celsius"] == 21.0
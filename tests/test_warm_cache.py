@@ -0,0 +1,77 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import warm_cache
+from assistant import _ToolCallAssembler
+from cache import CachePolicy, SqliteStore
+from tools import PLACES_TOOL, WEATHER_FORECAST_TOOL, WEATHER_TOOL, ToolRegistry
+
+LOCATION_KEY = CachePolicy(ttl=3600, key=lambda kw: f"{kw.get('location')}|{json.dumps(kw, sort_keys=True)}")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SqliteStore(str(tmp_path / "tool_cache.sqlite"))
+    monkeypatch.setattr(warm_cache, "shared_store", store)
+    return store
+
+
+@pytest.fixture
+def registry(store):
+    calls = []
+
+    def tool(**kwargs) -> str:
+        calls.append(kwargs)
+        return json.dumps({"ok": True})
+
+    reg = ToolRegistry(store)
+    for name, schema in [("get_current_temperature", WEATHER_TOOL), ("get_weather_forecast", WEATHER_FORECAST_TOOL), ("search_places", PLACES_TOOL)]:
+        reg.register(name, schema, tool, cache=LOCATION_KEY)
+    reg.calls = calls
+    return reg
+
+
+def test_cli_refuses_without_a_shared_tier(monkeypatch):
+    monkeypatch.setattr(warm_cache, "shared_store", None)
+    with pytest.raises(SystemExit, match="TOOL_CACHE_PATH"):
+        warm_cache.main(["Paris"])
+
+
+def test_warm_reports_coverage_and_fills_the_shared_tier(registry, store):
+    report = warm_cache.warm(["Oslo", "Oslo"], registry)
+    assert list(report["destinations"]) == ["Oslo"]
+    assert all(report["destinations"]["Oslo"].values()) and report["coverage"] == 1.0
+    calls = len(registry.calls)
+    assert store.get("get_weather_forecast", LOCATION_KEY.key({"location": "Oslo", "days": 1, "offset_days": 0}))
+    warm_cache.warm(["Oslo"], registry)
+    assert len(registry.calls) == calls  # second run served from the cache
+
+
+def test_traffic_ranks_user_requests_not_warmed_entries(registry):
+    warm_cache.warm(["Oslo"], registry)  # ~19 cached keys, no demand
+    for _ in range(3):
+        registry.record_demand("get_weather_forecast", {"location": "Rome", "days": 3})
+    registry.record_demand("search_places", {"location": "Paris", "category": "museum"})
+    registry.record_demand("search_places", {"location": "Paris", "category": "park"})
+    registry.record_demand("search_places", {"location": "Paris", "category": "park"})
+    registry.record_demand("get_current_temperature", {"location": "Lima"})
+
+    assert warm_cache.destinations_from_traffic(2) == ["Rome", "Paris"]
+    assert warm_cache.destinations_from_traffic(10) == ["Rome", "Paris", "Lima"]
+    assert warm_cache.destinations_from_traffic(10, window_s=0) == []
+
+
+def test_assistant_tool_calls_are_recorded_as_demand(registry, store):
+    async def main():
+        assembler = _ToolCallAssembler(registry)
+        await assembler._submit("get_current_temperature", {"location": "Kyoto"})
+        for _ in range(100):
+            if store.demand("get_current_temperature", 0):
+                break
+            await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert store.demand("get_current_temperature", time.time() - 60) == [("Kyoto|" + json.dumps({"location": "Kyoto"}), 1)]
@@ -2,21 +2,58 @@
 Tools: OpenAI schemas, weather/places implementations, and tool registry.
 """
 
+import asyncio
+import codecs
+import heapq
 import json
+import os
+import re
 import threading
+import time
 from collections import defaultdict
+from collections.abc import Awaitable
+from concurrent.futures import Future
 from typing import Callable
 
+import httpx
 import requests
 
+import gazetteer
+import http_client
+from cache import CachePolicy, SqliteStore, TieredCache, TTLCache
 from config import (
+    CURRENT_WEATHER_CACHE_TTL_S,
+    FORECAST_CACHE_STALE_S,
+    FORECAST_REFRESH_INTERVAL_S,
+    GEOCODE_CACHE_MAXSIZE,
+    GEOCODE_CACHE_TTL_S,
+    GEOCODE_NEGATIVE_TTL_S,
     NOMINATIM_URL,
     OPENWEATHER_API_KEY,
     OPENWEATHER_FORECAST_URL,
     OPENWEATHER_URL,
-    PLACE_CATEGORIES,
+    OVERPASS_COALESCE_WINDOW_S,
+    OVERPASS_MAX_CANDIDATES,
+    OVERPASS_RADIUS_M,
     OVERPASS_URL,
-    REQUEST_HEADERS,
+    PARK_MAX_PRECIPITATION_CHANCE,
+    PLACE_CATEGORIES,
+    PLACES_CACHE_TTL_S,
+    POI_INDEX_PATH,
+    TOOL_CACHE_PATH,
+    TOOL_CACHE_SHARED_MAX_ROWS,
+    TOOL_DEADLINE_GRACE_S,
+    WEATHER_CURRENT_MAX_SLOT_DISTANCE_S,
+)
+from poi_index import PoiStore, distance_m, matching_categories
+from scheduler import (
+    PRIORITY_DEFAULT,
+    PRIORITY_POI,
+    PRIORITY_WEATHER,
+    current_deadline,
+    current_priority,
+    run_coroutine,
+    tool_scheduler,
 )
 
 # --- OpenAI tool schemas ---
@@ -46,7 +83,8 @@ PLACES_TOOL = {
         "description": (
             "Search only for restaurants, museums, or parks near a location (Overpass/OSM). "
             "Use ONLY for these three categories. All other POIs and trip attractions (sights, landmarks, cafes, bars, etc.) must be generated by you from your own knowledge—do not call this tool for them. "
-            "Trip planning flow: (1) Call get_weather_forecast (or get_current_temperature for same-day) FIRST for the destination. "
+            "For trip planning prefer plan_destination, which covers weather and all three categories in one call. "
+            "Otherwise the trip planning flow is: (1) Call get_weather_forecast (or get_current_temperature for same-day) FIRST for the destination. "
             "(2) Based on weather: if rainy or poor conditions, call search_places only for 'restaurant' and 'museum'. "
             "If weather allows (clear, mild, no heavy rain), also call search_places for 'park'. "
             "Call all applicable search_places in one round (same city, different category) so they run in parallel. "
@@ -105,97 +143,278 @@ WEATHER_FORECAST_TOOL = {
     },
 }
 
+PLAN_DESTINATION_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "plan_destination",
+        "description": (
+            "Trip planning in one call: for each destination, returns the daily forecast for its stay plus nearby restaurants, "
+            "museums and—only if rain is unlikely—parks. Use this instead of get_weather_forecast + search_places when planning a trip; "
+            "pass every city of a multi-city trip in one call. Same 5-day forecast limit as get_weather_forecast. "
+            "Categories listed under use_knowledge have no data: suggest those from your own knowledge."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "destinations": {
+                    "type": "array",
+                    "description": "One entry per city, in trip order.",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "location": {"type": "string", "description": "City name, e.g. 'Rome' or 'Florence, Italy'"},
+                            "days": {"type": "integer", "description": "Days in this city (1-5). Default 3.", "default": 3},
+                            "offset_days": {
+                                "type": "integer",
+                                "description": "First day in this city: 0=today, 1=tomorrow, ... up to 4. Default 0.",
+                                "default": 0,
+                            },
+                        },
+                        "required": ["location"],
+                    },
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Max places per category (default 10).",
+                    "default": 10,
+                },
+            },
+            "required": ["destinations"],
+        },
+    },
+}
+
+# --- Location identity ---
+
+
+def _location_key(location: str) -> str:
+    """Normalize a user-supplied place name for cache lookups (case and whitespace)."""
+    return " ".join((location or "").lower().split())
+
+
+def _canonical_location(location: str) -> tuple[str, str]:
+    """
+    (cache key, upstream query) for a place name. When the offline gazetteer has an exact match,
+    every spelling ('Paris', 'paris, france', 'Paris FR') maps to one key and one 'City,CC' query;
+    anything else (typos, 'Paris, Texas') is sent upstream as typed.
+    """
+    city = gazetteer.lookup(location)
+    if city is None:
+        return _location_key(location), location
+    return _location_key(city.canonical), f"{city.name},{city.country}"
+
 # --- Weather implementation ---
 
 
+def _current_weather_params(location: str) -> dict:
+    return {
+        "q": _canonical_location(location)[1],
+        "appid": OPENWEATHER_API_KEY,
+        "units": "metric",
+    }
+
+
+def _weather_error(message: str, status_code: int, location: str) -> dict:
+    """Error payload for a failed OpenWeather lookup; an unknown city gets gazetteer spelling suggestions."""
+    error = {"error": message}
+    if status_code == 404:
+        suggestions = gazetteer.did_you_mean(location)
+        if suggestions:
+            error["did_you_mean"] = suggestions
+    return error
+
+
+def _current_weather_result(status_code: int, data: dict, location: str) -> dict:
+    """Build the get_current_temperature payload from an OpenWeather /weather response."""
+    if status_code != 200:
+        return _weather_error(data.get("message", "Unknown API error"), status_code, location)
+
+    temp = data.get("main", {}).get("temp")
+    feels_like = data.get("main", {}).get("feels_like")
+    desc = data.get("weather", [{}])[0].get("description", "N/A")
+    city = data.get("name", location)
+    country = data.get("sys", {}).get("country", "")
+
+    return {
+        "location": f"{city}, {country}" if country else city,
+        "temperature_celsius": temp,
+        "feels_like_celsius": feels_like,
+        "description": desc,
+    }
+
+
+def _current_from_record(record: dict) -> dict | None:
+    """
+    Current conditions from the forecast slot nearest now, or None if no slot is within
+    WEATHER_CURRENT_MAX_SLOT_DISTANCE_S (the /weather endpoint is asked instead).
+    """
+    now = time.time()
+    slot = min(record["slots"], key=lambda s: abs(s["dt"] - now), default=None)
+    if slot is None or abs(slot["dt"] - now) > WEATHER_CURRENT_MAX_SLOT_DISTANCE_S:
+        return None
+    return {
+        "location": record["location"],
+        "temperature_celsius": slot["temp"],
+        "feels_like_celsius": slot["feels_like"],
+        "description": slot["description"],
+        "as_of": slot["time"],
+    }
+
+
 def get_current_temperature(location: str) -> str:
-    """Fetch current temperature for a location using OpenWeather API."""
+    """
+    Current temperature for a location. Served from the city's cached forecast record (one fetch shared
+    with get_weather_forecast) when its nearest slot is close enough to now; otherwise from OpenWeather /weather.
+    """
     if not OPENWEATHER_API_KEY:
         return json.dumps({"error": "OpenWeather API key not configured. Add OPENWEATHER_API_KEY to .env"})
 
-    params = {
-        "q": location,
-        "appid": OPENWEATHER_API_KEY,
-        "units": "metric",
-    }
     try:
-        resp = requests.get(OPENWEATHER_URL, params=params, timeout=5)
-        data = resp.json()
-
-        if resp.status_code != 200:
-            return json.dumps({"error": data.get("message", "Unknown API error")})
-
-        temp = data.get("main", {}).get("temp")
-        feels_like = data.get("main", {}).get("feels_like")
-        desc = data.get("weather", [{}])[0].get("description", "N/A")
-        city = data.get("name", location)
-        country = data.get("sys", {}).get("country", "")
-
-        result = {
-            "location": f"{city}, {country}" if country else city,
-            "temperature_celsius": temp,
-            "feels_like_celsius": feels_like,
-            "description": desc,
-        }
-        return json.dumps(result)
+        current = _current_from_record(_forecast_data(location))
+        if current is not None:
+            return json.dumps(current)
+        resp = http_client.get(OPENWEATHER_URL, params=_current_weather_params(location))
+        return json.dumps(_current_weather_result(resp.status_code, resp.json(), location))
+    except _WeatherAPIError as e:
+        return json.dumps(_weather_error(str(e), e.status_code, location))
     except requests.RequestException as e:
         return json.dumps({"error": str(e)})
 
 
+class _WeatherAPIError(Exception):
+    """OpenWeather returned a non-200 response; message is the API's error text."""
+
+    def __init__(self, message: str, status_code: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _forecast_ttl(_data: dict) -> float:
+    """Seconds until the next 3-hour forecast refresh boundary (UTC), plus a short publishing grace."""
+    interval = FORECAST_REFRESH_INTERVAL_S
+    return interval - (time.time() % interval) + 300
+
+
+_forecast_cache = TTLCache(ttl=_forecast_ttl, stale_ttl=FORECAST_CACHE_STALE_S)
+_forecast_aliases = TTLCache(ttl=24 * 3600)
+# Not stored (ttl=0): only shares one in-flight by-name fetch between concurrent callers of a new spelling.
+_forecast_by_name = TTLCache(ttl=0)
+
+
+def _weather_record(data: dict) -> dict:
+    """
+    Normalize an OpenWeather 5-day/3-hour response into the per-city weather record both weather tools
+    read: {"location": "City, CC", "city_id", "slots": [{dt, time, date, temp, feels_like, description, pop}]}.
+    """
+    city = data.get("city", {})
+    name = city.get("name", "")
+    country = city.get("country", "")
+    slots = []
+    for entry in data.get("list", []):
+        dt_txt = entry.get("dt_txt", "")
+        if entry.get("dt") is None or not dt_txt:
+            continue
+        main = entry.get("main", {})
+        slots.append({
+            "dt": entry["dt"],
+            "time": dt_txt[:16],
+            "date": dt_txt.split()[0],
+            "temp": main.get("temp"),
+            "feels_like": main.get("feels_like"),
+            "description": (entry.get("weather") or [{}])[0].get("description"),
+            "pop": entry.get("pop"),
+        })
+    return {
+        "location": f"{name}, {country}" if country else name,
+        "city_id": city.get("id"),
+        "slots": slots,
+    }
+
+
+def _forecast_payload(status_code: int, data: dict) -> dict:
+    if status_code != 200:
+        raise _WeatherAPIError(data.get("message", "Unknown API error"), status_code)
+    return _weather_record(data)
+
+
+def _load_forecast(params: dict) -> dict:
+    """Fetch the full 5-day/3-hour series from OpenWeather as a weather record; params selects the city (q or id)."""
+    resp = http_client.get(
+        OPENWEATHER_FORECAST_URL,
+        params={**params, "appid": OPENWEATHER_API_KEY, "units": "metric"},
+    )
+    return _forecast_payload(resp.status_code, resp.json())
+
+
+def _remember_forecast(key: str, record: dict, location: str) -> dict:
+    """Cache a record fetched by name under its canonical city and alias key -> canonical."""
+    canonical = record["location"] or location
+    _forecast_cache.put(canonical, record)
+    if record["city_id"] is not None:
+        _forecast_aliases.put(key, (canonical, record["city_id"]))
+    return record
+
+
+def _forecast_data(location: str) -> dict:
+    """
+    Return the cached weather record for location, keyed by the canonical city OpenWeather resolved it to.
+    The first lookup for a spelling fetches by name; later lookups (any spelling seen before) hit the cache.
+    Concurrent lookups of one city, by either weather tool, share a single fetch.
+    """
+    key, query = _canonical_location(location)
+    alias = _forecast_aliases.get(key)
+    if alias is not None:
+        canonical, city_id = alias
+        return _forecast_cache.get_or_load(canonical, lambda: _load_forecast({"id": city_id}))
+    return _forecast_by_name.get_or_load(key, lambda: _remember_forecast(key, _load_forecast({"q": query}), location))
+
+
+def _summarize_forecast(record: dict, location: str, days: int, offset_days: int) -> dict:
+    """Slice the record's 3-hour slots into one summary per day for the requested window."""
+    # Cached records may be a few hours old: skip 3-hour slots that have already ended.
+    now = time.time()
+    by_day = defaultdict(list)
+    for slot in record["slots"]:
+        if slot["dt"] + 3 * 3600 <= now:
+            continue
+        by_day[slot["date"]].append(slot)
+
+    sorted_days = sorted(by_day.keys())
+    forecast = []
+    for day_key in sorted_days[offset_days : offset_days + days]:
+        entries = by_day[day_key]
+        temps = [e["temp"] for e in entries if e["temp"] is not None]
+        descs = [e["description"] for e in entries if e["description"]]
+        pops = [e["pop"] for e in entries if e["pop"] is not None]
+        forecast.append({
+            "date": day_key,
+            "temp_min_celsius": min(temps) if temps else None,
+            "temp_max_celsius": max(temps) if temps else None,
+            "description": max(set(descs), key=descs.count) if descs else "N/A",
+            "precipitation_chance_percent": round(100 * max(pops)) if pops else None,
+        })
+    return {
+        "location": record["location"] or location,
+        "forecast": forecast,
+        "count": len(forecast),
+    }
+
+
 def get_weather_forecast(location: str, days: int = 5, offset_days: int = 0) -> str:
     """
     Fetch weather forecast for a location. offset_days=0 is today, 1=tomorrow, etc.
     Returns one summary per day (date, min/max temp, description, precipitation chance).
+    The full 5-day series is cached per city, so any days/offset_days window is sliced locally.
     """
     days = max(1, min(5, days))
     offset_days = max(0, min(4, offset_days))
     if not OPENWEATHER_API_KEY:
         return json.dumps({"error": "OpenWeather API key not configured. Add OPENWEATHER_API_KEY to .env"})
 
-    params = {
-        "q": location,
-        "appid": OPENWEATHER_API_KEY,
-        "units": "metric",
-    }
     try:
-        resp = requests.get(OPENWEATHER_FORECAST_URL, params=params, timeout=5)
-        data = resp.json()
-
-        if resp.status_code != 200:
-            return json.dumps({"error": data.get("message", "Unknown API error")})
-
-        city = data.get("city", {}).get("name", location)
-        country = data.get("city", {}).get("country", "")
-        location_str = f"{city}, {country}" if country else city
-        items = data.get("list", [])
-
-        by_day = defaultdict(list)
-        for entry in items:
-            dt_txt = entry.get("dt_txt", "")
-            if not dt_txt:
-                continue
-            day_key = dt_txt.split()[0]
-            by_day[day_key].append(entry)
-
-        sorted_days = sorted(by_day.keys())
-        forecast = []
-        for day_key in sorted_days[offset_days : offset_days + days]:
-            entries = by_day[day_key]
-            temps = [e.get("main", {}).get("temp") for e in entries if e.get("main", {}).get("temp") is not None]
-            descs = [e.get("weather", [{}])[0].get("description") for e in entries if e.get("weather")]
-            pops = [e.get("pop") for e in entries if e.get("pop") is not None]
-            forecast.append({
-                "date": day_key,
-                "temp_min_celsius": min(temps) if temps else None,
-                "temp_max_celsius": max(temps) if temps else None,
-                "description": max(set(descs), key=descs.count) if descs else "N/A",
-                "precipitation_chance_percent": round(100 * max(pops)) if pops else None,
-            })
-        return json.dumps({
-            "location": location_str,
-            "forecast": forecast,
-            "count": len(forecast),
-        })
+        return json.dumps(_summarize_forecast(_forecast_data(location), location, days, offset_days))
+    except _WeatherAPIError as e:
+        return json.dumps(_weather_error(str(e), e.status_code, location))
     except requests.RequestException as e:
         return json.dumps({"error": str(e)})
     except Exception as e:
@@ -203,36 +422,44 @@ def get_weather_forecast(location: str, days: int = 5, offset_days: int = 0) ->
 
 # --- Places implementation ---
 
-_geocode_cache: dict[str, tuple[float, float] | None] = {}
-_geocode_lock = threading.Lock()
+_geocode_cache = TTLCache(
+    ttl=GEOCODE_CACHE_TTL_S,
+    maxsize=GEOCODE_CACHE_MAXSIZE,
+    negative_ttl=GEOCODE_NEGATIVE_TTL_S,
+)
 OVERPASS_CATEGORIES = frozenset(PLACE_CATEGORIES.keys())
 
 
+def _parse_geocode(data: list) -> tuple[float, float] | None:
+    if not data:
+        return None
+    return float(data[0]["lat"]), float(data[0]["lon"])
+
+
+def _load_geocode(location: str) -> tuple[float, float] | None:
+    """One Nominatim lookup. Returns None if the place is unknown; raises on transport or HTTP errors."""
+    r = http_client.get(
+        NOMINATIM_URL,
+        params={"q": location, "format": "json", "limit": 1},
+    )
+    r.raise_for_status()
+    return _parse_geocode(r.json())
+
+
 def _geocode(location: str) -> tuple[float, float] | None:
-    """Resolve a place name to (lat, lon) using Nominatim."""
-    key = location.strip().lower() if location else ""
-    with _geocode_lock:
-        if key in _geocode_cache:
-            return _geocode_cache[key]
-        try:
-            r = requests.get(
-                NOMINATIM_URL,
-                params={"q": location, "format": "json", "limit": 1},
-                headers=REQUEST_HEADERS,
-                timeout=10,
-            )
-            if r.status_code != 200:
-                result = None
-            else:
-                data = r.json()
-                if not data:
-                    result = None
-                else:
-                    result = float(data[0]["lat"]), float(data[0]["lon"])
-        except Exception:
-            result = None
-        _geocode_cache[key] = result
-        return result
+    """
+    Resolve a place name to (lat, lon): in-process from the offline gazetteer, else via Nominatim.
+    Nominatim results are cached per canonical name; concurrent lookups of one name share a single request.
+    Unknown places are cached briefly; errors are not cached.
+    """
+    city = gazetteer.lookup(location)
+    if city is not None:
+        return city.lat, city.lon
+    key = _location_key(location)
+    try:
+        return _geocode_cache.get_or_load(key, lambda: _load_geocode(location))
+    except Exception:
+        return None
 
 
 def _search_places_fallback(location: str, category: str, limit: int) -> str:
@@ -252,12 +479,192 @@ def _search_places_fallback(location: str, category: str, limit: int) -> str:
     })
 
 
+class _OverpassError(Exception):
+    """Overpass returned a non-200 response."""
+
+
+_places_cache = TTLCache(ttl=OVERPASS_COALESCE_WINDOW_S, maxsize=256, negative_ttl=0)
+
+
+def _overpass_query(lat: float, lon: float) -> str:
+    """
+    One query covering every category in PLACE_CATEGORIES around (lat, lon).
+    Only named elements are returned (nodes with coordinates, ways with tags and center only,
+    no member nodes). There is no server-side count cap: Overpass outputs in id order, not by distance,
+    so a capped output would be an arbitrary subset (and ways, e.g. most parks, come after all nodes).
+    """
+    around = f"(around:{OVERPASS_RADIUS_M},{lat},{lon})"
+    statements = "\n".join(
+        f'        node{osm_filter}["name"]{around};\n'
+        "        out body;\n"
+        f'        way{osm_filter}["name"]{around};\n'
+        "        out tags center;"
+        for osm_filter in PLACE_CATEGORIES.values()
+    )
+    return f"[out:json][timeout:20];\n{statements}"
+
+
+class _JsonArrayStream:
+    """
+    Incrementally extract the objects of the top-level array `key` from a streamed JSON body,
+    without parsing (or holding) the whole payload. feed() returns the objects completed so far;
+    `finished` is set at the array's closing bracket.
+    """
+
+    def __init__(self, key: str) -> None:
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._buf = ""
+        self._in_array = False
+        self.finished = False
+
+    def feed(self, chunk: bytes) -> list[dict]:
+        buf = self._buf + self._text.decode(chunk)
+        pos = 0
+        out: list[dict] = []
+        if not self._in_array:
+            m = self._start.search(buf)
+            if not m:
+                self._buf = buf
+                return out
+            pos = m.end()
+            self._in_array = True
+        while not self.finished:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == "]":
+                self.finished = True
+                break
+            try:
+                obj, pos = self._decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # object not complete yet; wait for more data
+            out.append(obj)
+        self._buf = buf[pos:]
+        return out
+
+
+def _place_from_element(el: dict, cat: str) -> dict | None:
+    tags = el.get("tags", {})
+    if "center" in el:
+        lat_, lon_ = el["center"].get("lat"), el["center"].get("lon")
+    else:
+        lat_, lon_ = el.get("lat"), el.get("lon")
+    if lat_ is None or lon_ is None:
+        return None
+    addr = tags.get("addr:street") or tags.get("address") or ""
+    if tags.get("addr:housenumber"):
+        addr = f"{tags.get('addr:housenumber', '')} {addr}".strip()
+    return {
+        "name": tags.get("name") or tags.get("brand") or "Unnamed",
+        "category": tags.get("amenity") or tags.get("tourism") or tags.get("leisure") or cat,
+        "address": addr or None,
+        "lat": lat_,
+        "lon": lon_,
+    }
+
+
+class _PlaceCollector:
+    """
+    Splits Overpass elements into per-category place lists: for each category and name (chains share
+    one) only the place nearest (lat, lon) is kept, then the OVERPASS_MAX_CANDIDATES nearest of those.
+    """
+
+    def __init__(self, lat: float, lon: float) -> None:
+        self._lat = lat
+        self._lon = lon
+        self._best: dict[str, dict[str, tuple[float, int, dict]]] = {cat: {} for cat in PLACE_CATEGORIES}
+        self._seq = 0
+
+    def add(self, el: dict) -> None:
+        tags = el.get("tags")
+        if not tags:
+            return
+        for cat in matching_categories(tags):
+            place = _place_from_element(el, cat)
+            if place is None:
+                continue
+            self._seq += 1
+            item = (distance_m(self._lat, self._lon, place["lat"], place["lon"]), self._seq, place)
+            best = self._best[cat]
+            if place["name"] not in best or item < best[place["name"]]:
+                best[place["name"]] = item
+
+    def result(self) -> dict[str, list[dict]]:
+        """Per-category places, nearest first."""
+        return {
+            cat: [place for _, _, place in heapq.nsmallest(OVERPASS_MAX_CANDIDATES, best.values())]
+            for cat, best in self._best.items()
+        }
+
+
+def _load_places(lat: float, lon: float) -> dict[str, list[dict]]:
+    """
+    Run the Overpass query and split matched elements back into per-category place lists,
+    each holding the OVERPASS_MAX_CANDIDATES places nearest (lat, lon), nearest first.
+    The whole response is read (the nearest place can be its last element), but parsed as it streams,
+    keeping one entry per distinct name and category rather than the raw response.
+    """
+    with http_client.stream("POST", OVERPASS_URL, data={"data": _overpass_query(lat, lon)}) as r:
+        if r.status_code != 200:
+            raise _OverpassError(f"Overpass HTTP {r.status_code}")
+        stream = _JsonArrayStream("elements")
+        collector = _PlaceCollector(lat, lon)
+        for chunk in r.iter_content(chunk_size=65536):
+            for el in stream.feed(chunk):
+                collector.add(el)
+            if stream.finished:
+                break
+    return collector.result()
+
+
+_poi_store: PoiStore | None = None
+_poi_store_loaded = False
+_poi_store_lock = threading.Lock()
+
+
+def _get_poi_store() -> PoiStore | None:
+    """Open the offline POI index at POI_INDEX_PATH once, if the file exists."""
+    global _poi_store, _poi_store_loaded
+    with _poi_store_lock:
+        if not _poi_store_loaded:
+            _poi_store_loaded = True
+            try:
+                if POI_INDEX_PATH and os.path.exists(POI_INDEX_PATH):
+                    _poi_store = PoiStore.open(POI_INDEX_PATH)
+            except (OSError, ValueError):
+                _poi_store = None
+        return _poi_store
+
+
+def _search_local_places(lat: float, lon: float, cat: str, limit: int) -> list[dict]:
+    """Nearest places from the offline POI index, or [] if no index covers (lat, lon)."""
+    store = _get_poi_store()
+    if store is None or not store.covers(lat, lon):
+        return []
+    return [store.place(i) for _, i in store.nearest(lat, lon, limit, cat, max_radius_m=OVERPASS_RADIUS_M)]
+
+
+def _places_result(location: str, cat: str, limit: int, results: list[dict]) -> str:
+    if not results:
+        return _search_places_fallback(location, cat, limit)
+    return json.dumps({"places": results, "count": len(results), "location": location})
+
+
 def search_places(
     location: str,
     category: str | None = None,
     limit: int = 10,
 ) -> str:
-    """Search for restaurants, museums, or parks near a location via Overpass (OSM)."""
+    """
+    Search for restaurants, museums, or parks near a location.
+    Answered from the offline POI index when it covers the location, otherwise via Overpass (OSM).
+    All Overpass categories for a location are fetched by one query and shared by calls within OVERPASS_COALESCE_WINDOW_S,
+    so parallel restaurant/museum/park calls for one city cost a single Overpass request.
+    """
     cat = (category or "restaurant").lower().strip()
     if cat not in OVERPASS_CATEGORIES:
         return _search_places_fallback(location, cat, limit)
@@ -268,96 +675,461 @@ def search_places(
             return _search_places_fallback(location, cat, limit)
 
         lat, lon = coords
-        radius_m = 5000
-        osm_filter = PLACE_CATEGORIES[cat]
-
-        overpass = f"""[out:json][timeout:20];
-        (
-         node{osm_filter}(around:{radius_m},{lat},{lon});
-         way{osm_filter}(around:{radius_m},{lat},{lon});
-        );
-        out center tags;
-        >;
-        out qt;"""
-
-        r = requests.post(
-            OVERPASS_URL,
-            data={"data": overpass},
-            headers=REQUEST_HEADERS,
-            timeout=20,
-        )
-        if r.status_code != 200:
-            return _search_places_fallback(location, cat, limit)
+        results = _search_local_places(lat, lon, cat, limit)
+        if not results:
+            by_category = _places_cache.get_or_load(
+                (round(lat, 5), round(lon, 5)),
+                lambda: _load_places(lat, lon),
+            )
+            results = by_category.get(cat, [])[:limit]  # nearest first
+        return _places_result(location, cat, limit, results)
+    except requests.RequestException:
+        return _search_places_fallback(location, cat, limit)
+    except Exception:
+        return _search_places_fallback(location, cat, limit)
 
-        data = r.json()
-        elements = data.get("elements", [])
 
-        results = []
-        seen_names: set[str] = set()
-        for el in elements:
-            tags = el.get("tags", {})
-            name = tags.get("name") or tags.get("brand") or "Unnamed"
-            if not name or name in seen_names:
-                continue
-            seen_names.add(name)
-            if "center" in el:
-                lat_, lon_ = el["center"].get("lat"), el["center"].get("lon")
-            else:
-                lat_, lon_ = el.get("lat"), el.get("lon")
-            if lat_ is None or lon_ is None:
-                continue
-            addr = tags.get("addr:street") or tags.get("address") or ""
-            if tags.get("addr:housenumber"):
-                addr = f"{tags.get('addr:housenumber', '')} {addr}".strip()
-            results.append({
-                "name": name,
-                "category": tags.get("amenity") or tags.get("tourism") or tags.get("leisure") or cat,
-                "address": addr or None,
-                "lat": lat_,
-                "lon": lon_,
-            })
-            if len(results) >= limit:
+# --- Async implementations (same caches and result contract as the sync tools) ---
+
+
+async def aget_current_temperature(location: str) -> str:
+    """Async get_current_temperature."""
+    if not OPENWEATHER_API_KEY:
+        return json.dumps({"error": "OpenWeather API key not configured. Add OPENWEATHER_API_KEY to .env"})
+    try:
+        current = _current_from_record(await _aforecast_data(location))
+        if current is not None:
+            return json.dumps(current)
+        resp = await http_client.aget(OPENWEATHER_URL, params=_current_weather_params(location))
+        return json.dumps(_current_weather_result(resp.status_code, resp.json(), location))
+    except _WeatherAPIError as e:
+        return json.dumps(_weather_error(str(e), e.status_code, location))
+    except (httpx.HTTPError, http_client.UpstreamUnavailable) as e:
+        return json.dumps({"error": str(e)})
+
+
+async def _aload_forecast(params: dict) -> dict:
+    resp = await http_client.aget(
+        OPENWEATHER_FORECAST_URL,
+        params={**params, "appid": OPENWEATHER_API_KEY, "units": "metric"},
+    )
+    return _forecast_payload(resp.status_code, resp.json())
+
+
+async def _aforecast_data(location: str) -> dict:
+    key, query = _canonical_location(location)
+    alias = _forecast_aliases.get(key)
+    if alias is not None:
+        canonical, city_id = alias
+        return await _forecast_cache.aget_or_load(canonical, lambda: _aload_forecast({"id": city_id}))
+
+    async def load() -> dict:
+        return _remember_forecast(key, await _aload_forecast({"q": query}), location)
+
+    return await _forecast_by_name.aget_or_load(key, load)
+
+
+async def aget_weather_forecast(location: str, days: int = 5, offset_days: int = 0) -> str:
+    """Async get_weather_forecast."""
+    days = max(1, min(5, days))
+    offset_days = max(0, min(4, offset_days))
+    if not OPENWEATHER_API_KEY:
+        return json.dumps({"error": "OpenWeather API key not configured. Add OPENWEATHER_API_KEY to .env"})
+    try:
+        return json.dumps(_summarize_forecast(await _aforecast_data(location), location, days, offset_days))
+    except _WeatherAPIError as e:
+        return json.dumps(_weather_error(str(e), e.status_code, location))
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
+
+async def _aload_geocode(location: str) -> tuple[float, float] | None:
+    r = await http_client.aget(NOMINATIM_URL, params={"q": location, "format": "json", "limit": 1})
+    r.raise_for_status()
+    return _parse_geocode(r.json())
+
+
+async def _ageocode(location: str) -> tuple[float, float] | None:
+    """Async _geocode: gazetteer first, then the shared Nominatim cache."""
+    city = gazetteer.lookup(location)
+    if city is not None:
+        return city.lat, city.lon
+    try:
+        return await _geocode_cache.aget_or_load(_location_key(location), lambda: _aload_geocode(location))
+    except Exception:
+        return None
+
+
+async def _aload_places(lat: float, lon: float) -> dict[str, list[dict]]:
+    async with http_client.astream("POST", OVERPASS_URL, data={"data": _overpass_query(lat, lon)}) as r:
+        if r.status_code != 200:
+            raise _OverpassError(f"Overpass HTTP {r.status_code}")
+        stream = _JsonArrayStream("elements")
+        collector = _PlaceCollector(lat, lon)
+        async for chunk in r.aiter_bytes(65536):
+            for el in stream.feed(chunk):
+                collector.add(el)
+            if stream.finished:
                 break
+    return collector.result()
 
-        if not results:
-            return _search_places_fallback(location, cat, limit)
-        return json.dumps({"places": results, "count": len(results), "location": location})
-    except requests.RequestException:
+
+async def asearch_places(location: str, category: str | None = None, limit: int = 10) -> str:
+    """Async search_places."""
+    cat = (category or "restaurant").lower().strip()
+    if cat not in OVERPASS_CATEGORIES:
         return _search_places_fallback(location, cat, limit)
+    try:
+        coords = await _ageocode(location)
+        if not coords:
+            return _search_places_fallback(location, cat, limit)
+        lat, lon = coords
+        results = _search_local_places(lat, lon, cat, limit)
+        if not results:
+            by_category = await _places_cache.aget_or_load(
+                (round(lat, 5), round(lon, 5)),
+                lambda: _aload_places(lat, lon),
+            )
+            results = by_category.get(cat, [])[:limit]
+        return _places_result(location, cat, limit, results)
     except Exception:
         return _search_places_fallback(location, cat, limit)
 
+
+# --- Composite trip tool ---
+
+
+def _park_weather_ok(forecast: dict) -> bool:
+    """True unless the forecast shows a precipitation chance at or above PARK_MAX_PRECIPITATION_CHANCE."""
+    chances = [d["precipitation_chance_percent"] for d in forecast.get("forecast", []) if d.get("precipitation_chance_percent") is not None]
+    return not chances or max(chances) < PARK_MAX_PRECIPITATION_CHANCE
+
+
+async def _aplaces_for(location: str, category: str, limit: int) -> dict:
+    current_priority.set(PRIORITY_POI)  # this task's context only; the forecast keeps PRIORITY_WEATHER
+    return json.loads(await asearch_places(location, category, limit))
+
+
+async def _aplan_one(dest: dict, limit: int) -> dict:
+    location = dest.get("location", "")
+    days = dest.get("days", 3)
+    offset_days = dest.get("offset_days", 0)
+    # One Overpass query serves all categories, so parks are fetched alongside and dropped if it will rain.
+    forecast_json, *places = await asyncio.gather(
+        aget_weather_forecast(location, days, offset_days),
+        *(_aplaces_for(location, cat, limit) for cat in ("restaurant", "museum", "park")),
+    )
+    forecast = json.loads(forecast_json)
+    bundle: dict = {"location": forecast.get("location", location)}
+    if "error" in forecast:
+        bundle["weather_error"] = forecast["error"]
+    else:
+        bundle["forecast"] = forecast["forecast"]
+    include_park = "error" not in forecast and _park_weather_ok(forecast)
+    bundle["park_included"] = include_park
+    bundle["places"] = {}
+    use_knowledge = []
+    for cat, result in zip(("restaurant", "museum", "park"), places):
+        if cat == "park" and not include_park:
+            continue
+        if result.get("use_knowledge"):
+            use_knowledge.append(cat)
+            continue
+        bundle["places"][cat] = [{"name": p["name"], "address": p.get("address")} for p in result.get("places", [])]
+    if use_knowledge:
+        bundle["use_knowledge"] = use_knowledge
+    return bundle
+
+
+async def aplan_destination(destinations: list[dict], limit: int = 10) -> str:
+    """
+    Forecast plus restaurants, museums and (weather permitting) parks for every destination, fetched concurrently.
+    Returns one compact bundle per city: forecast days, and place names/addresses per category.
+    """
+    if not destinations:
+        return json.dumps({"error": "No destinations given."})
+    bundles = await asyncio.gather(*(_aplan_one(d, limit) for d in destinations))
+    return json.dumps({"destinations": bundles, "count": len(bundles)})
+
+
+def _plan_destination_fallback(destinations: list[dict], limit: int = 10) -> str:
+    """Degraded plan_destination: no forecast, and every place category left to the model's own knowledge."""
+    bundles = [
+        {
+            "location": d.get("location", ""),
+            "weather_error": "Weather data is not available right now.",
+            "park_included": False,
+            "places": {},
+            "use_knowledge": ["restaurant", "museum"],
+        }
+        for d in destinations
+    ]
+    return json.dumps({"destinations": bundles, "count": len(bundles)})
+
+
+def plan_destination(destinations: list[dict], limit: int = 10) -> str:
+    """Sync plan_destination: runs the async implementation on the shared background loop (pooled connections)."""
+    return run_coroutine(aplan_destination(destinations, limit))
+
+
+# --- Cache warming (speculative prefetch) ---
+
+
+async def awarm_forecast(location: str) -> None:
+    """Load the weather record for location into the cache (serves both weather tools). Errors are ignored; the real tool call reports them."""
+    if not OPENWEATHER_API_KEY:
+        return
+    try:
+        await _aforecast_data(location)
+    except Exception:
+        pass
+
+
+async def awarm_places(location: str) -> None:
+    """Geocode location and load its Overpass places into the cache, unless the offline POI index covers it."""
+    coords = await _ageocode(location)
+    if not coords:
+        return
+    lat, lon = coords
+    store = _get_poi_store()
+    if store is not None and store.covers(lat, lon):
+        return
+    try:
+        await _places_cache.aget_or_load((round(lat, 5), round(lon, 5)), lambda: _aload_places(lat, lon))
+    except Exception:
+        pass
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    """Hit/miss/in-flight counters for the tool caches."""
+    return {
+        "geocode": _geocode_cache.stats(),
+        "forecast": _forecast_cache.stats(),
+        "places": _places_cache.stats(),
+    }
+
 # --- Tool registry ---
 
 
 class ToolRegistry:
-    """Maps tool name -> (schema, callable). Run tools by name without branching in callers."""
+    """
+    Maps tool name -> (schema, callable). Run tools by name without branching in callers.
+    Tools may also have an async implementation; run_async/run_many_async prefer it and adapt
+    sync-only tools by queueing them on the tool scheduler. Each tool has a scheduling priority
+    (lower first) used by submit() and by the per-host limiters its HTTP calls wait on.
+    A call given a deadline runs with current_deadline set; one that misses it returns the tool's
+    fallback (its degraded payload) instead of blocking the turn. Shared cache loads ignore the deadline
+    (see cache.py): it only bounds how long each caller waits for them.
+    A tool registered with cache=CachePolicy(...) is answered from its TieredCache (in-process, then
+    the shared store given here) before it runs, on every path (run, submit, run_async).
+    """
 
-    def __init__(self) -> None:
+    def __init__(self, store: SqliteStore | None = None) -> None:
         self._tools: dict[str, tuple[dict, Callable[..., str]]] = {}
+        self._async_tools: dict[str, Callable[..., Awaitable[str]]] = {}
+        self._priorities: dict[str, int] = {}
+        self._fallbacks: dict[str, Callable[..., str]] = {}
+        self._store = store
+        self._caches: dict[str, TieredCache] = {}
+        self._deadline_misses: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
 
-    def register(self, name: str, schema: dict, fn: Callable[..., str]) -> None:
+    def register(
+        self,
+        name: str,
+        schema: dict,
+        fn: Callable[..., str],
+        priority: int = PRIORITY_DEFAULT,
+        fallback: Callable[..., str] | None = None,
+        cache: CachePolicy | None = None,
+    ) -> None:
         self._tools[name] = (schema, fn)
+        self._priorities[name] = priority
+        if fallback is not None:
+            self._fallbacks[name] = fallback
+        if cache is not None:
+            self._caches[name] = TieredCache(name, cache, self._store)
 
-    def get_schemas(self) -> list[dict]:
-        """Return list of OpenAI tool schemas in registration order."""
-        return [schema for schema, _ in self._tools.values()]
+    def register_async(
+        self,
+        name: str,
+        schema: dict,
+        fn: Callable[..., Awaitable[str]],
+        priority: int = PRIORITY_DEFAULT,
+        fallback: Callable[..., str] | None = None,
+        cache: CachePolicy | None = None,
+    ) -> None:
+        """Register an async implementation. Without a sync one, run() drives it on the shared background loop."""
+        self._async_tools[name] = fn
+        self._priorities[name] = priority
+        if fallback is not None:
+            self._fallbacks[name] = fallback
+        if cache is not None:
+            self._caches[name] = TieredCache(name, cache, self._store)
+        if name not in self._tools:
+            self._tools[name] = (schema, lambda **kw: run_coroutine(fn(**kw)))
+
+    def get_schemas(self, names: tuple[str, ...] | list[str] | None = None) -> list[dict]:
+        """Return list of OpenAI tool schemas in registration order, restricted to names if given."""
+        return [schema for name, (schema, _) in self._tools.items() if names is None or name in names]
+
+    def priority(self, name: str) -> int:
+        return self._priorities.get(name, PRIORITY_DEFAULT)
+
+    def fallback(self, name: str, args: dict) -> str:
+        """Result for a call that missed its deadline: the registered fallback, else an error payload."""
+        with self._lock:
+            self._deadline_misses[name] += 1
+        fn = self._fallbacks.get(name)
+        if fn is None:
+            return json.dumps({"error": f"{name} did not respond in time."})
+        return fn(**args)
 
-    def run(self, name: str, args: dict) -> str:
-        """Execute tool by name; return raw JSON string result."""
+    def record_demand(self, name: str, args: dict) -> None:
+        """
+        Count a user's call (not a warm-up or prefetch) in the shared tier, for warm_cache --from-traffic.
+        Blocking (one SQLite write): async callers run it in a worker thread.
+        """
+        cache = self._caches.get(name)
+        if cache is not None:
+            cache.record_demand(args)
+
+    def cache_stats(self) -> dict[str, dict]:
+        """Per-tool result-cache counters and hit rate, for tools registered with a CachePolicy."""
+        return {name: cache.stats() for name, cache in self._caches.items()}
+
+    def deadline_misses(self) -> dict[str, int]:
+        """Per-tool count of calls answered by fallback() because they ran out of time."""
+        with self._lock:
+            return dict(self._deadline_misses)
+
+    def run(self, name: str, args: dict, deadline: float | None = None) -> str:
+        """
+        Execute tool by name in the calling thread; return raw JSON string result.
+        deadline (time.monotonic()) bounds its HTTP calls and its wait on a cached tool's load (which then
+        runs in a background thread and is kept for later callers); a call starting after it, or
+        outwaiting it, returns the fallback.
+        """
         if name not in self._tools:
             return json.dumps({"error": f"Unknown tool: {name}"})
+        if deadline is not None and time.monotonic() >= deadline:
+            return self.fallback(name, args)
         _, fn = self._tools[name]
-        return fn(**args)
+        cache = self._caches.get(name)
+        token = current_priority.set(self.priority(name))
+        deadline_token = current_deadline.set(deadline)
+        try:
+            if cache is not None:
+                return cache.get_or_load(args, lambda: fn(**args))
+            return fn(**args)
+        except TimeoutError:
+            return self.fallback(name, args)
+        finally:
+            current_deadline.reset(deadline_token)
+            current_priority.reset(token)
+
+    def submit(self, name: str, args: dict, deadline: float | None = None) -> Future:
+        """Queue the tool on the process-wide scheduler at its priority; the Future resolves to run()'s result."""
+        return tool_scheduler.submit(self.run, name, args, deadline, priority=self.priority(name))
+
+    async def run_async(self, name: str, args: dict, deadline: float | None = None) -> str:
+        """
+        Async run(): awaits the tool's async implementation, or the sync one via submit().
+        With a deadline, a call still running TOOL_DEADLINE_GRACE_S after it is abandoned for the fallback;
+        a shared cache load it was waiting on keeps running while other callers still wait on it.
+        """
+        if name not in self._tools:
+            return json.dumps({"error": f"Unknown tool: {name}"})
+        token = current_priority.set(self.priority(name))
+        deadline_token = current_deadline.set(deadline)
+        try:
+            cache = self._caches.get(name)
+            if name in self._async_tools:
+                afn = self._async_tools[name]
+                call = cache.aget_or_load(args, lambda: afn(**args)) if cache is not None else afn(**args)
+            else:
+                call = asyncio.wrap_future(self.submit(name, args, deadline))
+            if deadline is None:
+                return await call
+            try:
+                return await asyncio.wait_for(call, max(0.0, deadline - time.monotonic()) + TOOL_DEADLINE_GRACE_S)
+            except TimeoutError:
+                return self.fallback(name, args)
+        finally:
+            current_deadline.reset(deadline_token)
+            current_priority.reset(token)
+
+    async def run_many_async(self, calls: list[tuple[str, dict]]) -> list[str]:
+        """Run (name, args) calls concurrently; results come back in call order, errors as JSON."""
+        results = await asyncio.gather(*(self.run_async(name, args) for name, args in calls), return_exceptions=True)
+        return [
+            json.dumps({"error": str(r)}) if isinstance(r, Exception) else r
+            for r in results
+        ]
+
 
+def _places_fallback(**kw) -> str:
+    return _search_places_fallback(kw.get("location", ""), (kw.get("category") or "restaurant").lower().strip(), kw.get("limit", 10))
 
-def create_default_registry() -> ToolRegistry:
-    """Build registry with weather and places tools."""
-    reg = ToolRegistry()
+# --- Registry cache policies ---
+
+
+def _cacheable(result: str) -> bool:
+    """Only complete results are cached: no errors, knowledge fallbacks, or trip bundles missing data."""
+    try:
+        data = json.loads(result)
+    except (TypeError, ValueError):
+        return False
+    if not isinstance(data, dict) or "error" in data or data.get("use_knowledge"):
+        return False
+    return not any("weather_error" in b or b.get("use_knowledge") for b in data.get("destinations", []))
+
+
+def _forecast_key(kw: dict) -> str:
+    return f"{_canonical_location(kw.get('location', ''))[0]}|{kw.get('days', 5)}|{kw.get('offset_days', 0)}"
+
+
+def _places_key(kw: dict) -> str:
+    category = (kw.get("category") or "restaurant").lower().strip()
+    return f"{_canonical_location(kw.get('location', ''))[0]}|{category}|{kw.get('limit', 10)}"
+
+
+def _plan_key(kw: dict) -> str:
+    destinations = [
+        (_canonical_location(d.get("location", ""))[0], d.get("days", 3), d.get("offset_days", 0))
+        for d in kw.get("destinations", [])
+    ]
+    return json.dumps([destinations, kw.get("limit", 10)])
+
+
+CURRENT_WEATHER_CACHE = CachePolicy(
+    ttl=CURRENT_WEATHER_CACHE_TTL_S, key=lambda kw: _canonical_location(kw.get("location", ""))[0], cacheable=_cacheable
+)
+FORECAST_CACHE = CachePolicy(ttl=_forecast_ttl, key=_forecast_key, cacheable=_cacheable)
+PLACES_CACHE = CachePolicy(ttl=PLACES_CACHE_TTL_S, maxsize=4096, key=_places_key, cacheable=_cacheable)
+PLAN_DESTINATION_CACHE = CachePolicy(ttl=_forecast_ttl, maxsize=256, key=_plan_key, cacheable=_cacheable)
+shared_store = SqliteStore(TOOL_CACHE_PATH, TOOL_CACHE_SHARED_MAX_ROWS) if TOOL_CACHE_PATH else None
+
+
+def create_default_registry(store: SqliteStore | None = shared_store) -> ToolRegistry:
+    """
+    Build registry with weather, places and composite trip tools (sync and async implementations).
+    Weather tools that miss the deadline report an error; places and trip tools fall back to model knowledge.
+    Results are cached per tool (see the *_CACHE policies), shared across processes through store.
+    """
+    reg = ToolRegistry(store)
     reg.register(
         "get_current_temperature",
         WEATHER_TOOL,
         lambda **kw: get_current_temperature(kw.get("location", "")),
+        priority=PRIORITY_WEATHER,
+        cache=CURRENT_WEATHER_CACHE,
+    )
+    reg.register_async(
+        "get_current_temperature",
+        WEATHER_TOOL,
+        lambda **kw: aget_current_temperature(kw.get("location", "")),
+        priority=PRIORITY_WEATHER,
     )
     reg.register(
         "get_weather_forecast",
@@ -367,6 +1139,18 @@ def create_default_registry() -> ToolRegistry:
             days=kw.get("days", 5),
             offset_days=kw.get("offset_days", 0),
         ),
+        priority=PRIORITY_WEATHER,
+        cache=FORECAST_CACHE,
+    )
+    reg.register_async(
+        "get_weather_forecast",
+        WEATHER_FORECAST_TOOL,
+        lambda **kw: aget_weather_forecast(
+            location=kw.get("location", ""),
+            days=kw.get("days", 5),
+            offset_days=kw.get("offset_days", 0),
+        ),
+        priority=PRIORITY_WEATHER,
     )
     reg.register(
         "search_places",
@@ -376,6 +1160,33 @@ def create_default_registry() -> ToolRegistry:
             category=kw.get("category", "restaurant"),
             limit=kw.get("limit", 10),
         ),
+        priority=PRIORITY_POI,
+        fallback=_places_fallback,
+        cache=PLACES_CACHE,
+    )
+    reg.register_async(
+        "search_places",
+        PLACES_TOOL,
+        lambda **kw: asearch_places(
+            location=kw.get("location", ""),
+            category=kw.get("category", "restaurant"),
+            limit=kw.get("limit", 10),
+        ),
+        priority=PRIORITY_POI,
+    )
+    reg.register(
+        "plan_destination",
+        PLAN_DESTINATION_TOOL,
+        lambda **kw: plan_destination(kw.get("destinations", []), kw.get("limit", 10)),
+        priority=PRIORITY_WEATHER,
+        fallback=lambda **kw: _plan_destination_fallback(kw.get("destinations", []), kw.get("limit", 10)),
+        cache=PLAN_DESTINATION_CACHE,
+    )
+    reg.register_async(
+        "plan_destination",
+        PLAN_DESTINATION_TOOL,
+        lambda **kw: aplan_destination(kw.get("destinations", []), kw.get("limit", 10)),
+        priority=PRIORITY_WEATHER,
     )
     return reg
 
@@ -0,0 +1,142 @@
+"""
+Cache warming for top destinations. Runs the weather and places tools through the tool registry for
+each destination, so the shared on-disk tool cache every worker reads is populated before users ask.
+It needs that tier (TOOL_CACHE_PATH, the same path as the servers); the CLI refuses to run without it.
+
+    python warm_cache.py Paris London Tokyo
+    python warm_cache.py --file destinations.txt
+    python warm_cache.py --from-traffic --top 50 --every 10800
+
+--from-traffic ranks destinations by the tool calls users made for them in the last
+WARM_TRAFFIC_WINDOW_S (recorded by the assistant in the shared tier; warm-ups are not counted). Upstream requests go through the usual per-host rate limiters; --every repeats the warm-up
+on a schedule (e.g. every forecast refresh) and only re-fetches entries that have expired.
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import http_client
+from config import FORECAST_REFRESH_INTERVAL_S, PLACE_CATEGORIES, WARM_TRAFFIC_WINDOW_S
+from scheduler import PRIORITY_PREFETCH, tool_scheduler
+from tools import ToolRegistry, shared_store, tool_registry
+
+# Every (days, offset_days) window of the 5-day series: one upstream fetch serves them all.
+FORECAST_WINDOWS = [(days, offset) for offset in range(5) for days in range(1, 6 - offset)]
+_LOCATION_KEYED_TOOLS = ("get_current_temperature", "get_weather_forecast", "search_places")
+
+
+def destinations_from_traffic(top: int, window_s: float = WARM_TRAFFIC_WINDOW_S) -> list[str]:
+    """
+    Destinations users made the most tool calls for in the last window_s, most requested first.
+    Counted from the shared tier's demand table, which warm-ups and prefetches never write to.
+    """
+    if shared_store is None:
+        return []
+    since = time.time() - window_s
+    counts: Counter[str] = Counter()
+    for name in _LOCATION_KEYED_TOOLS:
+        for key, requests in shared_store.demand(name, since):
+            counts[key.split("|", 1)[0]] += requests
+    return [location for location, _ in counts.most_common(top) if location]
+
+
+def _ok(result: str) -> bool:
+    try:
+        data = json.loads(result)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(data, dict) and "error" not in data and not data.get("use_knowledge")
+
+
+def _calls(location: str, places: bool, limit: int) -> list[tuple[str, dict]]:
+    calls = [("get_current_temperature", {"location": location})]
+    calls += [("get_weather_forecast", {"location": location, "days": d, "offset_days": o}) for d, o in FORECAST_WINDOWS]
+    if places:
+        calls += [("search_places", {"location": location, "category": cat, "limit": limit}) for cat in PLACE_CATEGORIES]
+    return calls
+
+
+def warm(destinations: list[str], registry: ToolRegistry = tool_registry, places: bool = True, limit: int = 10) -> dict:
+    """
+    Warm the caches for destinations; returns a coverage report: per destination whether weather and
+    each place category are now cached with real data, overall coverage, duration and upstream requests.
+    """
+    start = time.monotonic()
+    requests_before = sum(s.get("requests", 0) for s in http_client.pool_stats().values())
+    # Destinations run in parallel at prefetch priority; calls for one city run in order, so the first
+    # forecast fetch serves every window and the first places query serves every category.
+    futures: dict[str, Future] = {
+        location: tool_scheduler.submit(
+            lambda loc: [(name, args, registry.run(name, args)) for name, args in _calls(loc, places, limit)],
+            location,
+            priority=PRIORITY_PREFETCH,
+        )
+        for location in dict.fromkeys(destinations)
+    }
+    report: dict[str, dict] = {}
+    for location, future in futures.items():
+        try:
+            results = future.result()
+        except Exception as e:
+            report[location] = {"error": str(e)}
+            continue
+        entry = {
+            "current": _ok(results[0][2]),
+            "forecast": all(_ok(r) for name, _, r in results if name == "get_weather_forecast"),
+        }
+        for name, args, result in results:
+            if name == "search_places":
+                entry[args["category"]] = _ok(result)
+        report[location] = entry
+    checks = [v for entry in report.values() for k, v in entry.items() if k != "error"]
+    return {
+        "destinations": report,
+        "coverage": round(sum(checks) / len(checks), 3) if checks else 0.0,
+        "elapsed_s": round(time.monotonic() - start, 2),
+        "upstream_requests": sum(s.get("requests", 0) for s in http_client.pool_stats().values()) - requests_before,
+        "cache": registry.cache_stats(),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Pre-populate the tool caches for top destinations.")
+    parser.add_argument("destinations", nargs="*", help="Destination names, e.g. Paris 'New York'")
+    parser.add_argument("--file", help="Text file with one destination per line")
+    parser.add_argument("--from-traffic", action="store_true", help="Add the most requested destinations from the shared tool cache")
+    parser.add_argument("--top", type=int, default=50, help="How many destinations --from-traffic adds")
+    parser.add_argument("--no-places", action="store_true", help="Warm weather only")
+    parser.add_argument("--limit", type=int, default=10, help="Places per category (match the tool's default)")
+    parser.add_argument(
+        "--every", type=float, default=0,
+        help=f"Repeat every N seconds (e.g. {FORECAST_REFRESH_INTERVAL_S} for each forecast refresh); default once",
+    )
+    args = parser.parse_args(argv)
+    if shared_store is None:
+        # Without the shared tier, warming fills only this short-lived process's memory.
+        raise SystemExit("No shared tool cache to warm: set TOOL_CACHE_PATH to the one the servers use")
+
+    while True:
+        destinations = list(args.destinations)
+        if args.file:
+            with open(args.file, encoding="utf-8") as f:
+                destinations += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        if args.from_traffic:
+            destinations += destinations_from_traffic(args.top)
+        if not destinations:
+            raise SystemExit("No destinations: pass names, --file or --from-traffic")
+        report = warm(destinations, places=not args.no_places, limit=args.limit)
+        for location, entry in report["destinations"].items():
+            missing = [k for k, v in entry.items() if v is not True]
+            print(f"{location:30s} {'ok' if not missing else 'missing: ' + ', '.join(missing)}")
+        print(json.dumps({k: v for k, v in report.items() if k != "destinations"}))
+        if args.every <= 0:
+            return
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])